@@ -1,34 +1,140 @@
 import logging
+from typing import Dict
 
 from fastapi import APIRouter, Request, status
-from fastapi.responses import JSONResponse
+from fastapi.responses import (
+    JSONResponse,
+    PlainTextResponse,
+    StreamingResponse,
+)
 from fastapi_router_controller import Controller
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
 
 from api.exception import CommunicationServiceException
 from api.models import (
+    CommunicationSuccessBatchRequest,
+    CommunicationSuccessBatchResponse,
+    CommunicationSuccessItemResponse,
     CommunicationSuccessRequest,
+    CommunicationSuccessStatus,
     ExceptionResponse,
+    MedicationAdherenceCommBatchItem,
+    MedicationAdherenceCommBatchRequest,
+    MedicationAdherenceCommBatchResponse,
     MedicationAdherenceCommRequest,
     MedicationAdherenceCommResponse,
+    StreamFormat,
 )
-from communication.medication_adherence import MedicationAdherenceCommunication
+from api.services import service_registry
+from api.streaming import STREAM_MEDIA_TYPES, stream_batch_items
+from communication.metrics import ServiceStatsCollector
 from communication.schema import CommunicationUseCase
 from communication.utils import StrEnum
 
 router = APIRouter()
 controller = Controller(router, openapi_tag={"name": "communication"})
 
+health_router = APIRouter()
+health_controller = Controller(health_router, openapi_tag={"name": "health"})
+
+metrics_router = APIRouter()
+metrics_controller = Controller(
+    metrics_router, openapi_tag={"name": "metrics"}
+)
+
+# Prefix of the gauges exported from the service stats
+SERVICE_STATS_PREFIX = "communication_medication_adherence"
+
+
+def get_service_stats() -> Dict:
+    if not service_registry.is_ready:
+        return {}
+    return service_registry.medication_adherence_comm_service.stats()
+
+
+REGISTRY.register(
+    ServiceStatsCollector(SERVICE_STATS_PREFIX, get_service_stats)
+)
+
 
 class CommunicationRoutersPath(StrEnum):
     MEDICATION_ADHERENCE = "/medication-adherence"
+    MEDICATION_ADHERENCE_BATCH = "/medication-adherence/batch"
+    MEDICATION_ADHERENCE_STREAM = "/medication-adherence/stream"
     SUCCESS = "/success"
+    SUCCESS_BATCH = "/success/batch"
+
+
+class HealthRoutersPath(StrEnum):
+    LIVENESS = "/health/live"
+    READINESS = "/health/ready"
+
+
+class MetricsRoutersPath(StrEnum):
+    METRICS = "/metrics"
+
+
+@health_controller.resource()
+class HealthController:
+    @health_controller.router.get(
+        HealthRoutersPath.LIVENESS,
+        summary="Liveness probe, answered as soon as the process is up",
+        tags=["Health"],
+    )
+    async def get_liveness(self) -> JSONResponse:
+        return JSONResponse(
+            status_code=status.HTTP_200_OK, content={"status": "alive"}
+        )
+
+    @health_controller.router.get(
+        HealthRoutersPath.READINESS,
+        summary="Readiness probe, answered once services finished warmup",
+        tags=["Health"],
+    )
+    async def get_readiness(self) -> JSONResponse:
+        if service_registry.is_ready:
+            return JSONResponse(
+                status_code=status.HTTP_200_OK,
+                content={
+                    "status": "ready",
+                    "warmup_seconds": service_registry.warmup_seconds,
+                },
+            )
+
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={
+                "status": (
+                    "failed" if service_registry.warmup_error else "warming_up"
+                ),
+                "error": service_registry.warmup_error,
+            },
+        )
+
+
+@metrics_controller.resource()
+class MetricsController:
+    @metrics_controller.router.get(
+        MetricsRoutersPath.METRICS,
+        summary=(
+            "Pipeline stage latencies, error, retry and cache counters and "
+            "service stats in the Prometheus text format"
+        ),
+        tags=["Metrics"],
+        response_class=PlainTextResponse,
+    )
+    async def get_metrics(self) -> PlainTextResponse:
+        return PlainTextResponse(
+            content=generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST
+        )
 
 
 @controller.resource()
 class CommunicationController:
     def __init__(self):
+        # Raises ServiceNotReadyException (503) until warmup finished
         self.medication_adherence_comm_service = (
-            MedicationAdherenceCommunication()
+            service_registry.get_medication_adherence_comm_service()
         )
 
     @controller.router.post(
@@ -70,6 +176,7 @@ class CommunicationController:
                 await self.medication_adherence_comm_service.get_communication(
                     request_uuid=request_body.request_uuid,
                     patient_profile=request_body.patient_profile,
+                    use_cache=request_body.use_cache,
                 )
             )
 
@@ -83,6 +190,127 @@ class CommunicationController:
         except Exception as base_exception:
             raise CommunicationServiceException(base_exception=base_exception)
 
+    @controller.router.post(
+        CommunicationRoutersPath.MEDICATION_ADHERENCE_BATCH,
+        summary=(
+            "Get medication adherence communications for many patients, "
+            "with failures reported per item"
+        ),
+        tags=["Communication"],
+        responses={
+            status.HTTP_500_INTERNAL_SERVER_ERROR: {
+                "description": "Error: Bad request",
+                "model": ExceptionResponse,
+            },
+            status.HTTP_422_UNPROCESSABLE_ENTITY: {
+                "description": "Error: Unprocessable entity",
+                "model": ExceptionResponse,
+            },
+        },
+        response_model=MedicationAdherenceCommBatchResponse,
+    )
+    async def get_medication_adherence_comm_batch(
+        self,
+        _: Request,
+        request_body: MedicationAdherenceCommBatchRequest,
+    ) -> JSONResponse:
+        logging.info(
+            {
+                "message": (
+                    "Request Received - "
+                    f"{self.get_medication_adherence_comm_batch.__name__}"
+                ),
+                "requests": len(request_body.requests),
+            }
+        )
+
+        try:
+            results = await self.medication_adherence_comm_service.get_communications(  # noqa
+                requests=[
+                    {
+                        "request_uuid": request.request_uuid,
+                        "patient_profile": request.patient_profile,
+                        "use_cache": request.use_cache,
+                    }
+                    for request in request_body.requests
+                ],
+                **(
+                    {"max_concurrency": request_body.max_concurrency}
+                    if request_body.max_concurrency
+                    else {}
+                ),
+            )
+
+            items = [
+                MedicationAdherenceCommBatchItem(**result)
+                for result in results
+            ]
+            failed = sum(item.error is not None for item in items)
+
+            return JSONResponse(
+                status_code=status.HTTP_200_OK,
+                content=MedicationAdherenceCommBatchResponse(
+                    succeeded=len(items) - failed,
+                    failed=failed,
+                    items=items,
+                ).model_dump(),
+            )
+
+        except Exception as base_exception:
+            raise CommunicationServiceException(base_exception=base_exception)
+
+    @controller.router.post(
+        CommunicationRoutersPath.MEDICATION_ADHERENCE_STREAM,
+        summary=(
+            "Stream medication adherence communications for many patients "
+            "as NDJSON or server-sent events, followed by a summary record"
+        ),
+        tags=["Communication"],
+        responses={
+            status.HTTP_422_UNPROCESSABLE_ENTITY: {
+                "description": "Error: Unprocessable entity",
+                "model": ExceptionResponse,
+            },
+        },
+    )
+    async def stream_medication_adherence_comm_batch(
+        self,
+        _: Request,
+        request_body: MedicationAdherenceCommBatchRequest,
+        stream_format: StreamFormat = StreamFormat.NDJSON,
+    ) -> StreamingResponse:
+        logging.info(
+            {
+                "message": (
+                    "Request Received - "
+                    f"{self.stream_medication_adherence_comm_batch.__name__}"
+                ),
+                "requests": len(request_body.requests),
+                "stream_format": stream_format,
+            }
+        )
+
+        items = self.medication_adherence_comm_service.iter_communications(
+            requests=(
+                {
+                    "request_uuid": request.request_uuid,
+                    "patient_profile": request.patient_profile,
+                    "use_cache": request.use_cache,
+                }
+                for request in request_body.requests
+            ),
+            **(
+                {"max_concurrency": request_body.max_concurrency}
+                if request_body.max_concurrency
+                else {}
+            ),
+        )
+
+        return StreamingResponse(
+            stream_batch_items(items, stream_format=stream_format),
+            media_type=STREAM_MEDIA_TYPES[stream_format],
+        )
+
     @controller.router.post(
         CommunicationRoutersPath.SUCCESS,
         summary=(
@@ -129,6 +357,7 @@ class CommunicationController:
                     low_success_examples_id=(
                         request_body.low_success_examples_id
                     ),
+                    request_uuid=request_body.request_uuid,
                 )
 
             return JSONResponse(
@@ -140,3 +369,100 @@ class CommunicationController:
 
         except Exception as base_exception:
             raise CommunicationServiceException(base_exception=base_exception)
+
+    @controller.router.post(
+        CommunicationRoutersPath.SUCCESS_BATCH,
+        summary=(
+            "Update messages pool success likelihoods based on a batch of "
+            "communication results, persisted in a single write."
+        ),
+        tags=["Communication"],
+        responses={
+            status.HTTP_500_INTERNAL_SERVER_ERROR: {
+                "description": "Error: Bad request",
+                "model": ExceptionResponse,
+            },
+            status.HTTP_422_UNPROCESSABLE_ENTITY: {
+                "description": "Error: Unprocessable entity",
+                "model": ExceptionResponse,
+            },
+        },
+        response_model=CommunicationSuccessBatchResponse,
+    )
+    async def update_communication_success_likelihood_batch(
+        self,
+        _: Request,
+        request_body: CommunicationSuccessBatchRequest,
+    ) -> JSONResponse:
+        logging.info(
+            {
+                "message": (
+                    "Request Received - "
+                    f"{self.update_communication_success_likelihood_batch.__name__}"  # noqa
+                ),
+                "outcomes": len(request_body.outcomes),
+            }
+        )
+
+        try:
+            items = [None] * len(request_body.outcomes)
+
+            medication_adherence_positions = []
+            for position, outcome in enumerate(request_body.outcomes):
+                if (
+                    outcome.communication_use_case
+                    == CommunicationUseCase.MEDICATION_ADHERENCE
+                ):
+                    medication_adherence_positions.append(position)
+                else:
+                    items[position] = CommunicationSuccessItemResponse(
+                        request_uuid=outcome.request_uuid,
+                        status=CommunicationSuccessStatus.SKIPPED,
+                        detail=(
+                            "Unsupported communication use case: "
+                            f"{outcome.communication_use_case}"
+                        ),
+                    )
+
+            if medication_adherence_positions:
+                results = await self.medication_adherence_comm_service.act_on_communication_results(  # noqa
+                    [
+                        request_body.outcomes[position].model_dump(
+                            mode="json", exclude={"communication_use_case"}
+                        )
+                        for position in medication_adherence_positions
+                    ]
+                )
+                for position, result in zip(
+                    medication_adherence_positions, results
+                ):
+                    items[position] = CommunicationSuccessItemResponse(
+                        status=(
+                            CommunicationSuccessStatus.UPDATED
+                            if result["updated_examples_id"]
+                            else CommunicationSuccessStatus.SKIPPED
+                        ),
+                        detail=(
+                            None
+                            if result["updated_examples_id"]
+                            else "No known examples to update"
+                        ),
+                        **result,
+                    )
+
+            updated = sum(
+                item.status == CommunicationSuccessStatus.UPDATED
+                for item in items
+            )
+
+            return JSONResponse(
+                status_code=status.HTTP_200_OK,
+                content=CommunicationSuccessBatchResponse(
+                    updated=updated,
+                    skipped=len(items) - updated,
+                    items=items,
+                ).model_dump(mode="json"),
+            )
+
+        except Exception as base_exception:
+            raise CommunicationServiceException(base_exception=base_exception)
@@ -1,4 +1,5 @@
 import logging
+from typing import Optional
 
 from fastapi import Request
 from fastapi.responses import JSONResponse
@@ -25,6 +26,37 @@ class CommunicationServiceException(Exception):
         }
 
 
+class ServiceNotReadyException(Exception):
+    def __init__(self, error: Optional[str] = None):
+        self.error = error
+        self.message = (
+            f"Service failed to start: {error}"
+            if error
+            else "Service is warming up"
+        )
+
+    def __str__(self):
+        return self.message
+
+
+# Seconds clients are asked to wait before retrying during warmup
+SERVICE_NOT_READY_RETRY_AFTER_SECONDS = 5
+
+
+async def service_not_ready_exception_handler(
+    _: Request, exception: ServiceNotReadyException
+):
+    logging.warning(str(exception))
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content=ExceptionResponse(
+            content=exception.message,
+            code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        ).model_dump(),
+        headers={"Retry-After": str(SERVICE_NOT_READY_RETRY_AFTER_SECONDS)},
+    )
+
+
 async def service_exception_handler(
     _: Request, exception: CommunicationServiceException
 ):
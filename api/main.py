@@ -5,11 +5,18 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi_router_controller import ControllersTags
 
-from api.controllers import CommunicationController
+from api.controllers import (
+    CommunicationController,
+    HealthController,
+    MetricsController,
+)
 from api.exception import (
     CommunicationServiceException,
+    ServiceNotReadyException,
     service_exception_handler,
+    service_not_ready_exception_handler,
 )
+from api.services import service_registry
 
 faulthandler.enable()
 
@@ -17,8 +24,12 @@ faulthandler.enable()
 @asynccontextmanager
 async def lifespan(_: FastAPI):
     logging.info("Application started.")
+    # Services load in the background; readiness reports when they are done
+    service_registry.start_warmup()
     yield
     logging.info("Shutting down...")
+    # Flushes pending success likelihood updates and closes HTTP clients
+    await service_registry.aclose()
 
 
 def create_application() -> FastAPI:
@@ -31,10 +42,15 @@ def create_application() -> FastAPI:
     )
 
     application.include_router(CommunicationController.router())
+    application.include_router(HealthController.router())
+    application.include_router(MetricsController.router())
 
     application.add_exception_handler(
         CommunicationServiceException, service_exception_handler
     )
+    application.add_exception_handler(
+        ServiceNotReadyException, service_not_ready_exception_handler
+    )
 
     return application
 
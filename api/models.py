@@ -1,8 +1,9 @@
-from typing import Dict, List, Union
+from typing import Dict, List, Optional, Union
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 from communication.schema import CommunicationUseCase, PatientProfile
+from communication.utils import StrEnum
 
 
 class ExceptionResponse(BaseModel):
@@ -13,6 +14,9 @@ class ExceptionResponse(BaseModel):
 class MedicationAdherenceCommRequest(BaseModel):
     request_uuid: str
     patient_profile: PatientProfile
+    # Set to False to always call the LLM instead of reusing a message
+    # generated for an identical profile and examples
+    use_cache: bool = True
 
 
 class MedicationAdherenceCommResponse(BaseModel):
@@ -23,9 +27,66 @@ class MedicationAdherenceCommResponse(BaseModel):
     metadata: Dict
 
 
+class MedicationAdherenceCommBatchRequest(BaseModel):
+    requests: List[MedicationAdherenceCommRequest]
+    max_concurrency: Optional[int] = Field(default=None, gt=0)
+
+
+class MedicationAdherenceCommBatchItem(BaseModel):
+    request_uuid: str
+    response: Optional[MedicationAdherenceCommResponse] = None
+    error: Optional[str] = None
+
+
+class MedicationAdherenceCommBatchResponse(BaseModel):
+    succeeded: int
+    failed: int
+    items: List[MedicationAdherenceCommBatchItem]
+
+
+class StreamFormat(StrEnum):
+    NDJSON = "ndjson"
+    SSE = "sse"
+
+
+class StreamRecordType(StrEnum):
+    RESULT = "result"
+    SUMMARY = "summary"
+
+
+class MedicationAdherenceCommStreamSummary(BaseModel):
+    succeeded: int
+    failed: int
+    elapsed_seconds: float
+    error: Optional[str] = None
+
+
 class CommunicationSuccessRequest(BaseModel):
     communication_use_case: CommunicationUseCase
     request_uuid: str
     high_success_examples_id: List[int]
     low_success_examples_id: List[int]
     was_successful: bool
+
+
+class CommunicationSuccessBatchRequest(BaseModel):
+    outcomes: List[CommunicationSuccessRequest]
+
+
+class CommunicationSuccessStatus(StrEnum):
+    UPDATED = "updated"
+    SKIPPED = "skipped"
+
+
+class CommunicationSuccessItemResponse(BaseModel):
+    request_uuid: str
+    status: CommunicationSuccessStatus
+    updated_examples_id: List[int] = []
+    unknown_examples_id: List[int] = []
+    detail: Optional[str] = None
+
+
+class CommunicationSuccessBatchResponse(BaseModel):
+    updated: int
+    skipped: int
+    items: List[CommunicationSuccessItemResponse]
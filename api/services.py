@@ -0,0 +1,82 @@
+import asyncio
+import importlib
+import logging
+import time
+from typing import TYPE_CHECKING, Optional
+
+from api.exception import ServiceNotReadyException
+
+if TYPE_CHECKING:
+    from communication.medication_adherence import (
+        MedicationAdherenceCommunication,
+    )
+
+
+class ServiceRegistry:
+    """
+    Owns the communication services for the application lifespan. They are
+    built by a background warmup task, so the process answers liveness
+    probes while the index and dataset load.
+    """
+
+    def __init__(self):
+        self.medication_adherence_comm_service: Optional[
+            "MedicationAdherenceCommunication"
+        ] = None
+        self.warmup_error: Optional[str] = None
+        self.warmup_seconds: Optional[float] = None
+
+        self._warmup_task: Optional[asyncio.Task] = None
+
+    @property
+    def is_ready(self) -> bool:
+        return self.medication_adherence_comm_service is not None
+
+    def start_warmup(self) -> asyncio.Task:
+        self._warmup_task = asyncio.create_task(self._warmup())
+        return self._warmup_task
+
+    def get_medication_adherence_comm_service(
+        self,
+    ) -> "MedicationAdherenceCommunication":
+        if not self.is_ready:
+            raise ServiceNotReadyException(error=self.warmup_error)
+        return self.medication_adherence_comm_service
+
+    async def aclose(self) -> None:
+        if self._warmup_task is not None and not self._warmup_task.done():
+            self._warmup_task.cancel()
+            try:
+                await self._warmup_task
+            except asyncio.CancelledError:
+                pass
+
+        if self.medication_adherence_comm_service is not None:
+            await self.medication_adherence_comm_service.aclose()
+            self.medication_adherence_comm_service = None
+
+    async def _warmup(self) -> None:
+        logging.info("Warming up communication services...")
+        start = time.perf_counter()
+
+        try:
+            # Imported in a worker thread: the module pulls in the vector
+            # store and LLM client libraries
+            medication_adherence = await asyncio.to_thread(
+                importlib.import_module, "communication.medication_adherence"
+            )
+            self.medication_adherence_comm_service = (
+                await medication_adherence.MedicationAdherenceCommunication.create()  # noqa
+            )
+        except Exception as e:
+            logging.exception("Communication services warmup failed.")
+            self.warmup_error = str(e)
+            return
+
+        self.warmup_seconds = time.perf_counter() - start
+        logging.info(
+            f"Communication services ready in {self.warmup_seconds:.2f}s."
+        )
+
+
+service_registry = ServiceRegistry()
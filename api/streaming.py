@@ -0,0 +1,65 @@
+import json
+import time
+from typing import AsyncIterator, Dict
+
+from api.models import (
+    MedicationAdherenceCommBatchItem,
+    MedicationAdherenceCommStreamSummary,
+    StreamFormat,
+    StreamRecordType,
+)
+
+STREAM_MEDIA_TYPES = {
+    StreamFormat.NDJSON: "application/x-ndjson",
+    StreamFormat.SSE: "text/event-stream",
+}
+
+
+def format_stream_record(
+    stream_format: StreamFormat, record_type: StreamRecordType, data: Dict
+) -> str:
+    if stream_format == StreamFormat.SSE:
+        payload = json.dumps(data, ensure_ascii=False)
+        return f"event: {record_type}\ndata: {payload}\n\n"
+
+    payload = json.dumps(
+        {"type": record_type, "data": data}, ensure_ascii=False
+    )
+    return f"{payload}\n"
+
+
+async def stream_batch_items(
+    items: AsyncIterator[Dict], stream_format: StreamFormat
+) -> AsyncIterator[str]:
+    """
+    Format each batch item as soon as it is produced and finish with a
+    summary record. An error that stops the stream is reported in the
+    summary, since the response status has already been sent.
+    """
+    start = time.perf_counter()
+    succeeded, failed, error = 0, 0, None
+
+    try:
+        async for item in items:
+            item = MedicationAdherenceCommBatchItem(**item)
+            if item.error is None:
+                succeeded += 1
+            else:
+                failed += 1
+
+            yield format_stream_record(
+                stream_format, StreamRecordType.RESULT, item.model_dump()
+            )
+
+    except Exception as e:
+        error = str(e)
+
+    summary = MedicationAdherenceCommStreamSummary(
+        succeeded=succeeded,
+        failed=failed,
+        elapsed_seconds=time.perf_counter() - start,
+        error=error,
+    )
+    yield format_stream_record(
+        stream_format, StreamRecordType.SUMMARY, summary.model_dump()
+    )
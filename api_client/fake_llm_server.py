@@ -0,0 +1,177 @@
+"""
+Stand-in for the OpenAI chat completions and embeddings endpoints, so the
+service can be load tested without OpenAI access. Completions are derived
+from a hash of the request and embeddings from the features of the input,
+so similar patient profiles still retrieve each other. Responses are
+returned after a configurable latency.
+
+Usage:
+    uvicorn api_client.fake_llm_server:app --port 8081
+    OPENAI_BASE_URL=http://localhost:8081/v1 make launch-app
+"""
+
+import asyncio
+import base64
+import json
+import os
+import random
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Union
+
+import numpy as np
+from fastapi import FastAPI, Request
+
+from communication.utils import canonical_json, hash_text
+
+# Latency added to every response, e.g. to mimic the real API
+LATENCY_MS = float(os.environ.get("FAKE_LLM_LATENCY_MS", "0"))
+LATENCY_JITTER_MS = float(os.environ.get("FAKE_LLM_LATENCY_JITTER_MS", "0"))
+# text-embedding-3-small dimension
+EMBEDDING_DIMENSION = 1536
+COMPLETION_TOKENS = 40
+CHARS_PER_TOKEN = 4
+
+app = FastAPI(title="Fake LLM server")
+
+
+def build_chat_completion(body: Dict) -> Dict:
+    """Chat completion whose content is a JSON message and explanation."""
+    digest = hash_text(canonical_json(body["messages"]))[:8]
+    prompt_tokens = sum(
+        len(message["content"]) // CHARS_PER_TOKEN
+        for message in body["messages"]
+    )
+    content = json.dumps(
+        {
+            "message": f"Hi, remember to take your medication ({digest}).",
+            "explanation": "Generated by the fake LLM server.",
+        }
+    )
+
+    return {
+        "id": f"chatcmpl-{digest}",
+        "object": "chat.completion",
+        "created": 0,
+        "model": body["model"],
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": COMPLETION_TOKENS,
+            "total_tokens": prompt_tokens + COMPLETION_TOKENS,
+        },
+    }
+
+
+def build_embeddings(body: Dict) -> Dict:
+    """
+    Unit vectors for each input, which may be a text or token ids. The
+    OpenAI client asks for base64 encoded floats by default.
+    """
+    inputs = body["input"]
+    if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+        inputs = [inputs]
+
+    data = []
+    for position, text in enumerate(inputs):
+        vector = embed(text, body.get("dimensions") or EMBEDDING_DIMENSION)
+        data.append(
+            {
+                "object": "embedding",
+                "index": position,
+                "embedding": (
+                    base64.b64encode(vector.tobytes()).decode()
+                    if body.get("encoding_format") == "base64"
+                    else vector.tolist()
+                ),
+            }
+        )
+
+    tokens = sum(
+        len(text) if isinstance(text, list) else len(text) // CHARS_PER_TOKEN
+        for text in inputs
+    )
+    return {
+        "object": "list",
+        "data": data,
+        "model": body["model"],
+        "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+    }
+
+
+def embed(text: Union[str, List[int]], dimension: int) -> np.ndarray:
+    """
+    Sum of a pseudo-random vector per feature of the input, normalized.
+    Inputs sharing features get similar vectors, as with a real model.
+    """
+    vector = np.zeros(dimension, dtype=np.float32)
+    for feature in get_features(text) or [""]:
+        vector += get_feature_vector(feature, dimension)
+    return vector / np.linalg.norm(vector)
+
+
+def get_features(text: Union[str, List[int]]) -> List[str]:
+    """
+    Field names and field values of a JSON input (such as a patient
+    profile), otherwise its words or token ids.
+    """
+    if not isinstance(text, str):
+        return [str(token) for token in text]
+
+    try:
+        document = json.loads(text)
+    except ValueError:
+        return text.split()
+
+    features = []
+    for key, value in _iter_fields(document):
+        features.extend([key, f"{key}={json.dumps(value)}"])
+    return features
+
+
+def _iter_fields(document: Any, key: str = "") -> Iterator:
+    if isinstance(document, dict):
+        for child_key, value in document.items():
+            yield from _iter_fields(value, child_key)
+    elif isinstance(document, list):
+        for value in document:
+            yield from _iter_fields(value, key)
+    else:
+        yield key, document
+
+
+@lru_cache(maxsize=4096)
+def get_feature_vector(feature: str, dimension: int) -> np.ndarray:
+    seed = int(hash_text(feature)[:8], 16)
+    vector = np.random.default_rng(seed).standard_normal(
+        dimension, dtype=np.float32
+    )
+    vector.flags.writeable = False
+    return vector
+
+
+async def simulate_latency() -> None:
+    latency_ms = LATENCY_MS + random.uniform(
+        -LATENCY_JITTER_MS, LATENCY_JITTER_MS
+    )
+    if latency_ms > 0:
+        await asyncio.sleep(latency_ms / 1000)
+
+
+@app.post("/v1/chat/completions")
+async def create_chat_completion(request: Request) -> Dict:
+    body = await request.json()
+    await simulate_latency()
+    return build_chat_completion(body)
+
+
+@app.post("/v1/embeddings")
+async def create_embeddings(request: Request) -> Dict:
+    body = await request.json()
+    await simulate_latency()
+    return build_embeddings(body)
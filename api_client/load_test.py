@@ -0,0 +1,310 @@
+"""
+Load test the communication API: each scenario generates a medication
+adherence message for a random test patient and, for a share of them,
+reports its outcome to the success endpoint. Scenarios run either at a
+target rate (`--rps`, open loop) or back to back on `--concurrency` workers
+(closed loop), over one pooled async HTTP client.
+
+Reports p50/p95/p99 latency, throughput and error rate per endpoint. At a
+target rate, latency is measured from each scenario's scheduled start, so
+time spent waiting for one of the `--concurrency` slots is included
+(avoiding coordinated omission); scenarios that had to wait are reported
+as delayed, and those still waiting when the test ends as dropped. Run
+the service against `api_client/fake_llm_server.py` to test its capacity
+without OpenAI access.
+
+Usage:
+    python -m api_client.load_test --concurrency 32 --duration 60
+    python -m api_client.load_test --rps 20 --duration 60 --no-cache
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+import numpy as np
+
+from api_client.medication_adherence import (
+    LOCALHOST_BASE_URL,
+    build_adherence_success_body,
+    build_medication_adherence_body,
+    get_random_patient,
+)
+from communication.utils import StrEnum
+
+DEFAULT_CONCURRENCY = 16
+DEFAULT_DURATION_SECONDS = 30
+# Share of generated messages whose outcome is reported
+DEFAULT_FEEDBACK_RATIO = 1.0
+REQUEST_TIMEOUT_SECONDS = 120
+READY_TIMEOUT_SECONDS = 300
+READY_POLL_INTERVAL_SECONDS = 1
+
+
+class LoadTestPath(StrEnum):
+    GENERATE = "/communication/medication-adherence"
+    SUCCESS = "/communication/success"
+    READINESS = "/communication/health/ready"
+
+
+class LoadTestStats:
+    """Latencies and errors per endpoint path."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, Dict[str, int]] = {}
+
+    def record(
+        self, path: str, latency: float, error: Optional[str] = None
+    ) -> None:
+        if error is None:
+            self.latencies.setdefault(path, []).append(latency)
+        else:
+            errors = self.errors.setdefault(path, {})
+            errors[error] = errors.get(error, 0) + 1
+
+    def summary(self, elapsed_seconds: float) -> Dict:
+        summary = {}
+        for path in sorted(set(self.latencies) | set(self.errors)):
+            latencies = self.latencies.get(path, [])
+            errors = self.errors.get(path, {})
+            requests = len(latencies) + sum(errors.values())
+
+            summary[path] = {
+                "requests": requests,
+                "succeeded": len(latencies),
+                "error_rate": sum(errors.values()) / requests,
+                "errors": errors,
+                "throughput_rps": len(latencies) / elapsed_seconds,
+                **{
+                    f"p{percentile}_ms": (
+                        float(np.percentile(latencies, percentile) * 1000)
+                        if latencies
+                        else None
+                    )
+                    for percentile in (50, 95, 99)
+                },
+            }
+        return summary
+
+
+async def post(
+    client: httpx.AsyncClient,
+    stats: LoadTestStats,
+    path: str,
+    body: Dict,
+    scheduled_at: Optional[float] = None,
+) -> Optional[Dict]:
+    # Latency counts from the scheduled send time, when there is one
+    start = time.perf_counter() if scheduled_at is None else scheduled_at
+    try:
+        response = await client.post(path, json=body)
+        response.raise_for_status()
+    except httpx.HTTPStatusError as e:
+        error = f"HTTP {e.response.status_code}"
+    except httpx.HTTPError as e:
+        error = type(e).__name__
+    else:
+        stats.record(path, time.perf_counter() - start)
+        return response.json()
+
+    stats.record(path, time.perf_counter() - start, error=error)
+    return None
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    stats: LoadTestStats,
+    use_cache: bool,
+    feedback_ratio: float,
+    scheduled_at: Optional[float] = None,
+) -> None:
+    request_body = build_medication_adherence_body(get_random_patient())
+    request_body["use_cache"] = use_cache
+
+    result = await post(
+        client, stats, LoadTestPath.GENERATE, request_body, scheduled_at
+    )
+    if result is None or random.random() >= feedback_ratio:
+        return
+
+    await post(
+        client,
+        stats,
+        LoadTestPath.SUCCESS,
+        build_adherence_success_body(
+            was_successful=random.random() < 0.5,
+            request_uuid=result["request_uuid"],
+            low_success_examples_id=result["low_success_examples_id"],
+            high_success_examples_id=result["high_success_examples_id"],
+        ),
+    )
+
+
+async def wait_until_ready(client: httpx.AsyncClient, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            response = await client.get(LoadTestPath.READINESS)
+            if response.status_code == 200:
+                return
+            if response.json().get("status") == "failed":
+                raise RuntimeError(
+                    f"Service warmup failed: {response.json()['error']}"
+                )
+        except httpx.HTTPError:
+            pass
+
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Service not ready after {timeout}s.")
+        await asyncio.sleep(READY_POLL_INTERVAL_SECONDS)
+
+
+async def run_load_test(
+    client: httpx.AsyncClient,
+    duration_seconds: float,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    rps: Optional[float] = None,
+    max_scenarios: Optional[int] = None,
+    use_cache: bool = True,
+    feedback_ratio: float = DEFAULT_FEEDBACK_RATIO,
+) -> Dict:
+    """
+    Run scenarios for `duration_seconds` (or until `max_scenarios` started)
+    and return the summary. With `rps`, scenarios are scheduled at that
+    rate with at most `concurrency` in flight, and their latency includes
+    any wait for a free slot; otherwise `concurrency` workers run them
+    back to back.
+    """
+    stats = LoadTestStats()
+    started = 0
+    delayed = 0
+    dropped = 0
+    start = time.perf_counter()
+    deadline = start + duration_seconds
+
+    def can_start() -> bool:
+        return time.perf_counter() < deadline and (
+            max_scenarios is None or started < max_scenarios
+        )
+
+    def scenario(scheduled_at: Optional[float] = None):
+        return run_scenario(
+            client, stats, use_cache, feedback_ratio, scheduled_at
+        )
+
+    if rps is None:
+
+        async def worker():
+            nonlocal started
+            while can_start():
+                started += 1
+                await scenario()
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    else:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def scheduled_scenario(scheduled_at: float):
+            nonlocal delayed, dropped
+            if semaphore.locked():
+                delayed += 1
+            async with semaphore:
+                if time.perf_counter() >= deadline:
+                    dropped += 1
+                    return
+                await scenario(scheduled_at)
+
+        tasks = []
+        # The schedule does not wait for free slots, so the scenario rate
+        # stays at `rps` however slow the service is
+        while (max_scenarios is None or started < max_scenarios) and (
+            start + started / rps < deadline
+        ):
+            scheduled_at = start + started / rps
+            await asyncio.sleep(max(scheduled_at - time.perf_counter(), 0))
+            tasks.append(asyncio.create_task(scheduled_scenario(scheduled_at)))
+            started += 1
+        await asyncio.gather(*tasks)
+
+    elapsed_seconds = time.perf_counter() - start
+    return {
+        "scenarios": started,
+        "elapsed_seconds": elapsed_seconds,
+        "concurrency": concurrency,
+        "target_rps": rps,
+        "delayed_scenarios": delayed,
+        "dropped_scenarios": dropped,
+        "endpoints": stats.summary(elapsed_seconds),
+    }
+
+
+async def main_async(args: argparse.Namespace) -> Dict:
+    async with httpx.AsyncClient(
+        base_url=args.base_url,
+        limits=httpx.Limits(
+            max_connections=args.concurrency,
+            max_keepalive_connections=args.concurrency,
+        ),
+        timeout=REQUEST_TIMEOUT_SECONDS,
+    ) as client:
+        await wait_until_ready(client, READY_TIMEOUT_SECONDS)
+        return await run_load_test(
+            client=client,
+            duration_seconds=args.duration,
+            concurrency=args.concurrency,
+            rps=args.rps,
+            max_scenarios=args.requests,
+            use_cache=args.use_cache,
+            feedback_ratio=args.feedback_ratio,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--base-url", default=LOCALHOST_BASE_URL)
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument(
+        "--rps",
+        type=float,
+        default=None,
+        help="Target scenarios per second (open loop).",
+    )
+    parser.add_argument(
+        "--duration", type=float, default=DEFAULT_DURATION_SECONDS
+    )
+    parser.add_argument(
+        "--requests",
+        type=int,
+        default=None,
+        help="Stop after this many scenarios.",
+    )
+    parser.add_argument(
+        "--feedback-ratio", type=float, default=DEFAULT_FEEDBACK_RATIO
+    )
+    parser.add_argument(
+        "--no-cache",
+        dest="use_cache",
+        action="store_false",
+        help="Bypass the generated message cache on every request.",
+    )
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+
+    report = asyncio.run(main_async(args))
+    print(json.dumps(report, indent=2))
+
+    if args.output is not None:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,521 @@
+"""
+Benchmark every stage of the medication adherence pipeline on synthetic
+datasets: knowledge base load, index build, similar profile query, example
+selection, prompt render, chat completion, feedback update and persistence.
+
+No network access is needed: profiles are embedded with a deterministic
+fake model and completions are answered by a fake chat backend mounted on
+the `ChatModel` HTTP client. Dataset sizes are message pool rows (the real
+dataset has 375), with one patient per `MESSAGES_PER_PATIENT` rows. Sizes
+in the millions need several GB of memory and disk.
+
+Results are written as JSON, tagged with the git commit, so runs can be
+compared with `--compare`.
+
+Usage:
+    python -m benchmarks.pipeline --sizes 375 10000 1000000 10000000
+    python -m benchmarks.pipeline --compare benchmarks/results/<commit>.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import random
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from api_client.fake_llm_server import build_chat_completion
+from benchmarks.vector_index import (
+    HashEmbeddings,
+    generate_profiles,
+    percentile_ms,
+    timed,
+)
+from communication.chat_model import ChatModel, generate_message
+from communication.config import DATA_DIR
+from communication.medication_adherence import (
+    FEEDBACK_LOG_MAX_ENTRIES,
+    HIGH_SUCCESS_MESSAGES_COUNT,
+    LOW_SUCCESS_MESSAGES_COUNT,
+    PATIENTS_FILE_JQ_SCHEMA,
+    PROMPT_TEMPLATE_MED_ADHERENCE,
+    TOP_N_PATIENTS,
+    MedicationAdherenceCommunication,
+)
+from communication.message_store import JsonMessageStore, MessageStore
+from communication.rate_limiter import RateLimiter
+from communication.sqlite_message_store import (
+    SQLiteMessageStore,
+    migrate_json_to_sqlite,
+)
+from communication.utils import canonical_json, load_json_file
+from communication.vector_database import VectorDatabase
+from communication.vector_index import VectorIndexBackend
+
+DEFAULT_SIZES = [375, 10_000, 100_000]
+DEFAULT_DIMENSION = 64
+DEFAULT_QUERIES = 200
+DEFAULT_BATCH_SIZE = 64
+DEFAULT_RESULTS_DIR = Path(__file__).parent / "results"
+MESSAGES_PER_PATIENT = 25
+SCORE_THRESHOLD = 0.0
+UPDATE_DELTA = 0.05
+
+# Fake chat backend, with rate limits high enough to never throttle
+FAKE_CHAT_MODEL = "fake-chat-model"
+FAKE_CHAT_RATE_LIMITS = {
+    "requests_per_minute": 10_000_000,
+    "tokens_per_minute": 10_000_000_000,
+}
+
+
+def fake_chat_completion(request: httpx.Request) -> httpx.Response:
+    """Answer a chat completion request like the fake LLM server does."""
+    return httpx.Response(
+        200, json=build_chat_completion(json.loads(request.content))
+    )
+
+
+def build_fake_chat_model() -> ChatModel:
+    return ChatModel(
+        openai_key="benchmark",
+        http_client=httpx.AsyncClient(
+            transport=httpx.MockTransport(fake_chat_completion)
+        ),
+        rate_limiter=RateLimiter(**FAKE_CHAT_RATE_LIMITS),
+    )
+
+
+def write_dataset(directory: Path, size: int, seed: int = 0) -> List[Dict]:
+    """
+    Write `patients.json` and `medication_adherence.json` with `size`
+    message pool rows. Rows are streamed so large datasets are not held
+    twice in memory. Returns the patient profiles.
+    """
+    patients = -(-size // MESSAGES_PER_PATIENT)
+    profiles = generate_profiles(patients, seed=seed)
+    messages = load_json_file(DATA_DIR / "messages.json")
+    rng = random.Random(seed)
+
+    with open(directory / "patients.json", "w", encoding="utf-8") as f:
+        json.dump(
+            [
+                {"id": patient_id, "profile": profile}
+                for patient_id, profile in enumerate(profiles, start=1)
+            ],
+            f,
+        )
+
+    with open(
+        directory / "medication_adherence.json", "w", encoding="utf-8"
+    ) as f:
+        f.write("[\n")
+        for row_id in range(size):
+            patient_id = row_id // MESSAGES_PER_PATIENT + 1
+            message = messages[row_id % len(messages)]
+            row = {
+                "id": row_id,
+                "patient_id": patient_id,
+                "message_id": message["id"],
+                "patient_profile": profiles[patient_id - 1],
+                "message": message["message"],
+                "reasoning": "Synthetic benchmark row.",
+                "success_likelihood": round(rng.random(), 2),
+            }
+            f.write(("" if row_id == 0 else ",\n") + json.dumps(row))
+        f.write("\n]\n")
+
+    return profiles
+
+
+def benchmark_retrieval(
+    directory: Path,
+    query_profiles: List[Dict],
+    dimension: int,
+    batch_size: int,
+    backend: VectorIndexBackend,
+) -> Tuple[Dict, List[List[int]]]:
+    embedding = HashEmbeddings(dimension=dimension)
+    vector_db = VectorDatabase(
+        kb_file_name="patients.json",
+        kb_directory_path=directory,
+        embedding_model="fake-embedding-model",
+        openai_key="benchmark",
+        file_jq_schema=PATIENTS_FILE_JQ_SCHEMA,
+        backend=backend,
+        embedding=embedding,
+    )
+
+    documents = None
+
+    def load():
+        nonlocal documents
+        documents = vector_db._load_documents(
+            jq_schema=PATIENTS_FILE_JQ_SCHEMA
+        )
+
+    def build():
+        vector_db._index = vector_db._get_index_from_documents(
+            documents=documents,
+            embedding=embedding,
+            collection_name=f"benchmark-{len(documents)}",
+        )
+
+    # Both already ran in the constructor, timed here on their own
+    kb_load_seconds = timed(load)
+    index_build_seconds = timed(build)
+
+    queries = [canonical_json(profile) for profile in query_profiles]
+
+    async def query_all():
+        latencies = []
+        similar_patient_ids = []
+        for query in queries:
+            start = time.perf_counter()
+            results = await vector_db.aget_documents_with_similarity_score(
+                user_query=query,
+                top_k=TOP_N_PATIENTS,
+                score_threshold=SCORE_THRESHOLD,
+            )
+            latencies.append(time.perf_counter() - start)
+            similar_patient_ids.append([doc.document_id for doc in results])
+
+        start = time.perf_counter()
+        for position in range(0, len(queries), batch_size):
+            end = position + batch_size
+            await vector_db.aget_documents_with_similarity_score_batch(
+                user_queries=queries[position:end],
+                top_k=TOP_N_PATIENTS,
+                score_threshold=SCORE_THRESHOLD,
+            )
+        batch_seconds = time.perf_counter() - start
+
+        return latencies, similar_patient_ids, batch_seconds
+
+    latencies, similar_patient_ids, batch_seconds = asyncio.run(query_all())
+
+    return {
+        "kb_load_seconds": kb_load_seconds,
+        "index_build_seconds": index_build_seconds,
+        "query_p50_ms": percentile_ms(latencies, 50),
+        "query_p95_ms": percentile_ms(latencies, 95),
+        "batch_queries_per_second": len(queries) / batch_seconds,
+    }, similar_patient_ids
+
+
+def benchmark_message_store(
+    store: MessageStore, similar_patient_ids: List[List[int]]
+) -> Tuple[Dict, List[Tuple[List[Dict], List[Dict]]]]:
+    examples = []
+    selection_latencies = []
+    for patient_ids in similar_patient_ids:
+        start = time.perf_counter()
+        examples.append(
+            store.select_examples(
+                patient_ids=patient_ids,
+                high_count=HIGH_SUCCESS_MESSAGES_COUNT,
+                low_count=LOW_SUCCESS_MESSAGES_COUNT,
+            )
+        )
+        selection_latencies.append(time.perf_counter() - start)
+
+    async def update_all():
+        latencies = []
+        for high_success_messages, low_success_messages in examples:
+            deltas = {row["id"]: UPDATE_DELTA for row in high_success_messages}
+            deltas.update(
+                {row["id"]: -UPDATE_DELTA for row in low_success_messages}
+            )
+            feedback = [
+                {
+                    "request_uuid": None,
+                    "was_successful": True,
+                    "high_success_examples_id": [
+                        row["id"] for row in high_success_messages
+                    ],
+                    "low_success_examples_id": [
+                        row["id"] for row in low_success_messages
+                    ],
+                }
+            ]
+
+            start = time.perf_counter()
+            await store.apply_deltas(deltas=deltas, feedback=feedback)
+            latencies.append(time.perf_counter() - start)
+
+        return latencies
+
+    update_latencies = asyncio.run(update_all())
+
+    return {
+        "example_selection_p50_ms": percentile_ms(selection_latencies, 50),
+        "example_selection_p95_ms": percentile_ms(selection_latencies, 95),
+        "feedback_update_p50_ms": percentile_ms(update_latencies, 50),
+        "feedback_update_p95_ms": percentile_ms(update_latencies, 95),
+    }, examples
+
+
+def benchmark_json_store(
+    directory: Path, similar_patient_ids: List[List[int]]
+) -> Tuple[Dict, List[Tuple[List[Dict], List[Dict]]]]:
+    store = None
+
+    def load():
+        nonlocal store
+        store = JsonMessageStore(
+            snapshot_path=directory / "medication_adherence.json",
+            max_log_entries=FEEDBACK_LOG_MAX_ENTRIES,
+        )
+
+    load_seconds = timed(load)
+    result, examples = benchmark_message_store(store, similar_patient_ids)
+
+    # The snapshot rewrite done when the feedback log is compacted
+    persistence_seconds = timed(
+        lambda: asyncio.run(store.feedback_log.compact(store.rows))
+    )
+
+    return {
+        "json_store_load_seconds": load_seconds,
+        **{f"json_{key}": value for key, value in result.items()},
+        "json_persistence_seconds": persistence_seconds,
+    }, examples
+
+
+def benchmark_sqlite_store(
+    directory: Path, similar_patient_ids: List[List[int]]
+) -> Dict:
+    database_path = directory / "medication_adherence.sqlite3"
+    migration_seconds = timed(
+        lambda: migrate_json_to_sqlite(
+            directory / "medication_adherence.json", database_path
+        )
+    )
+
+    store = SQLiteMessageStore(database_path=database_path)
+    result, _ = benchmark_message_store(store, similar_patient_ids)
+    asyncio.run(store.aclose())
+
+    return {
+        "sqlite_migration_seconds": migration_seconds,
+        # Each update is a committed transaction, i.e. already persisted
+        **{f"sqlite_{key}": value for key, value in result.items()},
+    }
+
+
+def benchmark_generation(
+    query_profiles: List[Dict],
+    examples: List[Tuple[List[Dict], List[Dict]]],
+) -> Dict:
+    system_message = PROMPT_TEMPLATE_MED_ADHERENCE.build_system_message()
+
+    user_messages = []
+    render_latencies = []
+    for profile, (high_success_messages, low_success_messages) in zip(
+        query_profiles, examples
+    ):
+        start = time.perf_counter()
+        user_message = MedicationAdherenceCommunication._build_user_message(
+            {**profile, "name": "Alex"},
+            "Alex",
+            high_success_messages,
+            low_success_messages,
+        )
+        PROMPT_TEMPLATE_MED_ADHERENCE.count_tokens(user_message)
+        render_latencies.append(time.perf_counter() - start)
+        user_messages.append(user_message)
+
+    async def complete_all():
+        fake_chat_model = build_fake_chat_model()
+        latencies = []
+        for user_message in user_messages:
+            start = time.perf_counter()
+            await generate_message(
+                chat_model=fake_chat_model,
+                system_message=system_message,
+                user_message=user_message,
+                model=FAKE_CHAT_MODEL,
+                json_format=True,
+            )
+            latencies.append(time.perf_counter() - start)
+        await fake_chat_model.openai_client.close()
+        return latencies
+
+    completion_latencies = asyncio.run(complete_all())
+
+    return {
+        "prompt_render_p50_ms": percentile_ms(render_latencies, 50),
+        "prompt_render_p95_ms": percentile_ms(render_latencies, 95),
+        "completion_p50_ms": percentile_ms(completion_latencies, 50),
+        "completion_p95_ms": percentile_ms(completion_latencies, 95),
+    }
+
+
+def benchmark_size(
+    size: int,
+    query_profiles: List[Dict],
+    dimension: int,
+    batch_size: int,
+    backend: VectorIndexBackend,
+) -> Dict:
+    with tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+        dataset_seconds = timed(lambda: write_dataset(directory, size))
+
+        retrieval, similar_patient_ids = benchmark_retrieval(
+            directory=directory,
+            query_profiles=query_profiles,
+            dimension=dimension,
+            batch_size=batch_size,
+            backend=backend,
+        )
+        json_store, examples = benchmark_json_store(
+            directory, similar_patient_ids
+        )
+        sqlite_store = benchmark_sqlite_store(directory, similar_patient_ids)
+
+    return {
+        "size": size,
+        "patients": -(-size // MESSAGES_PER_PATIENT),
+        "dataset_write_seconds": dataset_seconds,
+        **retrieval,
+        **json_store,
+        **sqlite_store,
+        **benchmark_generation(query_profiles, examples),
+    }
+
+
+def get_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline: Dict, current: Dict) -> None:
+    """Print the ratio current / baseline of every metric, per size."""
+    baseline_results = {
+        result["size"]: result for result in baseline["results"]
+    }
+    for result in current["results"]:
+        previous = baseline_results.get(result["size"])
+        if previous is None:
+            continue
+
+        print(
+            f"size={result['size']} "
+            f"({baseline['commit']} -> {current['commit']})"
+        )
+        for key, value in result.items():
+            if key in ("size", "patients") or not previous.get(key):
+                continue
+            print(
+                f"  {key:<36} {previous[key]:>12.4f} {value:>12.4f} "
+                f"{value / previous[key]:>7.2f}x"
+            )
+
+
+def run(
+    sizes: List[int],
+    dimension: int,
+    queries: int,
+    batch_size: int,
+    backend: VectorIndexBackend,
+    output: Optional[Path] = None,
+    baseline: Optional[Path] = None,
+) -> Dict:
+    # Profiles without a name, as used for retrieval
+    query_profiles = generate_profiles(queries, seed=1)
+
+    results = []
+    for size in sizes:
+        logging.info(f"Benchmarking the pipeline with {size} rows.")
+        result = benchmark_size(
+            size=size,
+            query_profiles=query_profiles,
+            dimension=dimension,
+            batch_size=batch_size,
+            backend=backend,
+        )
+        print(json.dumps(result))
+        results.append(result)
+
+    report = {
+        "commit": get_commit(),
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "dimension": dimension,
+            "queries": queries,
+            "batch_size": batch_size,
+            "backend": str(backend),
+        },
+        "results": results,
+    }
+
+    output = output or DEFAULT_RESULTS_DIR / f"{report['commit']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    logging.info(f"Results written to {output}.")
+
+    if baseline is not None:
+        compare(load_json_file(baseline), report)
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--dimension", type=int, default=DEFAULT_DIMENSION)
+    parser.add_argument("--queries", type=int, default=DEFAULT_QUERIES)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument(
+        "--backend",
+        choices=VectorIndexBackend.list(),
+        default=VectorIndexBackend.NUMPY,
+    )
+    parser.add_argument("--output", type=Path, default=None)
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        help="Log every query, as the service does (slows the queries).",
+    )
+    parser.add_argument(
+        "--compare",
+        type=Path,
+        default=None,
+        help="Previous results file to compare against.",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING
+    )
+    run(
+        sizes=args.sizes,
+        dimension=args.dimension,
+        queries=args.queries,
+        batch_size=args.batch_size,
+        backend=VectorIndexBackend(args.backend),
+        output=args.output,
+        baseline=args.compare,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+Compare the Chroma and NumPy vector index backends on synthetic patient
+profiles. No network access is needed: profiles are sampled from the values
+found in `data/patients.json` and embedded with a deterministic fake model.
+
+Usage:
+    python -m benchmarks.vector_index --sizes 10000 100000 1000000
+"""
+
+import argparse
+import json
+import logging
+import random
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from communication.config import DATA_DIR
+from communication.numpy_vector_index import NumpyVectorIndex
+from communication.utils import batched, hash_text, load_json_file
+from communication.vector_database import ChromaVectorIndex
+from communication.vector_index import VectorIndex, VectorIndexBackend
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+DEFAULT_DIMENSION = 256
+DEFAULT_QUERIES = 200
+DEFAULT_BATCH_SIZE = 100
+TOP_K = 3
+SCORE_THRESHOLD = 0.0
+
+
+class HashEmbeddings(Embeddings):
+    """Deterministic fake embeddings seeded by the hash of each text."""
+
+    def __init__(self, dimension: int):
+        self.dimension = dimension
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        seed = int(hash_text(text)[:8], 16)
+        return (
+            np.random.default_rng(seed)
+            .standard_normal(self.dimension, dtype=np.float32)
+            .tolist()
+        )
+
+
+def generate_profiles(size: int, seed: int = 0) -> List[Dict]:
+    """Sample synthetic profiles from the values seen in the real KB."""
+    patients = load_json_file(DATA_DIR / "patients.json")
+    field_values = {}
+    for patient in patients:
+        for field, value in patient["profile"].items():
+            field_values.setdefault(field, set()).add(value)
+    field_values = {
+        field: sorted(values, key=str)
+        for field, values in field_values.items()
+    }
+
+    rng = random.Random(seed)
+    return [
+        {field: rng.choice(values) for field, values in field_values.items()}
+        for _ in range(size)
+    ]
+
+
+def build_documents(profiles: List[Dict]) -> List[Document]:
+    return [
+        Document(
+            page_content=json.dumps(
+                {"content": profile, "metadata": {"id": index}}
+            ),
+            metadata={
+                "id": index,
+                "primary_medical_condition": profile[
+                    "primary_medical_condition"
+                ],
+            },
+        )
+        for index, profile in enumerate(profiles)
+    ]
+
+
+def build_index(
+    backend: VectorIndexBackend,
+    documents: List[Document],
+    embedding: Embeddings,
+) -> VectorIndex:
+    if backend == VectorIndexBackend.NUMPY:
+        return NumpyVectorIndex(documents=documents, embedding=embedding)
+    return ChromaVectorIndex(
+        collection_name=f"benchmark-{len(documents)}",
+        documents=documents,
+        embedding=embedding,
+    )
+
+
+def timed(function: Callable) -> float:
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def percentile_ms(latencies: List[float], percentile: float) -> float:
+    return float(np.percentile(latencies, percentile) * 1000)
+
+
+def benchmark_backend(
+    backend: VectorIndexBackend,
+    documents: List[Document],
+    query_vectors: List[List[float]],
+    embedding: Embeddings,
+    batch_size: int,
+    retrieval_filter: Dict,
+) -> Dict:
+    index = None
+
+    def build():
+        nonlocal index
+        index = build_index(backend, documents, embedding)
+
+    build_seconds = timed(build)
+
+    latencies = [
+        timed(
+            lambda vector=vector: index.similarity_search_by_vectors(
+                embeddings=[vector], k=TOP_K, score_threshold=SCORE_THRESHOLD
+            )
+        )
+        for vector in query_vectors
+    ]
+
+    filtered_latencies = [
+        timed(
+            lambda vector=vector: index.similarity_search_by_vectors(
+                embeddings=[vector],
+                k=TOP_K,
+                score_threshold=SCORE_THRESHOLD,
+                retrieval_filter=retrieval_filter,
+            )
+        )
+        for vector in query_vectors
+    ]
+
+    batches = list(batched(query_vectors, batch_size))
+    batch_seconds = sum(
+        timed(
+            lambda batch=batch: index.similarity_search_by_vectors(
+                embeddings=batch, k=TOP_K, score_threshold=SCORE_THRESHOLD
+            )
+        )
+        for batch in batches
+    )
+
+    return {
+        "backend": str(backend),
+        "size": len(documents),
+        "build_seconds": build_seconds,
+        "query_p50_ms": percentile_ms(latencies, 50),
+        "query_p95_ms": percentile_ms(latencies, 95),
+        "filtered_query_p50_ms": percentile_ms(filtered_latencies, 50),
+        "batched_queries_per_second": len(query_vectors) / batch_seconds,
+    }
+
+
+def run(
+    sizes: List[int],
+    backends: List[VectorIndexBackend],
+    dimension: int,
+    queries: int,
+    batch_size: int,
+    output: Optional[Path] = None,
+) -> List[Dict]:
+    embedding = HashEmbeddings(dimension=dimension)
+    query_profiles = generate_profiles(queries, seed=1)
+    query_vectors = embedding.embed_documents(
+        [json.dumps(profile) for profile in query_profiles]
+    )
+    retrieval_filter = {
+        "primary_medical_condition": query_profiles[0][
+            "primary_medical_condition"
+        ]
+    }
+
+    results = []
+    for size in sizes:
+        documents = build_documents(generate_profiles(size))
+        for backend in backends:
+            logging.info(f"Benchmarking {backend} with {size} profiles.")
+            result = benchmark_backend(
+                backend=backend,
+                documents=documents,
+                query_vectors=query_vectors,
+                embedding=embedding,
+                batch_size=batch_size,
+                retrieval_filter=retrieval_filter,
+            )
+            print(json.dumps(result))
+            results.append(result)
+
+    if output is not None:
+        output.parent.mkdir(parents=True, exist_ok=True)
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument(
+        "--backends",
+        nargs="+",
+        choices=VectorIndexBackend.list(),
+        default=VectorIndexBackend.list(),
+    )
+    parser.add_argument("--dimension", type=int, default=DEFAULT_DIMENSION)
+    parser.add_argument("--queries", type=int, default=DEFAULT_QUERIES)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    run(
+        sizes=args.sizes,
+        backends=[VectorIndexBackend(backend) for backend in args.backends],
+        dimension=args.dimension,
+        queries=args.queries,
+        batch_size=args.batch_size,
+        output=args.output,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,43 @@
+import asyncio
 import logging
+from functools import lru_cache
+from typing import Dict, List, Optional
 
-from openai import AsyncOpenAI
+import httpx
+from openai import (
+    APIConnectionError,
+    AsyncOpenAI,
+    InternalServerError,
+    RateLimitError,
+)
+from openai.types import CompletionUsage
 
-from communication.utils import StrEnum
+from communication.metrics import CHAT_RETRIES, Stage, time_stage
+from communication.rate_limiter import (
+    RateLimiter,
+    get_backoff_delay,
+    get_retry_after,
+)
+from communication.single_flight import SingleFlight
+from communication.token_counter import get_token_counter
+from communication.utils import StrEnum, canonical_json
+
+# Rate limits per model, shared by every ChatModel in the process. Set them
+# slightly under the account quota.
+MODEL_RATE_LIMITS = {
+    "gpt-4o": {"requests_per_minute": 450, "tokens_per_minute": 27_000},
+}
+DEFAULT_RATE_LIMITS = {"requests_per_minute": 450, "tokens_per_minute": 27_000}
+
+# Retry configs
+MAX_RETRIES = 5
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 30
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, InternalServerError)
+
+# Token estimate used for rate limiting before the real usage is known
+TOKENS_PER_MESSAGE = 4
+COMPLETION_TOKENS_ESTIMATE = 300
 
 
 class OpenAIKeys(str):
@@ -15,19 +50,118 @@ class ChatModelRole(StrEnum):
     USER = "user"
 
 
+@lru_cache()
+def get_rate_limiter(model: str) -> RateLimiter:
+    return RateLimiter(**MODEL_RATE_LIMITS.get(model, DEFAULT_RATE_LIMITS))
+
+
+def estimate_tokens(
+    messages: List[Dict], max_tokens: Optional[int] = None
+) -> int:
+    token_counter = get_token_counter()
+    prompt_tokens = sum(
+        token_counter.count(message[OpenAIKeys.CONTENT]) + TOKENS_PER_MESSAGE
+        for message in messages
+    )
+    return prompt_tokens + (max_tokens or COMPLETION_TOKENS_ESTIMATE)
+
+
 class ChatModel:
-    def __init__(self, openai_key: str):
-        self.openai_client = AsyncOpenAI(api_key=openai_key)
+    def __init__(
+        self,
+        openai_key: str,
+        max_retries: int = MAX_RETRIES,
+        http_client: Optional[httpx.AsyncClient] = None,
+        base_url: Optional[str] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+    ):
+        # Retries are handled here, together with the rate limiter
+        self.openai_client = AsyncOpenAI(
+            api_key=openai_key,
+            base_url=base_url,
+            max_retries=0,
+            http_client=http_client,
+        )
+        self.max_retries = max_retries
+        # None uses the process-wide limiter of the requested model
+        self.rate_limiter = rate_limiter
+        self.retries = 0
+        self.single_flight = SingleFlight()
+        self.token_usage = {
+            "completions": 0,
+            "prompt_tokens": 0,
+            "cached_tokens": 0,
+            "completion_tokens": 0,
+        }
 
     async def get_completion(self, **kwargs) -> str:
-        try:
-            chat_completion = await self.openai_client.chat.completions.create(
-                **kwargs
+        # Identical concurrent requests (e.g. client retries) share one call
+        with time_stage(Stage.COMPLETION):
+            return await self.single_flight.run(
+                canonical_json(kwargs), lambda: self._get_completion(**kwargs)
             )
+
+    async def _get_completion(self, **kwargs) -> str:
+        rate_limiter = self.rate_limiter or get_rate_limiter(kwargs["model"])
+        estimated_tokens = estimate_tokens(
+            kwargs["messages"], kwargs.get("max_tokens")
+        )
+
+        for attempt in range(self.max_retries + 1):
+            await rate_limiter.acquire(estimated_tokens)
+            try:
+                chat_completion = (
+                    await self.openai_client.chat.completions.create(**kwargs)
+                )
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    logging.error(f"OpenAI API error: {e}")
+                    raise
+
+                delay = get_retry_after(getattr(e, "response", None))
+                if delay is None:
+                    delay = get_backoff_delay(
+                        attempt, BACKOFF_BASE_SECONDS, BACKOFF_MAX_SECONDS
+                    )
+                if isinstance(e, RateLimitError):
+                    # Hold every caller of this model, not only this one
+                    rate_limiter.pause(delay)
+
+                logging.warning(
+                    f"OpenAI API error: {e}. Retrying in {delay:.2f}s "
+                    f"({attempt + 1}/{self.max_retries})."
+                )
+                self.retries += 1
+                CHAT_RETRIES.labels(
+                    model=kwargs["model"], error=type(e).__name__
+                ).inc()
+                await asyncio.sleep(delay)
+                continue
+            except Exception as e:
+                logging.error(f"OpenAI API error: {e}")
+                raise
+
+            if chat_completion.usage is not None:
+                rate_limiter.record_usage(
+                    estimated_tokens, chat_completion.usage.total_tokens
+                )
+                self._record_token_usage(chat_completion.usage)
             return chat_completion.choices[0].message.content
-        except Exception as e:
-            logging.error(f"OpenAI API error: {e}")
-            raise
+
+    def _record_token_usage(self, usage: CompletionUsage) -> None:
+        # Cached tokens are the prompt prefix served from the provider's
+        # prompt cache
+        prompt_tokens_details = usage.prompt_tokens_details
+        cached_tokens = (
+            prompt_tokens_details.cached_tokens or 0
+            if prompt_tokens_details is not None
+            else 0
+        )
+
+        self.token_usage["completions"] += 1
+        self.token_usage["prompt_tokens"] += usage.prompt_tokens
+        self.token_usage["cached_tokens"] += cached_tokens
+        self.token_usage["completion_tokens"] += usage.completion_tokens
 
 
 async def generate_message(
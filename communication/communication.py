@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 from communication.schema import CommunicationUseCase
 
@@ -18,5 +18,6 @@ class Communication(ABC):
         was_successful: bool,
         high_success_examples_id: List[int],
         low_success_examples_id: List[int],
+        request_uuid: Optional[str] = None,
     ) -> None:
         raise NotImplementedError
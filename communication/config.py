@@ -1,6 +1,7 @@
 import logging
 from functools import lru_cache
 from pathlib import Path
+from typing import Optional
 
 from pydantic_settings import BaseSettings
 
@@ -9,16 +10,20 @@ BASE_DIR = Path(__file__).parent.parent.absolute()
 DATA_DIR = Path(BASE_DIR, "data")
 PROMPTS_DIR = Path(BASE_DIR, "prompts")
 TESTS_DIR = Path(BASE_DIR, "tests")
+CACHE_DIR = Path(BASE_DIR, ".cache")
 
 # create dirs
 BASE_DIR.mkdir(parents=True, exist_ok=True)
 DATA_DIR.mkdir(parents=True, exist_ok=True)
 PROMPTS_DIR.mkdir(parents=True, exist_ok=True)
 TESTS_DIR.mkdir(parents=True, exist_ok=True)
+CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
 
 class Settings(BaseSettings):
     OPENAI_API_KEY: str = None
+    # e.g. a local stand-in LLM server for load tests; None uses OpenAI
+    OPENAI_BASE_URL: Optional[str] = None
 
     class Config:
         env_file = f"{BASE_DIR}/.env"
@@ -0,0 +1,252 @@
+import asyncio
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from communication.cache import TTLCache
+from communication.metrics import record_cache_lookup
+from communication.single_flight import SingleFlight
+from communication.utils import batched, hash_text
+
+# SQLite limits the number of bound parameters per statement
+LOOKUP_BATCH_SIZE = 500
+# Maximum number of queries embedded in a single request
+QUERY_EMBEDDING_BATCH_SIZE = 256
+
+# Cache label in the exported metrics
+QUERY_EMBEDDING_CACHE_NAME = "query_embedding"
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that persists document vectors on disk, keyed by
+    (namespace, content hash). Only documents never seen before are sent to
+    the underlying embedding model.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        namespace: str,
+        cache_path: Path,
+    ):
+        self.embeddings = embeddings
+        self.namespace = namespace
+        self.cache_path = cache_path
+
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(cache_path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "namespace TEXT NOT NULL, "
+            "content_hash TEXT NOT NULL, "
+            "vector BLOB NOT NULL, "
+            "PRIMARY KEY (namespace, content_hash))"
+        )
+        self._connection.commit()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        cached, missing = self._lookup(texts)
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            cached.update(self._store(list(missing.keys()), vectors))
+        return [cached[hash_text(text)] for text in texts]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        cached, missing = self._lookup(texts)
+        if missing:
+            vectors = await self.embeddings.aembed_documents(
+                list(missing.values())
+            )
+            cached.update(self._store(list(missing.keys()), vectors))
+        return [cached[hash_text(text)] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.embeddings.aembed_query(text)
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def _lookup(
+        self, texts: List[str]
+    ) -> Tuple[Dict[str, List[float]], Dict[str, str]]:
+        """
+        Split texts into cached vectors and texts still to be embedded, both
+        keyed by content hash.
+        """
+        hashes = {hash_text(text): text for text in texts}
+        keys = list(hashes.keys())
+
+        cached = {}
+        with self._lock:
+            for start in range(0, len(keys), LOOKUP_BATCH_SIZE):
+                end = start + LOOKUP_BATCH_SIZE
+                batch = keys[start:end]
+                rows = self._connection.execute(
+                    "SELECT content_hash, vector FROM embeddings "
+                    "WHERE namespace = ? AND content_hash IN "
+                    f"({', '.join('?' * len(batch))})",
+                    [self.namespace, *batch],
+                ).fetchall()
+                for content_hash, vector in rows:
+                    cached[content_hash] = np.frombuffer(
+                        vector, dtype=np.float32
+                    ).tolist()
+
+        missing = {
+            key: text for key, text in hashes.items() if key not in cached
+        }
+
+        logging.info(
+            f"Embedding cache: {len(cached)} hits, {len(missing)} misses."
+        )
+
+        return cached, missing
+
+    def _store(
+        self, keys: List[str], vectors: List[List[float]]
+    ) -> Dict[str, List[float]]:
+        with self._lock:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO embeddings "
+                "(namespace, content_hash, vector) VALUES (?, ?, ?)",
+                [
+                    (
+                        self.namespace,
+                        key,
+                        np.asarray(vector, dtype=np.float32).tobytes(),
+                    )
+                    for key, vector in zip(keys, vectors)
+                ],
+            )
+            self._connection.commit()
+
+        return dict(zip(keys, vectors))
+
+
+class QueryCachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that keeps recent query vectors in a bounded, expiring
+    in-memory cache. Concurrent async misses for the same query can share a
+    single embedding call. Document embedding is delegated unchanged.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        query_cache: TTLCache,
+        single_flight: Optional[SingleFlight] = None,
+    ):
+        self.embeddings = embeddings
+        self.query_cache = query_cache
+        self.single_flight = single_flight
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.embeddings.aembed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        key = hash_text(text)
+        vector = self.query_cache.get(key)
+        record_cache_lookup(QUERY_EMBEDDING_CACHE_NAME, hit=vector is not None)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.query_cache.set(key, vector)
+        return vector
+
+    async def aembed_queries(
+        self, texts: List[str]
+    ) -> List[Union[List[float], Exception]]:
+        """
+        Batch variant of `aembed_query`: cached vectors are reused and the
+        distinct misses are embedded together with `aembed_queries`. A query
+        whose embedding failed gets the exception in its place.
+        """
+        keys = [hash_text(text) for text in texts]
+
+        vectors = {}
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key in vectors or key in missing:
+                continue
+            vector = self.query_cache.get(key)
+            record_cache_lookup(
+                QUERY_EMBEDDING_CACHE_NAME, hit=vector is not None
+            )
+            if vector is None:
+                missing[key] = text
+            else:
+                vectors[key] = vector
+
+        if missing:
+            embedded = await aembed_queries(
+                self.embeddings, list(missing.values())
+            )
+            for key, vector in zip(missing.keys(), embedded):
+                if not isinstance(vector, Exception):
+                    self.query_cache.set(key, vector)
+                vectors[key] = vector
+
+        return [vectors[key] for key in keys]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = hash_text(text)
+        vector = self.query_cache.get(key)
+        record_cache_lookup(QUERY_EMBEDDING_CACHE_NAME, hit=vector is not None)
+        if vector is None:
+            if self.single_flight is None:
+                vector = await self.embeddings.aembed_query(text)
+            else:
+                vector = await self.single_flight.run(
+                    key, lambda: self.embeddings.aembed_query(text)
+                )
+            self.query_cache.set(key, vector)
+        return vector
+
+
+async def aembed_queries(
+    embeddings: Embeddings, texts: List[str]
+) -> List[Union[List[float], Exception]]:
+    """
+    Embed queries with one request per `QUERY_EMBEDDING_BATCH_SIZE` texts,
+    through the documents endpoint of the same model. When a request fails,
+    its texts are embedded one by one, so only the queries that fail on
+    their own get the exception in their place.
+    """
+    if isinstance(embeddings, CachedEmbeddings):
+        # Query vectors are not persisted with the document vectors
+        embeddings = embeddings.embeddings
+
+    vectors = []
+    for batch in batched(texts, QUERY_EMBEDDING_BATCH_SIZE):
+        try:
+            vectors.extend(await embeddings.aembed_documents(batch))
+        except Exception as e:
+            if len(batch) == 1:
+                vectors.append(e)
+                continue
+
+            logging.warning(
+                f"Embedding {len(batch)} queries failed ({e}), embedding "
+                "them one by one."
+            )
+            vectors.extend(
+                await asyncio.gather(
+                    *(embeddings.aembed_query(text) for text in batch),
+                    return_exceptions=True,
+                )
+            )
+
+    return vectors
@@ -0,0 +1,133 @@
+import asyncio
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from communication.utils import load_json_file, write_text_file_atomic
+
+
+class FeedbackLog:
+    """
+    Append-only JSONL log of success likelihood updates on top of a JSON
+    dataset snapshot.
+
+    Each record holds the feedback that caused it and the resulting absolute
+    likelihoods, so replaying a record is idempotent. Compaction rotates the
+    log aside, writes a fresh snapshot atomically and then drops the rotated
+    log; a crash at any point leaves a snapshot plus logs that replay to the
+    same state.
+    """
+
+    def __init__(self, snapshot_path: Path, max_log_entries: int):
+        self.snapshot_path = snapshot_path
+        self.log_path = snapshot_path.with_suffix(".feedback.jsonl")
+        self.compacting_log_path = snapshot_path.with_suffix(
+            ".feedback.compacting.jsonl"
+        )
+        self.max_log_entries = max_log_entries
+        self.log_entries = 0
+
+    def load(self) -> List[Dict]:
+        """Load the snapshot and replay any pending log records on it."""
+        rows = load_json_file(self.snapshot_path)
+        rows_by_id = {row["id"]: row for row in rows}
+
+        self.log_entries = 0
+        for log_path in (self.compacting_log_path, self.log_path):
+            for record in self._read_records(log_path):
+                for entry_id, likelihood in record[
+                    "success_likelihoods"
+                ].items():
+                    if int(entry_id) in rows_by_id:
+                        rows_by_id[int(entry_id)][
+                            "success_likelihood"
+                        ] = likelihood
+                self.log_entries += 1
+
+        logging.info(
+            f"Loaded {len(rows)} rows from {self.snapshot_path.name} and "
+            f"replayed {self.log_entries} feedback records."
+        )
+
+        return rows
+
+    def append(
+        self, feedback: List[Dict], success_likelihoods: Dict[int, float]
+    ) -> None:
+        record = {
+            "timestamp": time.time(),
+            "feedback": feedback,
+            "success_likelihoods": success_likelihoods,
+        }
+        with open(self.log_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+        self.log_entries += 1
+
+    def needs_compaction(self) -> bool:
+        return self.log_entries >= self.max_log_entries
+
+    async def compact(self, rows: List[Dict]) -> None:
+        """
+        Write `rows` as the new snapshot and drop the log records it
+        already includes. Rotation and serialization run synchronously so
+        the snapshot is consistent with the rotated log; the file write is
+        offloaded to a thread.
+        """
+        self._rotate_log()
+        snapshot = json.dumps(rows, indent=2, ensure_ascii=False)
+        self.log_entries = 0
+
+        start = time.perf_counter()
+        await asyncio.to_thread(
+            write_text_file_atomic, self.snapshot_path, snapshot
+        )
+        self.compacting_log_path.unlink(missing_ok=True)
+
+        logging.info(
+            f"Compacted {self.snapshot_path.name} in "
+            f"{time.perf_counter() - start:.3f}s."
+        )
+
+    def _rotate_log(self) -> None:
+        if not self.log_path.exists():
+            return
+
+        if not self.compacting_log_path.exists():
+            self.log_path.replace(self.compacting_log_path)
+            return
+
+        # A previous compaction did not finish, keep its records too
+        with open(self.compacting_log_path, "a", encoding="utf-8") as f:
+            f.write(self.log_path.read_text(encoding="utf-8"))
+        self.log_path.unlink()
+
+    @staticmethod
+    def _read_records(log_path: Path) -> List[Dict]:
+        """
+        Read the log records. A crash mid-append can only tear the last
+        line, which is truncated so later appends start on a clean line.
+        """
+        if not log_path.exists():
+            return []
+
+        records = []
+        valid_bytes = 0
+        with open(log_path, "rb") as f:
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("Incomplete record.")
+                    records.append(json.loads(line))
+                except ValueError:
+                    logging.warning(f"Truncating torn record in {log_path}.")
+                    break
+                valid_bytes += len(line)
+
+        if valid_bytes < log_path.stat().st_size:
+            with open(log_path, "r+b") as f:
+                f.truncate(valid_bytes)
+
+        return records
@@ -0,0 +1,53 @@
+import importlib.util
+import logging
+
+import httpx
+
+# Connection pool configs, shared by the chat and embeddings clients
+HTTP_MAX_CONNECTIONS = 100
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 50
+HTTP_KEEPALIVE_EXPIRY_SECONDS = 60
+HTTP_CONNECT_TIMEOUT_SECONDS = 5
+HTTP_TIMEOUT_SECONDS = 60
+# HTTP/2 multiplexes requests over fewer connections; it needs the `h2`
+# package, pinned in the Pipfile. Environments without it fall back to 1.1.
+HTTP2_ENABLED = importlib.util.find_spec("h2") is not None
+
+
+class HttpClients:
+    """
+    Pooled HTTP clients for the OpenAI chat and embeddings clients. Created
+    once per service and closed on application shutdown.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections: int = HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        connect_timeout: float = HTTP_CONNECT_TIMEOUT_SECONDS,
+        timeout: float = HTTP_TIMEOUT_SECONDS,
+        http2: bool = HTTP2_ENABLED,
+    ):
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        timeout = httpx.Timeout(timeout, connect=connect_timeout)
+
+        logging.info(
+            f"Creating HTTP clients (max connections: {max_connections}, "
+            f"HTTP/2: {http2})."
+        )
+        self.async_client = httpx.AsyncClient(
+            limits=limits, timeout=timeout, http2=http2
+        )
+        # Used by the synchronous embeddings calls, e.g. at index build time
+        self.sync_client = httpx.Client(
+            limits=limits, timeout=timeout, http2=http2
+        )
+
+    async def aclose(self) -> None:
+        await self.async_client.aclose()
+        self.sync_client.close()
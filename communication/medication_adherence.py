@@ -1,15 +1,46 @@
+import asyncio
 import json
-from typing import Dict, List, Tuple
-
-from communication.chat_model import ChatModel, generate_message
+import logging
+import re
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple, Union
+
+from communication.cache import TTLCache
+from communication.chat_model import (
+    ChatModel,
+    generate_message,
+    get_rate_limiter,
+)
 from communication.communication import Communication
-from communication.config import DATA_DIR, get_settings
+from communication.config import CACHE_DIR, DATA_DIR, get_settings
+from communication.http_client import HttpClients
+from communication.message_store import (
+    JsonMessageStore,
+    MessageStore,
+    MessageStoreBackend,
+)
+from communication.metrics import Stage, record_cache_lookup, time_stage
+from communication.profile_encoder import ProfileFeatureEncoder, SimilarityMode
 from communication.prompt import PromptTemplate
-from communication.schema import CommunicationUseCase, PatientProfile
-from communication.utils import load_json_file
+from communication.schema import (
+    CommunicationUseCase,
+    GenerationMode,
+    PatientProfile,
+)
+from communication.single_flight import SingleFlight
+from communication.sqlite_message_store import (
+    SQLiteMessageStore,
+    is_migrated,
+    migrate_json_to_sqlite,
+)
+from communication.update_queue import LikelihoodUpdateQueue
+from communication.utils import (
+    batched,
+    canonical_json,
+    hash_text,
+    load_json_file,
+)
 from communication.vector_database import VectorDatabase
-
-settings = get_settings()
+from communication.vector_index import VectorIndexBackend
 
 # LLM Completion configs
 GPT_MODEL = "gpt-4o"
@@ -22,79 +53,466 @@ PROMPT_TEMPLATE_MED_ADHERENCE = PromptTemplate(
 )
 
 # Vector DB configs
+SIMILARITY_MODE = SimilarityMode.EMBEDDING
+VECTOR_DB_BACKEND = VectorIndexBackend.CHROMA
 EMBEDDING_MODEL = "text-embedding-3-small"
 SIMILARITY_THRESHOLD = 0.75
 TOP_N_PATIENTS = 3
+EMBEDDING_CACHE_FILENAME = "embeddings.sqlite3"
+VECTOR_DB_PERSIST_DIRECTORY = CACHE_DIR / "chroma"
+QUERY_EMBEDDING_CACHE_SIZE = 10_000
+QUERY_EMBEDDING_CACHE_TTL_SECONDS = 24 * 60 * 60
+
+# Structured similarity configs (local feature encoder, no embedding calls)
+STRUCTURED_SIMILARITY_THRESHOLD = 0.6
+STRUCTURED_FEATURE_WEIGHTS = {
+    "primary_medical_condition": 2.0,
+    "medication_type": 1.5,
+    "health_literacy_level": 1.5,
+    "message_tone_preference": 1.5,
+}
 
 # Knowledge base configs
 PATIENTS_FILENAME = "patients.json"
 PATIENTS_FILE_JQ_SCHEMA = ".[] | {content: .profile, metadata: {id: .id}}"
-
+# Profile fields copied into the document metadata for retrieval filters
+# and partitioning
+PATIENTS_METADATA_KEYS = [
+    "primary_medical_condition",
+    "medication_type",
+    "severity_of_condition",
+]
+# Metadata keys used to shard the patients index, e.g.
+# ["primary_medical_condition", "medication_type"]. None searches one index.
+PATIENTS_PARTITION_KEYS = None
+
+MESSAGE_STORE_BACKEND = MessageStoreBackend.JSON
 MEDICATION_ADHERENCE_DATASET_FILENAME = "medication_adherence.json"
+# Feedback records appended before the dataset snapshot is rewritten
+FEEDBACK_LOG_MAX_ENTRIES = 1000
+# SQLite store, migrated from the JSON dataset on first use
+MEDICATION_ADHERENCE_DATABASE_FILENAME = "medication_adherence.sqlite3"
 
 # Message generation configs
+GENERATION_MODE = GenerationMode.INDIVIDUAL
+# Stands in for the patient's name in cohort mode, replaced after generation
+NAME_PLACEHOLDER = "[PATIENT_NAME]"
+# Placeholders used by the dataset messages, rewritten in cohort mode
+# prompts: the name one to NAME_PLACEHOLDER, the others to profile values
+EXAMPLE_NAME_PLACEHOLDER = "[Name]"
+EXAMPLE_PROFILE_PLACEHOLDERS = {
+    "[medication]": "medication_name",
+    "[condition]": "primary_medical_condition",
+}
+# A bracketed token referring to the patient, e.g. [Name] or {patient}
+NAME_LIKE_PLACEHOLDER_PATTERN = re.compile(
+    r"[\[{<][^\]}>]*(?:name|patient)[^\]}>]*[\]}>]", re.IGNORECASE
+)
+# Completions in flight at once for a batch request
+BATCH_MAX_CONCURRENCY = 8
+# Requests retrieved together when streaming a batch
+STREAM_RETRIEVAL_BATCH_SIZE = 64
 HIGH_SUCCESS_MESSAGES_COUNT = 3
 LOW_SUCCESS_MESSAGES_COUNT = 2
 
+# Prompt budget configs, in tokens counted locally (system + user message).
+# Over budget, examples are truncated and then dropped, low success first.
+INPUT_TOKEN_BUDGET = 2000
+EXAMPLE_MAX_TOKENS = 60
+MIN_HIGH_SUCCESS_MESSAGES_COUNT = 1
+
+# Generated message cache configs
+RESPONSE_CACHE_SIZE = 10_000
+RESPONSE_CACHE_TTL_SECONDS = 24 * 60 * 60
+# Cache label in the exported metrics
+RESPONSE_CACHE_NAME = "response"
+
 UPDATE_DELTA = 0.05
+# Feedback received within this interval is merged into a single write
+UPDATE_FLUSH_INTERVAL_SECONDS = 0.5
 
 
 class MedicationAdherenceCommunication(Communication):
     def __init__(
         self,
+        similarity_mode: SimilarityMode = SIMILARITY_MODE,
+        generation_mode: GenerationMode = GENERATION_MODE,
+        load: bool = True,
     ):
+        """
+        With `load=False` the patients index and the message store are not
+        built; `create` loads them concurrently instead.
+        """
         super().__init__(use_case=CommunicationUseCase.MEDICATION_ADHERENCE)
-        self.patients_vector_db = self._init_vector_db()
-        self.medication_adherence_data = load_json_file(
-            DATA_DIR / MEDICATION_ADHERENCE_DATASET_FILENAME
+        self.similarity_mode = similarity_mode
+        self.generation_mode = generation_mode
+        self.query_embedding_cache = TTLCache(
+            max_size=QUERY_EMBEDDING_CACHE_SIZE,
+            ttl_seconds=QUERY_EMBEDDING_CACHE_TTL_SECONDS,
+        )
+        self.http_clients = HttpClients()
+        self.query_embedding_single_flight = SingleFlight()
+        self.response_cache = TTLCache(
+            max_size=RESPONSE_CACHE_SIZE,
+            ttl_seconds=RESPONSE_CACHE_TTL_SECONDS,
+        )
+        self._response_cache_template_version = None
+        self.chat_model = ChatModel(
+            openai_key=get_settings().OPENAI_API_KEY,
+            http_client=self.http_clients.async_client,
+            base_url=get_settings().OPENAI_BASE_URL,
+        )
+
+        self.patients_vector_db: Optional[VectorDatabase] = None
+        self.message_store: Optional[MessageStore] = None
+        self.update_queue: Optional[LikelihoodUpdateQueue] = None
+        if load:
+            self._set_components(
+                patients_vector_db=self._init_patients_vector_db(),
+                message_store=self._init_message_store(),
+            )
+
+    @classmethod
+    async def create(
+        cls,
+        similarity_mode: SimilarityMode = SIMILARITY_MODE,
+        generation_mode: GenerationMode = GENERATION_MODE,
+    ) -> "MedicationAdherenceCommunication":
+        """
+        Build the service without blocking the event loop: the patients
+        index, the message store and the prompt templates are loaded
+        concurrently in worker threads.
+        """
+        service = cls(
+            similarity_mode=similarity_mode,
+            generation_mode=generation_mode,
+            load=False,
+        )
+
+        patients_vector_db, message_store, _ = await asyncio.gather(
+            asyncio.to_thread(service._init_patients_vector_db),
+            asyncio.to_thread(service._init_message_store),
+            asyncio.to_thread(PROMPT_TEMPLATE_MED_ADHERENCE.compile),
+        )
+        service._set_components(
+            patients_vector_db=patients_vector_db, message_store=message_store
+        )
+
+        return service
+
+    def _set_components(
+        self, patients_vector_db: VectorDatabase, message_store: MessageStore
+    ) -> None:
+        self.patients_vector_db = patients_vector_db
+        self.message_store = message_store
+        self.update_queue = LikelihoodUpdateQueue(
+            store=message_store,
+            flush_interval_seconds=UPDATE_FLUSH_INTERVAL_SECONDS,
+        )
+
+    def _init_patients_vector_db(self) -> VectorDatabase:
+        if self.similarity_mode == SimilarityMode.STRUCTURED:
+            return self._init_structured_vector_db()
+
+        return self._init_vector_db(
+            query_cache=self.query_embedding_cache,
+            query_single_flight=self.query_embedding_single_flight,
+            http_clients=self.http_clients,
+        )
+
+    @staticmethod
+    def _init_vector_db(
+        query_cache: TTLCache,
+        query_single_flight: SingleFlight,
+        http_clients: HttpClients,
+    ):
+        openai_base_url = get_settings().OPENAI_BASE_URL
+        # Vectors from another endpoint (e.g. a stand-in server) must not
+        # mix with the OpenAI ones, so they are cached apart
+        cache_dir = (
+            CACHE_DIR
+            if openai_base_url is None
+            else CACHE_DIR / f"base-url-{hash_text(openai_base_url)[:12]}"
+        )
+
+        return VectorDatabase(
+            kb_file_name=PATIENTS_FILENAME,
+            kb_directory_path=DATA_DIR,
+            embedding_model=EMBEDDING_MODEL,
+            openai_key=get_settings().OPENAI_API_KEY,
+            file_jq_schema=PATIENTS_FILE_JQ_SCHEMA,
+            embedding_cache_path=cache_dir / EMBEDDING_CACHE_FILENAME,
+            persist_directory=cache_dir / VECTOR_DB_PERSIST_DIRECTORY.name,
+            query_cache=query_cache,
+            query_single_flight=query_single_flight,
+            http_clients=http_clients,
+            openai_base_url=openai_base_url,
+            backend=VECTOR_DB_BACKEND,
+            partition_keys=PATIENTS_PARTITION_KEYS,
+            content_metadata_keys=PATIENTS_METADATA_KEYS,
+        )
+
+    @staticmethod
+    def _init_message_store() -> MessageStore:
+        dataset_path = DATA_DIR / MEDICATION_ADHERENCE_DATASET_FILENAME
+
+        if MESSAGE_STORE_BACKEND == MessageStoreBackend.SQLITE:
+            database_path = DATA_DIR / MEDICATION_ADHERENCE_DATABASE_FILENAME
+            if not is_migrated(database_path):
+                migrate_json_to_sqlite(dataset_path, database_path)
+            return SQLiteMessageStore(database_path=database_path)
+
+        return JsonMessageStore(
+            snapshot_path=dataset_path,
+            max_log_entries=FEEDBACK_LOG_MAX_ENTRIES,
         )
-        self.chat_model = ChatModel(openai_key=settings.OPENAI_API_KEY)
 
     @staticmethod
-    def _init_vector_db():
+    def _init_structured_vector_db():
+        profiles = [
+            patient["profile"]
+            for patient in load_json_file(DATA_DIR / PATIENTS_FILENAME)
+        ]
         return VectorDatabase(
             kb_file_name=PATIENTS_FILENAME,
             kb_directory_path=DATA_DIR,
             embedding_model=EMBEDDING_MODEL,
-            openai_key=settings.OPENAI_API_KEY,
+            openai_key=get_settings().OPENAI_API_KEY,
             file_jq_schema=PATIENTS_FILE_JQ_SCHEMA,
+            backend=VectorIndexBackend.NUMPY,
+            embedding=ProfileFeatureEncoder.from_profiles(
+                profiles=profiles, weights=STRUCTURED_FEATURE_WEIGHTS
+            ),
+            partition_keys=PATIENTS_PARTITION_KEYS,
+            content_metadata_keys=PATIENTS_METADATA_KEYS,
         )
 
     async def get_communication(
-        self, request_uuid: str, patient_profile: PatientProfile
+        self,
+        request_uuid: str,
+        patient_profile: PatientProfile,
+        use_cache: bool = True,
     ) -> Dict:
 
         patient_profile = patient_profile.model_dump()
 
-        similar_profile_ids = self._get_similar_profiles(
-            {k: v for k, v in patient_profile.items() if k != "name"}
+        similar_profile_ids = await self._get_similar_profiles(
+            self._get_profile_query(patient_profile)
+        )
+
+        return await self._generate_communication(
+            request_uuid=request_uuid,
+            patient_profile=patient_profile,
+            similar_profile_ids=similar_profile_ids,
+            use_cache=use_cache,
         )
 
+    async def get_communications(
+        self,
+        requests: List[Dict],
+        max_concurrency: int = BATCH_MAX_CONCURRENCY,
+    ) -> List[Dict]:
+        """
+        Generate communications for many patients. Similar profiles are
+        retrieved for the whole batch at once and at most `max_concurrency`
+        completions run at the same time. Returns, in request order, either
+        a `response` or the `error` that made that item fail.
+        """
+
+        patient_profiles = [
+            request["patient_profile"].model_dump() for request in requests
+        ]
+
+        similar_profile_ids = await self._get_similar_profiles_batch(
+            [self._get_profile_query(profile) for profile in patient_profiles]
+        )
+
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def generate(request, patient_profile, profile_ids):
+            async with semaphore:
+                return await self._generate_batch_item(
+                    request, patient_profile, profile_ids
+                )
+
+        return await asyncio.gather(
+            *(
+                generate(request, profile, profile_ids)
+                for request, profile, profile_ids in zip(
+                    requests, patient_profiles, similar_profile_ids
+                )
+            )
+        )
+
+    async def iter_communications(
+        self,
+        requests: Iterable[Dict],
+        max_concurrency: int = BATCH_MAX_CONCURRENCY,
+    ) -> AsyncIterator[Dict]:
+        """
+        Streaming variant of `get_communications`, yielding each item as soon
+        as its completion finishes (not in request order). Requests are
+        consumed in chunks of `STREAM_RETRIEVAL_BATCH_SIZE` and at most
+        `max_concurrency` completions are in flight, so memory does not grow
+        with the number of requests.
+        """
+
+        in_flight = set()
+        try:
+            for chunk in batched(requests, STREAM_RETRIEVAL_BATCH_SIZE):
+                patient_profiles = [
+                    request["patient_profile"].model_dump()
+                    for request in chunk
+                ]
+                similar_profile_ids = await self._get_similar_profiles_batch(
+                    [
+                        self._get_profile_query(profile)
+                        for profile in patient_profiles
+                    ]
+                )
+
+                for request, profile, profile_ids in zip(
+                    chunk, patient_profiles, similar_profile_ids
+                ):
+                    if len(in_flight) >= max_concurrency:
+                        done, in_flight = await asyncio.wait(
+                            in_flight, return_when=asyncio.FIRST_COMPLETED
+                        )
+                        for task in done:
+                            yield task.result()
+
+                    in_flight.add(
+                        asyncio.create_task(
+                            self._generate_batch_item(
+                                request, profile, profile_ids
+                            )
+                        )
+                    )
+
+            for task in asyncio.as_completed(in_flight):
+                yield await task
+
+        finally:
+            # The consumer may stop early, e.g. when a client disconnects
+            for task in in_flight:
+                task.cancel()
+
+    async def _generate_batch_item(
+        self,
+        request: Dict,
+        patient_profile: Dict,
+        similar_profile_ids: Union[List[int], Exception],
+    ) -> Dict:
+        request_uuid = request["request_uuid"]
+        try:
+            if isinstance(similar_profile_ids, BaseException):
+                raise similar_profile_ids
+
+            response = await self._generate_communication(
+                request_uuid=request_uuid,
+                patient_profile=patient_profile,
+                similar_profile_ids=similar_profile_ids,
+                use_cache=request.get("use_cache", True),
+            )
+            return {"request_uuid": request_uuid, "response": response}
+
+        except Exception as e:
+            logging.error(
+                f"Communication generation failed for request "
+                f"{request_uuid}: {e}"
+            )
+            return {"request_uuid": request_uuid, "error": str(e)}
+
+    async def _generate_communication(
+        self,
+        request_uuid: str,
+        patient_profile: Dict,
+        similar_profile_ids: List[int],
+        use_cache: bool = True,
+    ) -> Dict:
+
         high_success_messages, low_success_messages = (
             self._get_messages_given_similar_profiles(similar_profile_ids)
         )
 
-        system_message = PROMPT_TEMPLATE_MED_ADHERENCE.build_system_message()
-        user_message = PROMPT_TEMPLATE_MED_ADHERENCE.build_user_message(
-            patient_profile=patient_profile,
-            high_success_messages=[
-                row["message"] for row in high_success_messages
-            ],
-            low_success_messages=[
-                row["message"] for row in low_success_messages
-            ],
+        patient_name = patient_profile["name"]
+        prompt_name = (
+            NAME_PLACEHOLDER
+            if self.generation_mode == GenerationMode.COHORT
+            else patient_name
         )
 
-        response = await generate_message(
-            chat_model=self.chat_model,
-            system_message=system_message,
-            user_message=user_message,
-            model=GPT_MODEL,
-            temperature=TEMPERATURE,
-            json_format=True,
+        with time_stage(Stage.PROMPT_RENDER):
+            system_message = (
+                PROMPT_TEMPLATE_MED_ADHERENCE.build_system_message()
+            )
+            (
+                high_success_messages,
+                low_success_messages,
+                prompt_tokens,
+                tokens_saved,
+            ) = self._fit_examples_to_budget(
+                system_message,
+                patient_profile,
+                prompt_name,
+                high_success_messages,
+                low_success_messages,
+            )
+            user_message = self._build_user_message(
+                patient_profile,
+                prompt_name,
+                high_success_messages,
+                low_success_messages,
+            )
+
+        cache_key = self._get_response_cache_key(
+            patient_profile,
+            prompt_name,
+            high_success_messages,
+            low_success_messages,
+        )
+        response_dict = (
+            self.response_cache.get(cache_key) if use_cache else None
         )
+        cache_hit = response_dict is not None
+        if use_cache:
+            record_cache_lookup(RESPONSE_CACHE_NAME, hit=cache_hit)
+
+        if not cache_hit:
+            response_dict = await self._complete(system_message, user_message)
+
+            if prompt_name == NAME_PLACEHOLDER and not (
+                self._has_valid_name_placeholder(response_dict["message"])
+            ):
+                logging.warning(
+                    f"Response for request {request_uuid} does not use the "
+                    "name placeholder, generating with the patient's name."
+                )
+                prompt_name = patient_name
+                user_message = self._build_user_message(
+                    patient_profile,
+                    prompt_name,
+                    high_success_messages,
+                    low_success_messages,
+                )
+                response_dict = await self._complete(
+                    system_message, user_message
+                )
 
-        response_dict = json.loads(response)
+            # Only responses written for the key's prompt name are cached, a
+            # fallback with the patient's name must not be shared by a cohort
+            elif use_cache:
+                self.response_cache.set(cache_key, response_dict)
+
+        if prompt_name == NAME_PLACEHOLDER:
+            response_dict = {
+                key: (
+                    value.replace(NAME_PLACEHOLDER, patient_name)
+                    if isinstance(value, str)
+                    else value
+                )
+                for key, value in response_dict.items()
+            }
 
         return {
             "request_uuid": request_uuid,
@@ -109,90 +527,329 @@ class MedicationAdherenceCommunication(Communication):
                 "user_message": user_message,
                 "system_message": system_message,
                 "reasoning": response_dict["explanation"],
+                "response_cache_hit": cache_hit,
+                "prompt_tokens": prompt_tokens,
+                "tokens_saved": tokens_saved,
+                "token_count_estimated": (
+                    not PROMPT_TEMPLATE_MED_ADHERENCE.token_count_is_exact
+                ),
             },
         }
 
+    @staticmethod
+    def _build_user_message(
+        patient_profile: Dict,
+        prompt_name: str,
+        high_success_messages: List[Dict],
+        low_success_messages: List[Dict],
+    ) -> str:
+        def example(row: Dict) -> str:
+            if prompt_name != NAME_PLACEHOLDER:
+                return row["message"]
+            return MedicationAdherenceCommunication._normalize_example(
+                row["message"], patient_profile
+            )
+
+        return PROMPT_TEMPLATE_MED_ADHERENCE.build_user_message(
+            patient_profile={**patient_profile, "name": prompt_name},
+            name_placeholder=(
+                prompt_name if prompt_name == NAME_PLACEHOLDER else None
+            ),
+            high_success_messages=[
+                example(row) for row in high_success_messages
+            ],
+            low_success_messages=[
+                example(row) for row in low_success_messages
+            ],
+        )
+
+    @staticmethod
+    def _normalize_example(message: str, patient_profile: Dict) -> str:
+        """
+        Rewrite the dataset placeholders of an example so that the only
+        placeholder the model sees is NAME_PLACEHOLDER.
+        """
+        message = message.replace(EXAMPLE_NAME_PLACEHOLDER, NAME_PLACEHOLDER)
+        for placeholder, field in EXAMPLE_PROFILE_PLACEHOLDERS.items():
+            message = message.replace(placeholder, str(patient_profile[field]))
+        return message
+
+    def _fit_examples_to_budget(
+        self,
+        system_message: str,
+        patient_profile: Dict,
+        prompt_name: str,
+        high_success_messages: List[Dict],
+        low_success_messages: List[Dict],
+    ) -> Tuple[List[Dict], List[Dict], int, int]:
+        """
+        Keep the prompt within INPUT_TOKEN_BUDGET. Over budget, examples are
+        truncated to EXAMPLE_MAX_TOKENS, then low success examples and the
+        least likely high success examples are dropped. Returns the kept
+        examples, the prompt tokens and the tokens saved.
+        """
+        system_tokens = PROMPT_TEMPLATE_MED_ADHERENCE.count_tokens(
+            system_message
+        )
+
+        def count_tokens(high, low):
+            return system_tokens + PROMPT_TEMPLATE_MED_ADHERENCE.count_tokens(
+                self._build_user_message(
+                    patient_profile, prompt_name, high, low
+                )
+            )
+
+        initial_tokens = count_tokens(
+            high_success_messages, low_success_messages
+        )
+        if initial_tokens <= INPUT_TOKEN_BUDGET:
+            return (
+                high_success_messages,
+                low_success_messages,
+                initial_tokens,
+                0,
+            )
+
+        high_success_messages = [
+            self._truncate_example(row) for row in high_success_messages
+        ]
+        low_success_messages = [
+            self._truncate_example(row) for row in low_success_messages
+        ]
+        tokens = count_tokens(high_success_messages, low_success_messages)
+
+        while tokens > INPUT_TOKEN_BUDGET:
+            if low_success_messages:
+                # The least extreme low success example goes first
+                low_success_messages = low_success_messages[1:]
+            elif len(high_success_messages) > MIN_HIGH_SUCCESS_MESSAGES_COUNT:
+                high_success_messages = high_success_messages[:-1]
+            else:
+                logging.warning(
+                    f"Prompt of {tokens} tokens exceeds the budget of "
+                    f"{INPUT_TOKEN_BUDGET} tokens after trimming examples."
+                )
+                break
+            tokens = count_tokens(high_success_messages, low_success_messages)
+
+        return (
+            high_success_messages,
+            low_success_messages,
+            tokens,
+            initial_tokens - tokens,
+        )
+
+    @staticmethod
+    def _truncate_example(row: Dict) -> Dict:
+        return {
+            **row,
+            "message": PROMPT_TEMPLATE_MED_ADHERENCE.truncate_tokens(
+                row["message"], EXAMPLE_MAX_TOKENS
+            ),
+        }
+
+    async def _complete(self, system_message: str, user_message: str) -> Dict:
+        response = await generate_message(
+            chat_model=self.chat_model,
+            system_message=system_message,
+            user_message=user_message,
+            model=GPT_MODEL,
+            temperature=TEMPERATURE,
+            json_format=True,
+        )
+
+        return json.loads(response)
+
+    @staticmethod
+    def _has_valid_name_placeholder(message: str) -> bool:
+        """
+        A message generated from the placeholder cannot contain the name, so
+        it is only invalid when it refers to the patient through another
+        placeholder (e.g. [Name]), which would not be replaced.
+        """
+        remaining = message.replace(NAME_PLACEHOLDER, "")
+        return not NAME_LIKE_PLACEHOLDER_PATTERN.search(remaining)
+
     async def act_on_communication_result(
         self,
         was_successful: bool,
         high_success_examples_id: List[int],
         low_success_examples_id: List[int],
+        request_uuid: Optional[str] = None,
     ) -> None:
 
-        # Create ID-to-entry mapping for faster lookups
-        kb_data_map = {
-            entry["id"]: entry for entry in self.medication_adherence_data
-        }
+        await self.act_on_communication_results(
+            [
+                {
+                    "request_uuid": request_uuid,
+                    "was_successful": was_successful,
+                    "high_success_examples_id": high_success_examples_id,
+                    "low_success_examples_id": low_success_examples_id,
+                }
+            ]
+        )
 
-        # Update high success examples
-        for id in high_success_examples_id:
-            if id in kb_data_map:
-                self._update_entry_likelihood(
-                    kb_data_map[id], was_successful, is_high_success=True
+    async def act_on_communication_results(
+        self, outcomes: List[Dict]
+    ) -> List[Dict]:
+        """
+        Apply a list of communication outcomes as a single update. Returns,
+        per outcome, the example ids that were updated and those that are
+        not in the message pool.
+        """
+
+        deltas = {}
+        for outcome in outcomes:
+            # Update high success examples
+            for id in outcome["high_success_examples_id"]:
+                deltas[id] = deltas.get(id, 0.0) + self._get_likelihood_delta(
+                    outcome["was_successful"], is_high_success=True
                 )
 
-        # Update low success examples
-        for id in low_success_examples_id:
-            if id in kb_data_map:
-                self._update_entry_likelihood(
-                    kb_data_map[id], was_successful, is_high_success=False
+            # Update low success examples
+            for id in outcome["low_success_examples_id"]:
+                deltas[id] = deltas.get(id, 0.0) + self._get_likelihood_delta(
+                    outcome["was_successful"], is_high_success=False
                 )
 
-        # Save updated data
-        with open(
-            DATA_DIR / MEDICATION_ADHERENCE_DATASET_FILENAME,
-            "w",
-            encoding="utf-8",
-        ) as f:
-            json.dump(
-                self.medication_adherence_data, f, indent=2, ensure_ascii=False
+        success_likelihoods = await self.update_queue.submit(
+            deltas=deltas, feedback=outcomes
+        )
+
+        results = []
+        for outcome in outcomes:
+            examples_id = (
+                outcome["high_success_examples_id"]
+                + outcome["low_success_examples_id"]
+            )
+            results.append(
+                {
+                    "request_uuid": outcome["request_uuid"],
+                    "updated_examples_id": [
+                        id for id in examples_id if id in success_likelihoods
+                    ],
+                    "unknown_examples_id": [
+                        id
+                        for id in examples_id
+                        if id not in success_likelihoods
+                    ],
+                }
             )
 
-    def _get_similar_profiles(self, patient_dict: Dict) -> List[int]:
-        similar_profiles = self.patients_vector_db.get_documents_with_similarity_score(  # noqa
-            user_query=str(patient_dict),
+        return results
+
+    def stats(self) -> Dict:
+        return {
+            "response_cache": self.response_cache.stats(),
+            "query_embedding_cache": self.query_embedding_cache.stats(),
+            "query_embedding_single_flight": (
+                self.query_embedding_single_flight.stats()
+            ),
+            "chat_single_flight": self.chat_model.single_flight.stats(),
+            "chat_token_usage": dict(self.chat_model.token_usage),
+            "update_queue": (
+                self.update_queue.stats() if self.update_queue else {}
+            ),
+            "rate_limiter": {
+                **get_rate_limiter(GPT_MODEL).stats(),
+                "retries": self.chat_model.retries,
+            },
+        }
+
+    async def aclose(self) -> None:
+        if self.update_queue is not None:
+            await self.update_queue.aclose()
+        if self.message_store is not None:
+            await self.message_store.aclose()
+        await self.http_clients.aclose()
+
+    def _get_response_cache_key(
+        self,
+        patient_profile: Dict,
+        prompt_name: str,
+        high_success_messages: List[Dict],
+        low_success_messages: List[Dict],
+    ) -> Tuple:
+        """
+        The name the prompt was rendered with is part of the key: responses
+        are only shared across patients when generated with the name
+        placeholder, never when they may address a patient by name.
+        """
+        template_version = PROMPT_TEMPLATE_MED_ADHERENCE.get_version()
+        if template_version != self._response_cache_template_version:
+            # Responses generated from a previous template are stale
+            self.response_cache.clear()
+            self._response_cache_template_version = template_version
+
+        return (
+            canonical_json(self._get_profile_query(patient_profile)),
+            prompt_name,
+            tuple(row["id"] for row in high_success_messages),
+            tuple(row["id"] for row in low_success_messages),
+            template_version,
+            GPT_MODEL,
+            TEMPERATURE,
+        )
+
+    @staticmethod
+    def _get_profile_query(patient_profile: Dict) -> Dict:
+        return {k: v for k, v in patient_profile.items() if k != "name"}
+
+    def _get_similarity_threshold(self) -> float:
+        return (
+            STRUCTURED_SIMILARITY_THRESHOLD
+            if self.similarity_mode == SimilarityMode.STRUCTURED
+            else SIMILARITY_THRESHOLD
+        )
+
+    async def _get_similar_profiles(self, patient_dict: Dict) -> List[int]:
+        similar_profiles = await self.patients_vector_db.aget_documents_with_similarity_score(  # noqa
+            user_query=canonical_json(patient_dict),
+            partition=patient_dict,
             top_k=TOP_N_PATIENTS,
-            score_threshold=SIMILARITY_THRESHOLD,
+            score_threshold=self._get_similarity_threshold(),
         )
         return [doc.document_id for doc in similar_profiles]
 
-    def _get_messages_given_similar_profiles(
-        self, similar_profile_ids: List[int]
-    ) -> Tuple[List[Dict], List[Dict]]:
-        filtered_messages = [
-            row
-            for row in self.medication_adherence_data
-            if row["patient_id"] in similar_profile_ids
-        ]
-        sorted_messages_by_likelihood = sorted(
-            filtered_messages,
-            key=lambda x: x["success_likelihood"],
-            reverse=True,
+    async def _get_similar_profiles_batch(
+        self, patient_dicts: List[Dict]
+    ) -> List[Union[List[int], Exception]]:
+        """
+        Similar profile ids per patient, or the exception that made their
+        retrieval fail, so one failed embedding does not fail the batch.
+        """
+        similar_profiles = await self.patients_vector_db.aget_documents_with_similarity_score_batch(  # noqa
+            user_queries=[canonical_json(d) for d in patient_dicts],
+            partitions=patient_dicts,
+            top_k=TOP_N_PATIENTS,
+            score_threshold=self._get_similarity_threshold(),
+            return_exceptions=True,
         )
-
-        high_success_messages = sorted_messages_by_likelihood[
-            :HIGH_SUCCESS_MESSAGES_COUNT
-        ]
-        low_success_messages = sorted_messages_by_likelihood[
-            -LOW_SUCCESS_MESSAGES_COUNT:
+        return [
+            (
+                profiles
+                if isinstance(profiles, BaseException)
+                else [doc.document_id for doc in profiles]
+            )
+            for profiles in similar_profiles
         ]
 
-        return high_success_messages, low_success_messages
+    def _get_messages_given_similar_profiles(
+        self, similar_profile_ids: List[int]
+    ) -> Tuple[List[Dict], List[Dict]]:
+        with time_stage(Stage.EXAMPLE_SELECTION):
+            return self.message_store.select_examples(
+                patient_ids=similar_profile_ids,
+                high_count=HIGH_SUCCESS_MESSAGES_COUNT,
+                low_count=LOW_SUCCESS_MESSAGES_COUNT,
+            )
 
     @staticmethod
-    def _update_entry_likelihood(
-        entry, was_successful: bool, is_high_success: bool
-    ) -> None:
-
+    def _get_likelihood_delta(
+        was_successful: bool, is_high_success: bool
+    ) -> float:
         should_increase = (is_high_success and was_successful) or (
             not is_high_success and not was_successful
         )
 
-        if should_increase:
-            entry["success_likelihood"] = min(
-                entry["success_likelihood"] + UPDATE_DELTA, 1.0
-            )
-        else:
-            entry["success_likelihood"] = max(
-                entry["success_likelihood"] - UPDATE_DELTA, 0.0
-            )
+        return UPDATE_DELTA if should_increase else -UPDATE_DELTA
@@ -0,0 +1,75 @@
+import bisect
+import heapq
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class MessageIndex:
+    """
+    Index from `patient_id` to that patient's messages, ordered by
+    descending success likelihood (ties keep dataset order). Selecting the
+    best or worst messages across a few patients is a k-way merge of their
+    sorted lists, independent of the dataset size.
+
+    Rows are indexed by reference, so likelihood updates made through
+    `update_likelihood` are reflected in the underlying dataset.
+    """
+
+    def __init__(self, rows: List[Dict]):
+        self._rows: List[Dict] = rows
+        self._positions: Dict[int, int] = {}
+        self._sorted_keys: Dict[int, List[Tuple[float, int]]] = {}
+
+        for position, row in enumerate(rows):
+            self._positions[row["id"]] = position
+            self._sorted_keys.setdefault(row["patient_id"], []).append(
+                self._sort_key(position)
+            )
+
+        for keys in self._sorted_keys.values():
+            keys.sort()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def get(self, entry_id: int) -> Optional[Dict]:
+        position = self._positions.get(entry_id)
+        return None if position is None else self._rows[position]
+
+    def top_k(self, patient_ids: Iterable[int], k: int) -> List[Dict]:
+        """Messages with the highest success likelihood, best first."""
+        merged = heapq.merge(*self._patient_keys(patient_ids))
+        return [self._rows[position] for _, position in islice(merged, k)]
+
+    def bottom_k(self, patient_ids: Iterable[int], k: int) -> List[Dict]:
+        """
+        Messages with the lowest success likelihood, in the same order as
+        the tail of the descending ranking.
+        """
+        merged = heapq.merge(
+            *(reversed(keys) for keys in self._patient_keys(patient_ids)),
+            reverse=True,
+        )
+        keys = list(islice(merged, k))
+        return [self._rows[position] for _, position in reversed(keys)]
+
+    def update_likelihood(self, entry_id: int, likelihood: float) -> None:
+        position = self._positions[entry_id]
+        row = self._rows[position]
+        keys = self._sorted_keys[row["patient_id"]]
+
+        del keys[bisect.bisect_left(keys, self._sort_key(position))]
+        row["success_likelihood"] = likelihood
+        bisect.insort(keys, self._sort_key(position))
+
+    def _sort_key(self, position: int) -> Tuple[float, int]:
+        return (-self._rows[position]["success_likelihood"], position)
+
+    def _patient_keys(
+        self, patient_ids: Iterable[int]
+    ) -> List[List[Tuple[float, int]]]:
+        return [
+            self._sorted_keys[patient_id]
+            for patient_id in dict.fromkeys(patient_ids)
+            if patient_id in self._sorted_keys
+        ]
@@ -0,0 +1,107 @@
+import asyncio
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from communication.feedback_log import FeedbackLog
+from communication.message_index import MessageIndex
+from communication.utils import StrEnum
+
+
+class MessageStoreBackend(StrEnum):
+    JSON = "json"
+    SQLITE = "sqlite"
+
+
+def clamp_likelihood(likelihood: float) -> float:
+    return min(max(likelihood, 0.0), 1.0)
+
+
+class MessageStore(ABC):
+    """
+    Pool of candidate messages per patient with their success likelihoods.
+    """
+
+    @abstractmethod
+    def get(self, entry_id: int) -> Optional[Dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def select_examples(
+        self, patient_ids: List[int], high_count: int, low_count: int
+    ) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Messages with the highest and lowest success likelihood for the
+        given patients, both ordered from most to least likely.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def apply_deltas(
+        self, deltas: Dict[int, float], feedback: List[Dict]
+    ) -> Dict[int, float]:
+        """
+        Add each delta to the entry's likelihood, clamped to [0, 1], record
+        the feedback that caused it and return the new likelihoods. Unknown
+        entry ids are ignored.
+        """
+        raise NotImplementedError
+
+    async def aclose(self) -> None:
+        pass
+
+
+class JsonMessageStore(MessageStore):
+    """
+    Message pool kept in memory, loaded from a JSON snapshot and persisted
+    through an append-only `FeedbackLog`.
+    """
+
+    def __init__(self, snapshot_path: Path, max_log_entries: int):
+        self.feedback_log = FeedbackLog(
+            snapshot_path=snapshot_path, max_log_entries=max_log_entries
+        )
+        self.rows = self.feedback_log.load()
+        self.message_index = MessageIndex(self.rows)
+        self._compaction_task: Optional[asyncio.Task] = None
+
+    def get(self, entry_id: int) -> Optional[Dict]:
+        return self.message_index.get(entry_id)
+
+    def select_examples(
+        self, patient_ids: List[int], high_count: int, low_count: int
+    ) -> Tuple[List[Dict], List[Dict]]:
+        return (
+            self.message_index.top_k(patient_ids, high_count),
+            self.message_index.bottom_k(patient_ids, low_count),
+        )
+
+    async def apply_deltas(
+        self, deltas: Dict[int, float], feedback: List[Dict]
+    ) -> Dict[int, float]:
+        success_likelihoods = {}
+        for entry_id, delta in deltas.items():
+            entry = self.message_index.get(entry_id)
+            if entry is None:
+                continue
+
+            likelihood = clamp_likelihood(entry["success_likelihood"] + delta)
+            self.message_index.update_likelihood(entry_id, likelihood)
+            success_likelihoods[entry_id] = likelihood
+
+        self.feedback_log.append(
+            feedback=feedback, success_likelihoods=success_likelihoods
+        )
+
+        if self.feedback_log.needs_compaction() and (
+            self._compaction_task is None or self._compaction_task.done()
+        ):
+            self._compaction_task = asyncio.create_task(
+                self.feedback_log.compact(self.rows)
+            )
+
+        return success_likelihoods
+
+    async def aclose(self) -> None:
+        if self._compaction_task is not None:
+            await self._compaction_task
@@ -0,0 +1,123 @@
+import time
+from typing import Callable, Dict, Iterator, Tuple, Union
+
+from prometheus_client import Counter, Histogram
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+from communication.utils import StrEnum
+
+# Upper bounds in seconds, from a cache hit to a slow completion
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+
+class Stage(StrEnum):
+    QUERY_EMBEDDING = "query_embedding"
+    VECTOR_SEARCH = "vector_search"
+    EXAMPLE_SELECTION = "example_selection"
+    PROMPT_RENDER = "prompt_render"
+    COMPLETION = "completion"
+    PERSISTENCE = "persistence"
+
+
+class CacheResult(StrEnum):
+    HIT = "hit"
+    MISS = "miss"
+
+
+class ServiceStatsCollector(Collector):
+    """
+    Expose the numeric leaves of a nested stats dict (e.g. a service's
+    `stats()`) as gauges named after their path, read on every scrape.
+    """
+
+    def __init__(self, prefix: str, get_stats: Callable[[], Dict]):
+        self.prefix = prefix
+        self.get_stats = get_stats
+
+    def collect(self) -> Iterator[GaugeMetricFamily]:
+        for path, value in _flatten(self.get_stats()):
+            name = "_".join((self.prefix,) + path)
+            yield GaugeMetricFamily(name, f"Service stat {name}.", value)
+
+    def describe(self) -> Iterator[GaugeMetricFamily]:
+        # Stats vary at runtime, so nothing is collected on registration
+        return iter(())
+
+
+def _flatten(
+    stats: Dict, path: Tuple = ()
+) -> Iterator[Tuple[Tuple, Union[int, float]]]:
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            yield from _flatten(value, path + (str(key),))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield path + (str(key),), value
+
+
+# Counters are exposed with a `_total` suffix added by the client
+STAGE_DURATION = Histogram(
+    "communication_stage_duration_seconds",
+    "Time spent in each stage of the communication pipeline.",
+    labelnames=("stage",),
+    buckets=DEFAULT_BUCKETS,
+)
+STAGE_ERRORS = Counter(
+    "communication_stage_errors",
+    "Errors raised by each stage of the communication pipeline.",
+    labelnames=("stage",),
+)
+CHAT_RETRIES = Counter(
+    "communication_chat_retries",
+    "Chat completion attempts retried after a transient API error.",
+    labelnames=("model", "error"),
+)
+CACHE_LOOKUPS = Counter(
+    "communication_cache_lookups",
+    "Cache lookups by cache and result.",
+    labelnames=("cache", "result"),
+)
+
+
+class time_stage:
+    """
+    Record the duration of a pipeline stage, and its errors. A class rather
+    than a generator based context manager to keep the overhead low.
+    """
+
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage: Stage):
+        self.stage = stage
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        STAGE_DURATION.labels(stage=self.stage).observe(
+            time.perf_counter() - self.start
+        )
+        if exc_type is not None and issubclass(exc_type, Exception):
+            STAGE_ERRORS.labels(stage=self.stage).inc()
+
+
+def record_cache_lookup(cache: str, hit: bool) -> None:
+    CACHE_LOOKUPS.labels(
+        cache=cache, result=CacheResult.HIT if hit else CacheResult.MISS
+    ).inc()
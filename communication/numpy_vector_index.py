@@ -0,0 +1,131 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from communication.vector_index import VectorIndex
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class NumpyVectorIndex(VectorIndex):
+    """
+    In-memory exact cosine search over a normalized float32 matrix. A batch
+    of queries is answered with a single matrix multiplication.
+
+    Metadata filters follow the Chroma `where` syntax for equality, `$eq`,
+    `$ne`, `$in`, `$nin`, `$and` and `$or`.
+    """
+
+    def __init__(self, documents: List[Document], embedding: Embeddings):
+        self._documents = documents
+        self._embedding = embedding
+
+        vectors = embedding.embed_documents(
+            [doc.page_content for doc in documents]
+        )
+        self._matrix = _normalize(np.asarray(vectors, dtype=np.float32))
+
+        metadata_keys = {key for doc in documents for key in doc.metadata}
+        self._metadata_columns = {
+            key: np.asarray(
+                [doc.metadata.get(key) for doc in documents], dtype=object
+            )
+            for key in metadata_keys
+        }
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def similarity_search(
+        self,
+        query: str,
+        k: int,
+        score_threshold: float,
+        retrieval_filter: Optional[Dict] = None,
+    ) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vectors(
+            embeddings=[self._embedding.embed_query(query)],
+            k=k,
+            score_threshold=score_threshold,
+            retrieval_filter=retrieval_filter,
+        )[0]
+
+    def similarity_search_by_vectors(
+        self,
+        embeddings: List[List[float]],
+        k: int,
+        score_threshold: float,
+        retrieval_filter: Optional[Dict] = None,
+    ) -> List[List[Tuple[Document, float]]]:
+        if not embeddings:
+            return []
+        if not self._documents or k <= 0:
+            return [[] for _ in embeddings]
+
+        queries = _normalize(np.asarray(embeddings, dtype=np.float32))
+        scores = queries @ self._matrix.T
+
+        if retrieval_filter:
+            scores[:, ~self._filter_mask(retrieval_filter)] = -np.inf
+
+        k = min(k, scores.shape[1])
+        top_k = np.argpartition(-scores, kth=k - 1, axis=1)[:, :k]
+        top_k_scores = np.take_along_axis(scores, top_k, axis=1)
+        order = np.argsort(-top_k_scores, axis=1, kind="stable")
+        top_k = np.take_along_axis(top_k, order, axis=1)
+        top_k_scores = np.take_along_axis(top_k_scores, order, axis=1)
+
+        return [
+            [
+                (self._documents[index], float(score))
+                for index, score in zip(row_indexes, row_scores)
+                if score >= score_threshold
+            ]
+            for row_indexes, row_scores in zip(top_k, top_k_scores)
+        ]
+
+    def _filter_mask(self, retrieval_filter: Dict) -> np.ndarray:
+        mask = np.ones(len(self._documents), dtype=bool)
+
+        for key, condition in retrieval_filter.items():
+            if key == "$and":
+                for sub_filter in condition:
+                    mask &= self._filter_mask(sub_filter)
+            elif key == "$or":
+                or_mask = np.zeros(len(self._documents), dtype=bool)
+                for sub_filter in condition:
+                    or_mask |= self._filter_mask(sub_filter)
+                mask &= or_mask
+            else:
+                mask &= self._condition_mask(key, condition)
+
+        return mask
+
+    def _condition_mask(self, key: str, condition: Any) -> np.ndarray:
+        column = self._metadata_columns.get(key)
+        if column is None:
+            column = np.full(len(self._documents), None, dtype=object)
+
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+
+        mask = np.ones(len(self._documents), dtype=bool)
+        for operator, value in condition.items():
+            if operator == "$eq":
+                mask &= column == value
+            elif operator == "$ne":
+                mask &= column != value
+            elif operator == "$in":
+                mask &= np.isin(column, list(value))
+            elif operator == "$nin":
+                mask &= ~np.isin(column, list(value))
+            else:
+                raise ValueError(f"Unsupported filter operator: {operator}")
+
+        return mask
@@ -0,0 +1,148 @@
+import json
+import math
+from enum import Enum
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from communication.schema import PatientProfile
+from communication.utils import StrEnum
+
+EXCLUDED_FIELDS = {"name"}
+
+
+class SimilarityMode(StrEnum):
+    EMBEDDING = "embedding"
+    STRUCTURED = "structured"
+
+
+class ProfileFeatureEncoder(Embeddings):
+    """
+    Deterministic local encoder for `PatientProfile` features, usable as an
+    embedding function so profile similarity needs no embedding API call.
+
+    Every feature is encoded as a unit-norm block scaled by the square root
+    of its weight: categoricals and booleans are one-hot, numerics are
+    min-max scaled to an angle so that close values stay similar. The cosine
+    similarity of two encoded profiles is therefore the weighted average of
+    per-feature similarities. Unknown categorical values encode to zeros.
+    """
+
+    def __init__(
+        self,
+        vocabularies: Dict[str, List],
+        numeric_ranges: Dict[str, Tuple[float, float]],
+        weights: Optional[Dict[str, float]] = None,
+    ):
+        self.vocabularies = vocabularies
+        self.numeric_ranges = numeric_ranges
+        self.weights = weights or {}
+
+        self._offsets = {}
+        self._dimension = 0
+        for field in self._fields():
+            self._offsets[field] = self._dimension
+            self._dimension += (
+                2 if field in numeric_ranges else len(self.vocabularies[field])
+            )
+
+        self._vocabulary_indexes = {
+            field: {value: index for index, value in enumerate(values)}
+            for field, values in vocabularies.items()
+        }
+
+    @classmethod
+    def from_profiles(
+        cls, profiles: List[Dict], weights: Optional[Dict[str, float]] = None
+    ) -> "ProfileFeatureEncoder":
+        """
+        Build the encoder from the `PatientProfile` schema. Enum fields use
+        their declared values, other categorical fields and numeric ranges
+        are learned from the given profiles.
+        """
+        vocabularies = {}
+        numeric_ranges = {}
+
+        for field, field_info in PatientProfile.model_fields.items():
+            if field in EXCLUDED_FIELDS:
+                continue
+
+            annotation = field_info.annotation
+            if isinstance(annotation, type) and issubclass(annotation, Enum):
+                vocabularies[field] = [member.value for member in annotation]
+            elif annotation is bool:
+                vocabularies[field] = [False, True]
+            elif annotation is int:
+                values = [profile[field] for profile in profiles]
+                numeric_ranges[field] = (
+                    (min(values), max(values)) if values else (0, 1)
+                )
+            else:
+                vocabularies[field] = sorted(
+                    {profile[field] for profile in profiles}
+                )
+
+        return cls(
+            vocabularies=vocabularies,
+            numeric_ranges=numeric_ranges,
+            weights=weights,
+        )
+
+    @property
+    def dimension(self) -> int:
+        return self._dimension
+
+    def encode(self, profile: Dict) -> np.ndarray:
+        vector = np.zeros(self._dimension, dtype=np.float32)
+
+        for field, offset in self._offsets.items():
+            scale = math.sqrt(self.weights.get(field, 1.0))
+            value = profile.get(field)
+
+            if field in self.numeric_ranges:
+                if value is None:
+                    continue
+                low, high = self.numeric_ranges[field]
+                scaled = (value - low) / (high - low) if high > low else 0.0
+                angle = min(max(scaled, 0.0), 1.0) * math.pi / 2
+                vector[offset] = scale * math.cos(angle)
+                vector[offset + 1] = scale * math.sin(angle)
+            else:
+                index = self._vocabulary_indexes[field].get(
+                    value.value if isinstance(value, Enum) else value
+                )
+                if index is not None:
+                    vector[offset + index] = scale
+
+        return vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.encode(self._profile_from_text(text)).tolist()
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return self.embed_query(text)
+
+    def _fields(self) -> List[str]:
+        return [
+            field
+            for field in PatientProfile.model_fields
+            if field in self.vocabularies or field in self.numeric_ranges
+        ]
+
+    @staticmethod
+    def _profile_from_text(text: str) -> Dict:
+        """
+        Accept either a serialized profile (queries) or a knowledge base
+        document with the profile under `content`.
+        """
+        data = json.loads(text)
+        if isinstance(data.get("content"), dict):
+            return data["content"]
+        return data
@@ -1,8 +1,14 @@
+import hashlib
 from pathlib import Path
+from typing import Optional, Tuple
 
 from jinja2 import Environment, FileSystemLoader, StrictUndefined
 
 from communication.config import PROMPTS_DIR
+from communication.token_counter import (
+    DEFAULT_TOKEN_ENCODING,
+    get_token_counter,
+)
 from communication.utils import StrEnum
 
 
@@ -20,8 +26,15 @@ class PromptTemplate:
         system_message_template_file: str,
         user_message_template_file: str,
         prompts_dir: Path = PROMPTS_DIR,
+        token_encoding: str = DEFAULT_TOKEN_ENCODING,
     ):
 
+        self._prompts_dir = Path(prompts_dir)
+        self.token_encoding = token_encoding
+        self._version: Optional[str] = None
+        self._version_stats: Optional[Tuple] = None
+        self._static_system_message: Optional[Tuple[str, str]] = None
+
         self._jinja_env = Environment(
             loader=FileSystemLoader([prompts_dir]),
             trim_blocks=True,
@@ -36,15 +49,80 @@ class PromptTemplate:
         }
 
     def build_system_message(self, **kwargs) -> str:
-        return self._build_message(
-            prompt_model_role=PromptTemplateModelRole.SYSTEM_MESSAGE, **kwargs
-        )
+        if kwargs:
+            return self._build_message(
+                prompt_model_role=PromptTemplateModelRole.SYSTEM_MESSAGE,
+                **kwargs,
+            )
+
+        # Without variables the system message is static, so it is rendered
+        # once per template version
+        version = self.get_version()
+        if (
+            self._static_system_message is None
+            or self._static_system_message[0] != version
+        ):
+            self._static_system_message = (
+                version,
+                self._build_message(
+                    prompt_model_role=PromptTemplateModelRole.SYSTEM_MESSAGE
+                ),
+            )
+
+        return self._static_system_message[1]
 
     def build_user_message(self, **kwargs) -> str:
         return self._build_message(
             prompt_model_role=PromptTemplateModelRole.USER_MESSAGE, **kwargs
         )
 
+    def compile(self) -> None:
+        """
+        Load and compile the templates and the token counter ahead of the
+        first request.
+        """
+        for filename in self._template_filenames.values():
+            self._jinja_env.get_template(filename)
+        self.get_version()
+        get_token_counter(self.token_encoding)
+
+    def count_tokens(self, text: str) -> int:
+        """Number of tokens in a rendered message, counted locally."""
+        return get_token_counter(self.token_encoding).count(text)
+
+    @property
+    def token_count_is_exact(self) -> bool:
+        """False when token counts are estimated from text length."""
+        return get_token_counter(self.token_encoding).is_exact
+
+    def truncate_tokens(self, text: str, max_tokens: int) -> str:
+        return get_token_counter(self.token_encoding).truncate(
+            text, max_tokens
+        )
+
+    def get_version(self) -> str:
+        """
+        Hash of the template files contents, recomputed only when a file
+        modification time or size changes.
+        """
+        template_paths = [
+            self._prompts_dir / filename
+            for filename in self._template_filenames.values()
+        ]
+        stats = tuple(
+            (path.stat().st_mtime_ns, path.stat().st_size)
+            for path in template_paths
+        )
+
+        if stats != self._version_stats:
+            digest = hashlib.sha256()
+            for path in template_paths:
+                digest.update(path.read_bytes())
+            self._version = digest.hexdigest()
+            self._version_stats = stats
+
+        return self._version
+
     def _build_message(
         self, prompt_model_role: PromptTemplateModelRole, **kwargs
     ) -> str:
@@ -0,0 +1,156 @@
+import asyncio
+import random
+import time
+import weakref
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+import httpx
+
+
+class TokenBucket:
+    """
+    Asyncio token bucket refilled continuously up to its capacity. Waiters
+    are served in arrival order. Buckets are shared process-wide, so each
+    event loop gets its own lock.
+    """
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        if capacity <= 0 or refill_per_second <= 0:
+            raise ValueError("capacity and refill rate must be positive.")
+
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._locks: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+    @property
+    def available(self) -> float:
+        self._refill()
+        return self._tokens
+
+    async def acquire(self, amount: float) -> float:
+        """Take `amount` tokens, waiting if needed. Returns seconds waited."""
+        # A request larger than the bucket could never be served otherwise
+        amount = min(amount, self.capacity)
+        waited = 0.0
+
+        async with self._get_lock():
+            while True:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return waited
+
+                delay = (amount - self._tokens) / self.refill_per_second
+                await asyncio.sleep(delay)
+                waited += delay
+
+    def adjust(self, amount: float) -> None:
+        """
+        Take (or give back, if negative) tokens without waiting, e.g. once
+        the real cost of an estimated request is known. The balance may go
+        negative, delaying later callers.
+        """
+        self._refill()
+        self._tokens = min(self._tokens - amount, self.capacity)
+
+    def _get_lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        lock = self._locks.get(loop)
+        if lock is None:
+            lock = self._locks[loop] = asyncio.Lock()
+        return lock
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity,
+            self._tokens + (now - self._updated_at) * self.refill_per_second,
+        )
+        self._updated_at = now
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute limits for one model. Can be
+    paused for everyone, e.g. when the API answers with a 429.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests = TokenBucket(
+            capacity=requests_per_minute,
+            refill_per_second=requests_per_minute / 60,
+        )
+        self.tokens = TokenBucket(
+            capacity=tokens_per_minute,
+            refill_per_second=tokens_per_minute / 60,
+        )
+        self.throttled_seconds = 0.0
+        self.pauses = 0
+
+        self._paused_until = 0.0
+
+    async def acquire(self, tokens: int) -> None:
+        pause = self._paused_until - time.monotonic()
+        if pause > 0:
+            await asyncio.sleep(pause)
+            self.throttled_seconds += pause
+
+        self.throttled_seconds += await self.requests.acquire(1)
+        self.throttled_seconds += await self.tokens.acquire(tokens)
+
+    def record_usage(self, estimated_tokens: int, used_tokens: int) -> None:
+        self.tokens.adjust(used_tokens - estimated_tokens)
+
+    def pause(self, seconds: float) -> None:
+        self.pauses += 1
+        self._paused_until = max(
+            self._paused_until, time.monotonic() + seconds
+        )
+
+    def stats(self) -> Dict:
+        return {
+            "available_requests": self.requests.available,
+            "available_tokens": self.tokens.available,
+            "throttled_seconds": self.throttled_seconds,
+            "pauses": self.pauses,
+        }
+
+
+def get_retry_after(response: Optional[httpx.Response]) -> Optional[float]:
+    """Seconds to wait according to the response headers, if any."""
+    if response is None:
+        return None
+
+    retry_after_ms = response.headers.get("retry-after-ms")
+    if retry_after_ms is not None:
+        try:
+            return max(float(retry_after_ms) / 1000, 0.0)
+        except ValueError:
+            pass
+
+    retry_after = response.headers.get("retry-after")
+    if retry_after is None:
+        return None
+
+    try:
+        return max(float(retry_after), 0.0)
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+def get_backoff_delay(
+    attempt: int, base_seconds: float, max_seconds: float
+) -> float:
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(max_seconds, base_seconds * 2**attempt))
@@ -7,6 +7,14 @@ class CommunicationUseCase(StrEnum):
     MEDICATION_ADHERENCE = "medication_adherence"
 
 
+class GenerationMode(StrEnum):
+    # One completion per patient, with their name in the prompt
+    INDIVIDUAL = "individual"
+    # Name replaced by a placeholder, so one completion serves every patient
+    # with the same profile
+    COHORT = "cohort"
+
+
 # Define enums for fields with limited valid options
 class Gender(StrEnum):
     MALE = "Male"
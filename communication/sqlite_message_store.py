@@ -0,0 +1,230 @@
+import argparse
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from communication.feedback_log import FeedbackLog
+from communication.message_store import MessageStore
+from communication.utils import batched
+
+# SQLite limits the number of bound parameters per statement
+INSERT_BATCH_SIZE = 500
+# `user_version` set in the migration's transaction once every row is in
+MIGRATED_USER_VERSION = 1
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS messages ("
+    "id INTEGER PRIMARY KEY, "
+    "patient_id INTEGER NOT NULL, "
+    "message_id INTEGER NOT NULL, "
+    "success_likelihood REAL NOT NULL, "
+    "data TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS idx_messages_patient_likelihood "
+    "ON messages (patient_id, success_likelihood)",
+    "CREATE INDEX IF NOT EXISTS idx_messages_message_id "
+    "ON messages (message_id)",
+    "CREATE INDEX IF NOT EXISTS idx_messages_success_likelihood "
+    "ON messages (success_likelihood)",
+    "CREATE TABLE IF NOT EXISTS feedback ("
+    "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+    "created_at REAL NOT NULL, "
+    "request_uuid TEXT, "
+    "data TEXT NOT NULL)",
+)
+
+
+class SQLiteMessageStore(MessageStore):
+    """
+    Message pool stored in SQLite in WAL mode, so several worker processes
+    can share it. Example selection is an indexed query and each feedback is
+    applied in a single transaction. Ties in likelihood are broken by id.
+    """
+
+    def __init__(self, database_path: Path):
+        self.database_path = database_path
+        self._lock = threading.Lock()
+        self._connection = connect(database_path)
+
+    def get(self, entry_id: int) -> Optional[Dict]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT success_likelihood, data FROM messages WHERE id = ?",
+                (entry_id,),
+            ).fetchone()
+
+        return None if row is None else self._to_entry(*row)
+
+    def select_examples(
+        self, patient_ids: List[int], high_count: int, low_count: int
+    ) -> Tuple[List[Dict], List[Dict]]:
+        patient_ids = list(dict.fromkeys(patient_ids))
+        if not patient_ids:
+            return [], []
+
+        placeholders = ", ".join("?" * len(patient_ids))
+        with self._lock:
+            high_rows = self._connection.execute(
+                "SELECT success_likelihood, data FROM messages "
+                f"WHERE patient_id IN ({placeholders}) "
+                "ORDER BY success_likelihood DESC, id ASC LIMIT ?",
+                (*patient_ids, high_count),
+            ).fetchall()
+            low_rows = self._connection.execute(
+                "SELECT success_likelihood, data FROM messages "
+                f"WHERE patient_id IN ({placeholders}) "
+                "ORDER BY success_likelihood ASC, id DESC LIMIT ?",
+                (*patient_ids, low_count),
+            ).fetchall()
+
+        return (
+            [self._to_entry(*row) for row in high_rows],
+            [self._to_entry(*row) for row in reversed(low_rows)],
+        )
+
+    async def apply_deltas(
+        self, deltas: Dict[int, float], feedback: List[Dict]
+    ) -> Dict[int, float]:
+        return await asyncio.to_thread(self._apply_deltas, deltas, feedback)
+
+    async def aclose(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def _apply_deltas(
+        self, deltas: Dict[int, float], feedback: List[Dict]
+    ) -> Dict[int, float]:
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "UPDATE messages SET success_likelihood = "
+                "MIN(MAX(success_likelihood + ?, 0.0), 1.0) WHERE id = ?",
+                [(delta, entry_id) for entry_id, delta in deltas.items()],
+            )
+            self._connection.executemany(
+                "INSERT INTO feedback (created_at, request_uuid, data) "
+                "VALUES (?, ?, ?)",
+                [
+                    (
+                        time.time(),
+                        record.get("request_uuid"),
+                        json.dumps(record, ensure_ascii=False),
+                    )
+                    for record in feedback
+                ],
+            )
+
+            success_likelihoods = {}
+            for batch in batched(list(deltas.keys()), INSERT_BATCH_SIZE):
+                success_likelihoods.update(
+                    self._connection.execute(
+                        "SELECT id, success_likelihood FROM messages "
+                        f"WHERE id IN ({', '.join('?' * len(batch))})",
+                        batch,
+                    ).fetchall()
+                )
+
+        return success_likelihoods
+
+    @staticmethod
+    def _to_entry(success_likelihood: float, data: str) -> Dict:
+        entry = json.loads(data)
+        entry["success_likelihood"] = success_likelihood
+        return entry
+
+
+def connect(database_path: Path) -> sqlite3.Connection:
+    database_path.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(
+        database_path, timeout=30, check_same_thread=False
+    )
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    with connection:
+        _create_schema(connection)
+    return connection
+
+
+def _create_schema(connection: sqlite3.Connection) -> None:
+    for statement in SCHEMA:
+        connection.execute(statement)
+
+
+def is_migrated(database_path: Path) -> bool:
+    """
+    Whether a migration into the database completed. A database left by an
+    interrupted migration exists but is not marked as migrated.
+    """
+    if not database_path.exists():
+        return False
+
+    connection = sqlite3.connect(database_path, timeout=30)
+    try:
+        (user_version,) = connection.execute("PRAGMA user_version").fetchone()
+    finally:
+        connection.close()
+
+    return user_version >= MIGRATED_USER_VERSION
+
+
+def migrate_json_to_sqlite(json_path: Path, database_path: Path) -> int:
+    """
+    Copy the JSON message pool, including feedback still pending in its
+    log, into the SQLite database. The schema, the rows and the migrated
+    marker are written in one transaction, so an interrupted migration
+    leaves nothing behind. Existing rows are left untouched, so the
+    migration is safe to run concurrently or more than once.
+    """
+    rows = FeedbackLog(snapshot_path=json_path, max_log_entries=0).load()
+
+    database_path.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(database_path, timeout=30)
+    try:
+        connection.execute("PRAGMA journal_mode=WAL")
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            _create_schema(connection)
+            for batch in batched(rows, INSERT_BATCH_SIZE):
+                connection.executemany(
+                    "INSERT OR IGNORE INTO messages "
+                    "(id, patient_id, message_id, success_likelihood, data) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (
+                            row["id"],
+                            row["patient_id"],
+                            row["message_id"],
+                            row["success_likelihood"],
+                            json.dumps(row, ensure_ascii=False),
+                        )
+                        for row in batch
+                    ],
+                )
+            connection.execute(
+                f"PRAGMA user_version = {MIGRATED_USER_VERSION}"
+            )
+    finally:
+        connection.close()
+
+    logging.info(f"Migrated {len(rows)} rows from {json_path.name}.")
+
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Migrate a JSON message pool to SQLite."
+    )
+    parser.add_argument("json_path", type=Path)
+    parser.add_argument("database_path", type=Path)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    migrate_json_to_sqlite(args.json_path, args.database_path)
+
+
+if __name__ == "__main__":
+    main()
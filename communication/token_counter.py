@@ -0,0 +1,98 @@
+import hashlib
+import logging
+import math
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+# Encoding used by gpt-4o
+DEFAULT_TOKEN_ENCODING = "o200k_base"
+# Estimate used when the tiktoken encoding is not available
+CHARS_PER_TOKEN = 4
+# Where tiktoken downloads each encoding from, its cached copy is named
+# after the SHA-1 of this URL
+TOKEN_ENCODING_URLS = {
+    "o200k_base": (
+        "https://openaipublic.blob.core.windows.net/encodings/"
+        "o200k_base.tiktoken"
+    ),
+}
+
+
+class TokenCounter:
+    """
+    Counts tokens locally with tiktoken. The encoding is only loaded when it
+    is already in `TIKTOKEN_CACHE_DIR` (tiktoken would otherwise download
+    it); without it, a characters-per-token estimate is used instead.
+    """
+
+    def __init__(self, encoding_name: str = DEFAULT_TOKEN_ENCODING):
+        self.encoding_name = encoding_name
+        self._encoding = self._load_encoding(encoding_name)
+
+    @property
+    def is_exact(self) -> bool:
+        return self._encoding is not None
+
+    def count(self, text: str) -> int:
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        if self._encoding is not None:
+            tokens = self._encoding.encode(text, disallowed_special=())
+            if len(tokens) <= max_tokens:
+                return text
+            return self._encoding.decode(tokens[:max_tokens])
+
+        return text[: max_tokens * CHARS_PER_TOKEN]
+
+    @staticmethod
+    def _load_encoding(encoding_name: str):
+        if _get_cached_encoding_path(encoding_name) is None:
+            return None
+
+        try:
+            import tiktoken
+
+            return tiktoken.get_encoding(encoding_name)
+        except Exception as e:
+            logging.warning(
+                f"Could not load tiktoken encoding {encoding_name} ({e}), "
+                "token counts are estimated from text length."
+            )
+            return None
+
+
+def _get_cached_encoding_path(encoding_name: str) -> Optional[Path]:
+    cache_dir = os.environ.get("TIKTOKEN_CACHE_DIR")
+    url = TOKEN_ENCODING_URLS.get(encoding_name)
+    if not cache_dir or url is None:
+        return None
+
+    path = Path(cache_dir, hashlib.sha1(url.encode()).hexdigest())
+    return path if path.exists() else None
+
+
+def get_token_counter(
+    encoding_name: str = DEFAULT_TOKEN_ENCODING,
+) -> TokenCounter:
+    # Cached by encoding name, whether or not it was passed explicitly
+    return _get_token_counter(encoding_name)
+
+
+@lru_cache()
+def _get_token_counter(encoding_name: str) -> TokenCounter:
+    token_counter = TokenCounter(encoding_name=encoding_name)
+    if not token_counter.is_exact:
+        # Logged once per process, when the shared counter is first created
+        logging.warning(
+            f"Tiktoken encoding {encoding_name} is not available, token "
+            f"counts are estimated at {CHARS_PER_TOKEN} characters per "
+            "token. Set TIKTOKEN_CACHE_DIR to a directory holding the "
+            "cached encoding to count them exactly."
+        )
+    return token_counter
@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+from communication.message_store import MessageStore
+from communication.metrics import Stage, time_stage
+
+
+class LikelihoodUpdateQueue:
+    """
+    Single writer for success likelihood updates. Concurrent submissions are
+    merged into net deltas per entry id and applied to the store in one call,
+    at most once per flush interval.
+    """
+
+    def __init__(self, store: MessageStore, flush_interval_seconds: float):
+        self.store = store
+        self.flush_interval_seconds = flush_interval_seconds
+        self.submitted = 0
+        self.flushes = 0
+        self.last_flush_latency_seconds = 0.0
+        self.max_flush_latency_seconds = 0.0
+
+        self._pending: List[
+            Tuple[Dict[int, float], List[Dict], asyncio.Future]
+        ] = []
+        self._total_flush_latency_seconds = 0.0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._closing: Optional[asyncio.Event] = None
+        self._writer_task: Optional[asyncio.Task] = None
+
+    async def submit(
+        self, deltas: Dict[int, float], feedback: List[Dict]
+    ) -> Dict[int, float]:
+        """
+        Queue the deltas and wait until they are persisted. Returns the new
+        likelihoods of the submitted entry ids.
+        """
+        self._ensure_writer()
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((deltas, feedback, future))
+        self.submitted += 1
+        self._wakeup.set()
+
+        return await future
+
+    async def aclose(self) -> None:
+        """Flush pending updates and stop the writer task."""
+        if self._writer_task is None:
+            return
+
+        if (
+            self._writer_task.done()
+            or self._writer_task.get_loop() is not asyncio.get_running_loop()
+        ):
+            # Writer already stopped, e.g. its event loop was closed
+            self._writer_task = None
+            return
+
+        self._closing.set()
+        self._wakeup.set()
+        await self._writer_task
+        self._writer_task = None
+
+    def stats(self) -> Dict:
+        return {
+            "depth": len(self._pending),
+            "submitted": self.submitted,
+            "flushes": self.flushes,
+            "last_flush_latency_seconds": self.last_flush_latency_seconds,
+            "max_flush_latency_seconds": self.max_flush_latency_seconds,
+            "mean_flush_latency_seconds": (
+                self._total_flush_latency_seconds / self.flushes
+                if self.flushes
+                else 0.0
+            ),
+        }
+
+    def _ensure_writer(self) -> None:
+        if (
+            self._writer_task is not None
+            and not self._writer_task.done()
+            and self._writer_task.get_loop() is asyncio.get_running_loop()
+        ):
+            return
+
+        self._wakeup = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._writer_task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            await self._flush()
+
+            if self._closing.is_set():
+                return
+
+            try:
+                await asyncio.wait_for(
+                    self._closing.wait(), timeout=self.flush_interval_seconds
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    async def _flush(self) -> None:
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        net_deltas = {}
+        merged_feedback = []
+        for deltas, feedback, _ in batch:
+            for entry_id, delta in deltas.items():
+                net_deltas[entry_id] = net_deltas.get(entry_id, 0.0) + delta
+            merged_feedback.extend(feedback)
+
+        start = time.perf_counter()
+        try:
+            with time_stage(Stage.PERSISTENCE):
+                success_likelihoods = await self.store.apply_deltas(
+                    deltas=net_deltas, feedback=merged_feedback
+                )
+        except Exception as exception:
+            logging.exception("Failed to apply success likelihood updates.")
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(exception)
+            return
+
+        latency = time.perf_counter() - start
+        self.flushes += 1
+        self.last_flush_latency_seconds = latency
+        self.max_flush_latency_seconds = max(
+            self.max_flush_latency_seconds, latency
+        )
+        self._total_flush_latency_seconds += latency
+
+        for deltas, _, future in batch:
+            if not future.done():
+                future.set_result(
+                    {
+                        entry_id: success_likelihoods[entry_id]
+                        for entry_id in deltas
+                        if entry_id in success_likelihoods
+                    }
+                )
@@ -1,7 +1,11 @@
+import hashlib
 import json
+import os
+import tempfile
 from enum import Enum
+from itertools import islice
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Iterable, Iterator, List
 
 
 class ExtendedEnum(Enum):
@@ -22,3 +26,37 @@ class StrEnum(str, ExtendedEnum):
 def load_json_file(file_path: Path) -> Dict:
     with open(file_path, "r", encoding="utf-8") as file:
         return json.load(file)
+
+
+def write_text_file_atomic(file_path: Path, text: str) -> None:
+    """
+    Write to a temporary file in the same directory and rename it over the
+    target, so readers never observe a partially written file.
+    """
+    with tempfile.NamedTemporaryFile(
+        "w",
+        encoding="utf-8",
+        dir=file_path.parent,
+        prefix=f".{file_path.name}.",
+        delete=False,
+    ) as file:
+        file.write(text)
+        file.flush()
+        os.fsync(file.fileno())
+
+    os.replace(file.name, file_path)
+
+
+def canonical_json(data: Dict) -> str:
+    """Deterministic JSON serialization, independent of key order."""
+    return json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+
+
+def hash_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def batched(items: Iterable, batch_size: int) -> Iterator[List]:
+    iterator = iter(items)
+    while batch := list(islice(iterator, batch_size)):
+        yield batch
@@ -1,14 +1,34 @@
+import asyncio
+import heapq
 import json
 import logging
 from dataclasses import dataclass
+from itertools import chain
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 from langchain_chroma import Chroma
 from langchain_community.document_loaders import JSONLoader
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 from langchain_openai import OpenAIEmbeddings
 
+from communication.cache import TTLCache
+from communication.embedding_cache import (
+    CachedEmbeddings,
+    QueryCachedEmbeddings,
+    aembed_queries,
+)
+from communication.http_client import HttpClients
+from communication.metrics import STAGE_ERRORS, Stage, time_stage
+from communication.numpy_vector_index import NumpyVectorIndex
+from communication.single_flight import SingleFlight
+from communication.utils import batched, hash_text
+from communication.vector_index import VectorIndex, VectorIndexBackend
+
+# Maximum number of documents sent to Chroma in a single upsert/delete
+SYNC_BATCH_SIZE = 1000
+
 
 @dataclass
 class SimilaritySearchResult:
@@ -17,6 +37,139 @@ class SimilaritySearchResult:
     similarity_score: float
 
 
+class ChromaVectorIndex(VectorIndex):
+    """Approximate (HNSW) cosine search backed by a Chroma collection."""
+
+    def __init__(
+        self,
+        collection_name: str,
+        documents: List[Document],
+        embedding: Embeddings,
+        persist_directory: Optional[Path] = None,
+    ):
+        self.collection_name = collection_name
+
+        if persist_directory is None:
+            self.store = Chroma.from_documents(
+                collection_name=collection_name,
+                documents=documents,
+                embedding=embedding,
+                collection_metadata={"hnsw:space": "cosine"},
+            )
+        else:
+            self.store = Chroma(
+                collection_name=collection_name,
+                embedding_function=embedding,
+                persist_directory=str(persist_directory),
+                collection_metadata={"hnsw:space": "cosine"},
+            )
+            self._sync_store(documents=documents)
+
+    def similarity_search(
+        self,
+        query: str,
+        k: int,
+        score_threshold: float,
+        retrieval_filter: Optional[Dict] = None,
+    ) -> List[Tuple[Document, float]]:
+        return self.store.similarity_search_with_relevance_scores(
+            query=query,
+            k=k,
+            score_threshold=score_threshold,
+            filter=retrieval_filter,
+        )
+
+    def similarity_search_by_vectors(
+        self,
+        embeddings: List[List[float]],
+        k: int,
+        score_threshold: float,
+        retrieval_filter: Optional[Dict] = None,
+    ) -> List[List[Tuple[Document, float]]]:
+        if not embeddings:
+            return []
+
+        # One query for the whole batch. The collection uses the cosine
+        # space, so a distance converts to a relevance score as 1 - distance
+        results = self.store._collection.query(
+            query_embeddings=embeddings,
+            n_results=k,
+            where=retrieval_filter,
+            include=["documents", "metadatas", "distances"],
+        )
+
+        return [
+            [
+                (
+                    Document(
+                        page_content=content,
+                        metadata=metadata or {},
+                        id=document_id,
+                    ),
+                    1.0 - distance,
+                )
+                for content, metadata, document_id, distance in zip(
+                    contents, metadatas, document_ids, distances
+                )
+                if 1.0 - distance >= score_threshold
+            ]
+            for contents, metadatas, document_ids, distances in zip(
+                results["documents"],
+                results["metadatas"],
+                results["ids"],
+                results["distances"],
+            )
+        ]
+
+    def _sync_store(self, documents: List[Document]) -> None:
+        """
+        Bring a persisted collection in line with the knowledge base, diffing
+        by document id and content hash so that only added, changed or
+        removed documents are written.
+        """
+        stored = self.store.get(include=["metadatas"])
+        stored_hashes = {
+            document_id: (metadata or {}).get("content_hash")
+            for document_id, metadata in zip(
+                stored["ids"], stored["metadatas"]
+            )
+        }
+
+        kb_documents = {str(doc.metadata["id"]): doc for doc in documents}
+
+        added_ids = [
+            document_id
+            for document_id in kb_documents
+            if document_id not in stored_hashes
+        ]
+        changed_ids = [
+            document_id
+            for document_id, doc in kb_documents.items()
+            if document_id in stored_hashes
+            and stored_hashes[document_id] != doc.metadata["content_hash"]
+        ]
+        removed_ids = [
+            document_id
+            for document_id in stored_hashes
+            if document_id not in kb_documents
+        ]
+
+        for batch in batched(removed_ids, SYNC_BATCH_SIZE):
+            self.store.delete(ids=batch)
+
+        for batch in batched(added_ids + changed_ids, SYNC_BATCH_SIZE):
+            self.store.add_documents(
+                documents=[kb_documents[document_id] for document_id in batch],
+                ids=batch,
+            )
+
+        logging.info(
+            f"Synced collection {self.collection_name}: "
+            f"{len(added_ids)} added, {len(changed_ids)} changed, "
+            f"{len(removed_ids)} removed."
+        )
+
+
 class VectorDatabase:
     def __init__(
         self,
@@ -25,9 +178,33 @@ class VectorDatabase:
         embedding_model: str,
         openai_key: str,
         file_jq_schema: str,
+        embedding_cache_path: Optional[Path] = None,
+        persist_directory: Optional[Path] = None,
+        query_cache: Optional[TTLCache] = None,
+        backend: VectorIndexBackend = VectorIndexBackend.CHROMA,
+        embedding: Optional[Embeddings] = None,
+        partition_keys: Optional[List[str]] = None,
+        query_single_flight: Optional[SingleFlight] = None,
+        http_clients: Optional[HttpClients] = None,
+        openai_base_url: Optional[str] = None,
+        content_metadata_keys: Optional[List[str]] = None,
     ):
         self.kb_directory_path = kb_directory_path
         self.kb_file_name = kb_file_name
+        # Vectors from different models must never share a collection, so
+        # the name is keyed by model like the embedding cache namespace
+        self.collection_name = (
+            f"{kb_file_name}-{hash_text(embedding_model)[:12]}"
+        )
+        self.embedding_cache_path = embedding_cache_path
+        self.persist_directory = persist_directory
+        self.query_cache = query_cache
+        self.query_single_flight = query_single_flight
+        self.http_clients = http_clients
+        self.openai_base_url = openai_base_url
+        self.backend = backend
+        self.partition_keys = partition_keys
+        self.content_metadata_keys = content_metadata_keys or []
 
         self._validate_schema(file_jq_schema)
         self.file_jq_schema = file_jq_schema
@@ -41,28 +218,163 @@ class VectorDatabase:
 
         logging.info(f"Loaded {len(documents)} documents.")
 
-        self._store = self._get_store_from_documents(
-            documents=documents,
+        # An injected embedding function (e.g. a local encoder) is used as is
+        self._embedding = embedding or self._get_embedding_function(
             embedding_model=embedding_model,
             openai_key=openai_key,
         )
+        if partition_keys:
+            self._partitions = self._get_partitions_from_documents(
+                documents=documents,
+                embedding=self._embedding,
+            )
+            logging.info(
+                f"Built {len(self._partitions)} partitions by "
+                f"{partition_keys}."
+            )
+        else:
+            self._index = self._get_index_from_documents(
+                documents=documents,
+                embedding=self._embedding,
+                collection_name=self.collection_name,
+            )
         logging.info("Initialized VectorDatabase from documents.")
 
-    def _get_store_from_documents(
-        self, documents: List[Document], embedding_model: str, openai_key: str
-    ) -> Chroma:
+    def _get_embedding_function(
+        self, embedding_model: str, openai_key: str
+    ) -> Embeddings:
         emb_func = OpenAIEmbeddings(
             model=embedding_model,
             openai_api_key=openai_key,
+            **(
+                {
+                    "http_client": self.http_clients.sync_client,
+                    "http_async_client": self.http_clients.async_client,
+                }
+                if self.http_clients is not None
+                else {}
+            ),
+            # Stand-in servers take raw text, so inputs are not tokenized
+            # with tiktoken (whose encodings are downloaded on first use)
+            **(
+                {
+                    "openai_api_base": self.openai_base_url,
+                    "check_embedding_ctx_length": False,
+                }
+                if self.openai_base_url is not None
+                else {}
+            ),
         )
 
-        return Chroma.from_documents(
-            collection_name=self.kb_file_name,
+        if self.embedding_cache_path is not None:
+            emb_func = CachedEmbeddings(
+                embeddings=emb_func,
+                namespace=embedding_model,
+                cache_path=self.embedding_cache_path,
+            )
+
+        if self.query_cache is not None:
+            emb_func = QueryCachedEmbeddings(
+                embeddings=emb_func,
+                query_cache=self.query_cache,
+                single_flight=self.query_single_flight,
+            )
+
+        return emb_func
+
+    def _get_index_from_documents(
+        self,
+        documents: List[Document],
+        embedding: Embeddings,
+        collection_name: str,
+    ) -> VectorIndex:
+        if self.backend == VectorIndexBackend.NUMPY:
+            return NumpyVectorIndex(documents=documents, embedding=embedding)
+
+        return ChromaVectorIndex(
+            collection_name=collection_name,
             documents=documents,
-            embedding=emb_func,
-            collection_metadata={"hnsw:space": "cosine"},
+            embedding=embedding,
+            persist_directory=self.persist_directory,
         )
 
+    def _get_partitions_from_documents(
+        self, documents: List[Document], embedding: Embeddings
+    ) -> Dict[Tuple, VectorIndex]:
+        """
+        Build one index per distinct combination of the partition keys'
+        metadata values.
+        """
+        partitioned_documents = {}
+        for doc in documents:
+            partitioned_documents.setdefault(
+                self._partition_key(doc.metadata), []
+            ).append(doc)
+
+        return {
+            partition_key: self._get_index_from_documents(
+                documents=partition_documents,
+                embedding=embedding,
+                collection_name=(
+                    f"{self.collection_name}-"
+                    f"{hash_text(json.dumps(partition_key))[:12]}"
+                ),
+            )
+            for partition_key, partition_documents in (
+                partitioned_documents.items()
+            )
+        }
+
+    def _partition_key(self, metadata: Dict[str, Any]) -> Tuple:
+        return tuple(metadata.get(key) for key in self.partition_keys)
+
+    def _resolve_indexes(
+        self, partition: Optional[Dict[str, Any]]
+    ) -> List[VectorIndex]:
+        """
+        Indexes to search for a query: the matching partition if there is
+        one, otherwise every partition (scatter-gather).
+        """
+        if not self.partition_keys:
+            return [self._index]
+
+        if partition is not None:
+            index = self._partitions.get(self._partition_key(partition))
+            if index is not None:
+                return [index]
+
+        return list(self._partitions.values())
+
+    def _search_by_vectors(
+        self,
+        embeddings: List[List[float]],
+        partitions: List[Optional[Dict[str, Any]]],
+        top_k: int,
+        score_threshold: float,
+        retrieval_filter: Optional[Dict],
+    ) -> List[List[Tuple[Document, float]]]:
+        # Group queries by target index so each index is searched once
+        groups = {}
+        for position, partition in enumerate(partitions):
+            for index in self._resolve_indexes(partition):
+                groups.setdefault(id(index), (index, []))[1].append(position)
+
+        retrieved_docs = [[] for _ in embeddings]
+        for index, positions in groups.values():
+            index_results = index.similarity_search_by_vectors(
+                embeddings=[embeddings[position] for position in positions],
+                k=top_k,
+                score_threshold=score_threshold,
+                retrieval_filter=retrieval_filter,
+            )
+            for position, docs in zip(positions, index_results):
+                retrieved_docs[position].extend(docs)
+
+        return [
+            heapq.nlargest(top_k, docs, key=lambda item: item[1])
+            for docs in retrieved_docs
+        ]
+
     def _validate_schema(self, schema: str):
         """
         Validate that the schema follows the expected format with content
@@ -83,18 +395,139 @@ class VectorDatabase:
         top_k: int,
         score_threshold: float,
         retrieval_filter: Optional[Dict] = None,
+        partition: Optional[Dict[str, Any]] = None,
     ) -> List[SimilaritySearchResult]:
         logging.info(f"Getting documents for user query: {user_query}.")
 
-        retrieved_docs = self._store.similarity_search_with_relevance_scores(
-            query=user_query,
-            k=top_k,
-            score_threshold=score_threshold,
-            filter=retrieval_filter,
-        )
+        # Embedding happens inside the index search on this path
+        with time_stage(Stage.VECTOR_SEARCH):
+            retrieved_docs = heapq.nlargest(
+                top_k,
+                chain.from_iterable(
+                    index.similarity_search(
+                        query=user_query,
+                        k=top_k,
+                        score_threshold=score_threshold,
+                        retrieval_filter=retrieval_filter,
+                    )
+                    for index in self._resolve_indexes(partition)
+                ),
+                key=lambda item: item[1],
+            )
 
         logging.info(f"Retrieved {len(retrieved_docs)} documents.")
 
+        return self._to_similarity_results(retrieved_docs)
+
+    async def aget_documents_with_similarity_score(
+        self,
+        user_query: str,
+        top_k: int,
+        score_threshold: float,
+        retrieval_filter: Optional[Dict] = None,
+        partition: Optional[Dict[str, Any]] = None,
+    ) -> List[SimilaritySearchResult]:
+        """
+        Async variant of `get_documents_with_similarity_score`. The query is
+        embedded with the async client and the index search is offloaded to
+        a worker thread, so the event loop is never blocked.
+        """
+        logging.info(f"Getting documents for user query: {user_query}.")
+
+        query_embedding = await self._aembed_query(user_query)
+
+        with time_stage(Stage.VECTOR_SEARCH):
+            retrieved_docs = (
+                await asyncio.to_thread(
+                    self._search_by_vectors,
+                    embeddings=[query_embedding],
+                    partitions=[partition],
+                    top_k=top_k,
+                    score_threshold=score_threshold,
+                    retrieval_filter=retrieval_filter,
+                )
+            )[0]
+
+        logging.info(f"Retrieved {len(retrieved_docs)} documents.")
+
+        return self._to_similarity_results(retrieved_docs)
+
+    async def aget_documents_with_similarity_score_batch(
+        self,
+        user_queries: List[str],
+        top_k: int,
+        score_threshold: float,
+        retrieval_filter: Optional[Dict] = None,
+        partitions: Optional[List[Optional[Dict[str, Any]]]] = None,
+        return_exceptions: bool = False,
+    ) -> List[Union[List[SimilaritySearchResult], Exception]]:
+        """
+        Retrieve similar documents for many queries at once. Cached query
+        vectors are reused, the others are embedded in batched requests, and
+        each index is searched with a single call. With `return_exceptions`,
+        a query whose embedding failed gets the exception in its place
+        instead of failing the batch.
+        """
+        logging.info(f"Getting documents for {len(user_queries)} queries.")
+
+        query_embeddings = await self._aembed_queries(user_queries)
+        if not return_exceptions:
+            for embedding in query_embeddings:
+                if isinstance(embedding, Exception):
+                    raise embedding
+
+        partitions = partitions or [None] * len(user_queries)
+        embedded = [
+            position
+            for position, embedding in enumerate(query_embeddings)
+            if not isinstance(embedding, Exception)
+        ]
+
+        with time_stage(Stage.VECTOR_SEARCH):
+            retrieved_docs = await asyncio.to_thread(
+                self._search_by_vectors,
+                embeddings=[
+                    query_embeddings[position] for position in embedded
+                ],
+                partitions=[partitions[position] for position in embedded],
+                top_k=top_k,
+                score_threshold=score_threshold,
+                retrieval_filter=retrieval_filter,
+            )
+
+        results = list(query_embeddings)
+        for position, docs in zip(embedded, retrieved_docs):
+            results[position] = self._to_similarity_results(docs)
+
+        return results
+
+    async def _aembed_queries(
+        self, user_queries: List[str]
+    ) -> List[Union[List[float], Exception]]:
+        with time_stage(Stage.QUERY_EMBEDDING):
+            if isinstance(self._embedding, QueryCachedEmbeddings):
+                query_embeddings = await self._embedding.aembed_queries(
+                    user_queries
+                )
+            else:
+                query_embeddings = await aembed_queries(
+                    self._embedding, user_queries
+                )
+
+        for embedding in query_embeddings:
+            if isinstance(embedding, Exception):
+                STAGE_ERRORS.labels(stage=Stage.QUERY_EMBEDDING).inc()
+
+        return query_embeddings
+
+    async def _aembed_query(self, user_query: str) -> List[float]:
+        with time_stage(Stage.QUERY_EMBEDDING):
+            return await self._embedding.aembed_query(user_query)
+
+    @staticmethod
+    def _to_similarity_results(
+        retrieved_docs: List[Tuple[Document, float]],
+    ) -> List[SimilaritySearchResult]:
         similar_docs = []
         for doc, score in retrieved_docs:
             doc_content = json.loads(doc.page_content)
@@ -122,4 +555,22 @@ class VectorDatabase:
             text_content=False,
         )
 
-        return loader.load()
+        documents = loader.load()
+
+        # Expose the schema metadata and a content hash on each document so
+        # persisted collections can be diffed against the knowledge base.
+        # Content fields used for filtering or partitioning are copied into
+        # the metadata, leaving the embedded text as is.
+        for doc in documents:
+            doc_content = json.loads(doc.page_content)
+            doc.metadata.update(doc_content["metadata"])
+            doc.metadata.update(
+                {
+                    key: doc_content["content"][key]
+                    for key in self.content_metadata_keys
+                    if key in doc_content["content"]
+                }
+            )
+            doc.metadata["content_hash"] = hash_text(doc.page_content)
+
+        return documents
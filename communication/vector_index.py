@@ -0,0 +1,38 @@
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from communication.utils import StrEnum
+
+
+class VectorIndexBackend(StrEnum):
+    CHROMA = "chroma"
+    NUMPY = "numpy"
+
+
+class VectorIndex(ABC):
+    """
+    Similarity index over the knowledge base documents. Scores are cosine
+    relevance scores, higher is more similar.
+    """
+
+    @abstractmethod
+    def similarity_search(
+        self,
+        query: str,
+        k: int,
+        score_threshold: float,
+        retrieval_filter: Optional[Dict] = None,
+    ) -> List[Tuple[Document, float]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def similarity_search_by_vectors(
+        self,
+        embeddings: List[List[float]],
+        k: int,
+        score_threshold: float,
+        retrieval_filter: Optional[Dict] = None,
+    ) -> List[List[Tuple[Document, float]]]:
+        raise NotImplementedError
@@ -30,7 +30,7 @@ setup(
     author_email="catarina.m.dias8@gmail.com",
     python_requires=">=3.10",
     long_description=long_description,
-    packages=find_packages(exclude=("tests", "resources")),
+    packages=find_packages(exclude=("tests", "resources", "benchmarks")),
     install_requires=locked_requirements,
     extras_require={
         "dev": develop_requirements,
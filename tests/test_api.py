@@ -0,0 +1,217 @@
+import asyncio
+import json
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+
+import httpx
+
+from api.main import create_application
+from api.services import service_registry
+from communication.config import DATA_DIR
+from communication.schema import CommunicationUseCase
+from communication.utils import load_json_file
+
+TEST_PATIENT = load_json_file(DATA_DIR / "test_patients.json")[0]
+
+
+def build_outcome(request_uuid, high, low, was_successful):
+    return {
+        "communication_use_case": CommunicationUseCase.MEDICATION_ADHERENCE,
+        "request_uuid": request_uuid,
+        "high_success_examples_id": high,
+        "low_success_examples_id": low,
+        "was_successful": was_successful,
+    }
+
+
+def build_request(request_uuid):
+    return {"request_uuid": request_uuid, "patient_profile": TEST_PATIENT}
+
+
+class TestApi(unittest.TestCase):
+    def setUp(self):
+        self.application = create_application()
+        self.service = MagicMock()
+
+    def tearDown(self):
+        service_registry.medication_adherence_comm_service = None
+
+    def _request(self, method, url, **kwargs):
+        async def run():
+            transport = httpx.ASGITransport(app=self.application)
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://test"
+            ) as client:
+                return await client.request(method, url, **kwargs)
+
+        return asyncio.run(run())
+
+    def test_health_before_warmup(self):
+        """Test that the app is alive but not ready before warmup"""
+        self.assertEqual(self._request("GET", "/health/live").status_code, 200)
+
+        response = self._request("GET", "/health/ready")
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()["status"], "warming_up")
+
+    def test_routes_unavailable_before_warmup(self):
+        """Test that service routes answer 503 until warmup finished"""
+        response = self._request(
+            "POST",
+            "/success",
+            json=build_outcome("uuid", [1], [2], True),
+        )
+
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("Retry-After", response.headers)
+
+    def test_health_after_warmup(self):
+        """Test that readiness succeeds once the service is registered"""
+        service_registry.medication_adherence_comm_service = self.service
+
+        response = self._request("GET", "/health/ready")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], "ready")
+
+    def test_medication_adherence_batch(self):
+        """Test that failed items are reported without failing the batch"""
+        self.service.get_communications = AsyncMock(
+            return_value=[
+                {
+                    "request_uuid": "a",
+                    "response": {
+                        "request_uuid": "a",
+                        "message": "Hi!",
+                        "high_success_examples_id": [1],
+                        "low_success_examples_id": [],
+                        "metadata": {},
+                    },
+                },
+                {"request_uuid": "b", "error": "embedding failed"},
+            ]
+        )
+        service_registry.medication_adherence_comm_service = self.service
+
+        response = self._request(
+            "POST",
+            "/medication-adherence/batch",
+            json={
+                "requests": [
+                    build_request("a"),
+                    build_request("b"),
+                ],
+                "max_concurrency": 2,
+            },
+        )
+
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual((body["succeeded"], body["failed"]), (1, 1))
+        self.assertEqual(body["items"][1]["error"], "embedding failed")
+        self.assertEqual(
+            self.service.get_communications.await_args.kwargs[
+                "max_concurrency"
+            ],
+            2,
+        )
+
+    def test_medication_adherence_stream(self):
+        """Test that items are streamed followed by a summary record"""
+
+        async def iter_communications(requests, **_):
+            for request in requests:
+                yield {
+                    "request_uuid": request["request_uuid"],
+                    "error": "boom",
+                }
+
+        self.service.iter_communications = iter_communications
+        service_registry.medication_adherence_comm_service = self.service
+        body = {"requests": [build_request("a"), build_request("b")]}
+
+        response = self._request(
+            "POST", "/medication-adherence/stream", json=body
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(
+            response.headers["content-type"].startswith("application/x-ndjson")
+        )
+        records = [json.loads(line) for line in response.text.splitlines()]
+        self.assertEqual(
+            [record["type"] for record in records],
+            ["result", "result", "summary"],
+        )
+        self.assertEqual(records[-1]["data"]["failed"], 2)
+
+        response = self._request(
+            "POST",
+            "/medication-adherence/stream",
+            params={"stream_format": "sse"},
+            json=body,
+        )
+
+        self.assertTrue(
+            response.headers["content-type"].startswith("text/event-stream")
+        )
+        self.assertEqual(response.text.count("event: result\n"), 2)
+        self.assertEqual(response.text.count("event: summary\n"), 1)
+
+    def test_success_batch(self):
+        """Test per-item status of the batch feedback route"""
+        self.service.act_on_communication_results = AsyncMock(
+            return_value=[
+                {
+                    "request_uuid": "a",
+                    "updated_examples_id": [1, 2],
+                    "unknown_examples_id": [],
+                },
+                {
+                    "request_uuid": "b",
+                    "updated_examples_id": [],
+                    "unknown_examples_id": [99],
+                },
+            ]
+        )
+        service_registry.medication_adherence_comm_service = self.service
+
+        response = self._request(
+            "POST",
+            "/success/batch",
+            json={
+                "outcomes": [
+                    build_outcome("a", [1], [2], True),
+                    build_outcome("b", [99], [], False),
+                ]
+            },
+        )
+
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual((body["updated"], body["skipped"]), (1, 1))
+        self.assertEqual(
+            [item["status"] for item in body["items"]], ["updated", "skipped"]
+        )
+        self.service.act_on_communication_results.assert_awaited_once()
+
+    def test_metrics(self):
+        """Test that metrics include stage latencies and service stats"""
+        self.service.stats = MagicMock(
+            return_value={"update_queue": {"depth": 2, "flushes": 5}}
+        )
+        service_registry.medication_adherence_comm_service = self.service
+
+        response = self._request("GET", "/metrics")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/"))
+        self.assertIn(
+            "# TYPE communication_stage_duration_seconds histogram",
+            response.text,
+        )
+        self.assertIn(
+            "communication_medication_adherence_update_queue_depth 2.0",
+            response.text,
+        )
@@ -0,0 +1,49 @@
+import unittest
+from unittest.mock import patch
+
+from communication.cache import TTLCache
+
+
+class TestTTLCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = TTLCache(max_size=2, ttl_seconds=10)
+
+    def test_get_and_set(self):
+        """Test that stored values are returned and counted as hits"""
+        self.cache.set("a", 1)
+
+        self.assertEqual(self.cache.get("a"), 1)
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(self.cache.stats()["hits"], 1)
+        self.assertEqual(self.cache.stats()["misses"], 1)
+        self.assertEqual(self.cache.stats()["hit_rate"], 0.5)
+
+    def test_evicts_least_recently_used(self):
+        """Test that the least recently used entry is evicted first"""
+        self.cache.set("a", 1)
+        self.cache.set("b", 2)
+        self.cache.get("a")
+        self.cache.set("c", 3)
+
+        self.assertEqual(len(self.cache), 2)
+        self.assertEqual(self.cache.get("a"), 1)
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(self.cache.get("c"), 3)
+
+    @patch("communication.cache.time.monotonic")
+    def test_entries_expire(self, mock_monotonic):
+        """Test that entries older than the TTL are treated as misses"""
+        mock_monotonic.return_value = 100.0
+        self.cache.set("a", 1)
+
+        mock_monotonic.return_value = 109.0
+        self.assertEqual(self.cache.get("a"), 1)
+
+        mock_monotonic.return_value = 110.0
+        self.assertIsNone(self.cache.get("a"))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_invalid_max_size(self):
+        """Test that a non-positive size is rejected"""
+        with self.assertRaises(ValueError):
+            TTLCache(max_size=0, ttl_seconds=10)
@@ -0,0 +1,160 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+from openai import BadRequestError, RateLimitError
+from openai.types import CompletionUsage
+
+from communication.chat_model import (
+    ChatModel,
+    estimate_tokens,
+    generate_message,
+)
+from communication.rate_limiter import RateLimiter
+from communication.token_counter import get_token_counter
+
+
+def build_error(error_class, status_code, headers=None):
+    response = httpx.Response(
+        status_code,
+        headers=headers or {},
+        request=httpx.Request("POST", "http://test"),
+    )
+    return error_class("error", response=response, body=None)
+
+
+def build_completion(content, prompt_tokens=8, cached_tokens=0):
+    completion = MagicMock()
+    completion.choices[0].message.content = content
+    completion.usage = CompletionUsage(
+        prompt_tokens=prompt_tokens,
+        completion_tokens=2,
+        total_tokens=prompt_tokens + 2,
+        prompt_tokens_details={"cached_tokens": cached_tokens},
+    )
+    return completion
+
+
+class TestChatModel(unittest.TestCase):
+    def setUp(self):
+        self.chat_model = ChatModel(openai_key="test", max_retries=2)
+        self.create = AsyncMock()
+        self.chat_model.openai_client = MagicMock()
+        self.chat_model.openai_client.chat.completions.create = self.create
+
+    def _generate(self):
+        return asyncio.run(
+            generate_message(
+                chat_model=self.chat_model,
+                system_message="system",
+                user_message="user",
+                model="test-model",
+            )
+        )
+
+    def test_retries_rate_limit_errors(self):
+        """Test that 429s are retried after the Retry-After delay"""
+        self.create.side_effect = [
+            build_error(RateLimitError, 429, {"retry-after-ms": "10"}),
+            build_completion("message"),
+        ]
+
+        with patch(
+            "communication.chat_model.asyncio.sleep", new=AsyncMock()
+        ) as sleep:
+            self.assertEqual(self._generate(), "message")
+
+        sleep.assert_any_await(0.01)
+        self.assertEqual(self.create.await_count, 2)
+        self.assertEqual(self.chat_model.retries, 1)
+
+    def test_gives_up_after_max_retries(self):
+        """Test that the last retryable error is raised"""
+        self.create.side_effect = build_error(RateLimitError, 429)
+
+        with patch("communication.chat_model.asyncio.sleep", new=AsyncMock()):
+            with self.assertRaises(RateLimitError):
+                self._generate()
+
+        self.assertEqual(self.create.await_count, 3)
+
+    def test_does_not_retry_client_errors(self):
+        """Test that non-retryable errors are raised immediately"""
+        self.create.side_effect = build_error(BadRequestError, 400)
+
+        with self.assertRaises(BadRequestError):
+            self._generate()
+
+        self.assertEqual(self.create.await_count, 1)
+
+    def test_estimate_tokens(self):
+        """Test the prompt and completion token estimate"""
+        messages = [{"role": "user", "content": "a" * 400}]
+        prompt_tokens = get_token_counter().count("a" * 400)
+
+        self.assertEqual(
+            estimate_tokens(messages, max_tokens=50), prompt_tokens + 4 + 50
+        )
+
+    def test_identical_concurrent_requests_are_coalesced(self):
+        """Test that identical in-flight requests share one API call"""
+
+        async def create(**kwargs):
+            await asyncio.sleep(0.01)
+            return build_completion("message")
+
+        self.create.side_effect = create
+
+        async def run():
+            return await asyncio.gather(
+                *(
+                    generate_message(
+                        chat_model=self.chat_model,
+                        system_message="system",
+                        user_message=user_message,
+                        model="test-model",
+                    )
+                    for user_message in ["user", "user", "other"]
+                )
+            )
+
+        self.assertEqual(asyncio.run(run()), ["message"] * 3)
+        self.assertEqual(self.create.await_count, 2)
+        self.assertEqual(self.chat_model.single_flight.coalesced, 1)
+
+    def test_records_token_usage(self):
+        """Test that prompt, cached and completion tokens are summed"""
+        self.create.side_effect = [
+            build_completion("first", prompt_tokens=1500, cached_tokens=0),
+            build_completion("second", prompt_tokens=1500, cached_tokens=1024),
+        ]
+
+        self._generate()
+        self._generate()
+
+        self.assertEqual(
+            self.chat_model.token_usage,
+            {
+                "completions": 2,
+                "prompt_tokens": 3000,
+                "cached_tokens": 1024,
+                "completion_tokens": 4,
+            },
+        )
+
+    def test_uses_given_rate_limiter(self):
+        """Test that a limiter passed in replaces the model's shared one"""
+        rate_limiter = RateLimiter(
+            requests_per_minute=6000, tokens_per_minute=600_000
+        )
+        self.chat_model.rate_limiter = rate_limiter
+        self.create.return_value = build_completion("message")
+
+        with patch(
+            "communication.chat_model.get_rate_limiter"
+        ) as get_rate_limiter:
+            self._generate()
+
+        get_rate_limiter.assert_not_called()
+        self.assertLess(rate_limiter.requests.available, 6000)
@@ -0,0 +1,178 @@
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+from typing import List
+from unittest.mock import patch
+
+from langchain_core.embeddings import Embeddings
+
+from communication.cache import TTLCache
+from communication.embedding_cache import (
+    CachedEmbeddings,
+    QueryCachedEmbeddings,
+)
+from communication.single_flight import SingleFlight
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.embedded_texts = []
+        self.document_calls = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.document_calls += 1
+        if "bad" in texts:
+            raise RuntimeError("embedding failed")
+        self.embedded_texts.extend(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        if text == "bad":
+            raise RuntimeError("embedding failed")
+        self.embedded_texts.append(text)
+        return [float(len(text)), 1.0]
+
+
+class TestCachedEmbeddings(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache_path = Path(self.temp_dir.name, "embeddings.sqlite3")
+        self.underlying = CountingEmbeddings()
+        self.embeddings = CachedEmbeddings(
+            embeddings=self.underlying,
+            namespace="test-model",
+            cache_path=self.cache_path,
+        )
+
+    def tearDown(self):
+        self.embeddings.close()
+        self.temp_dir.cleanup()
+
+    def test_embeds_only_unseen_documents(self):
+        """Test that cached documents are not embedded again"""
+        self.embeddings.embed_documents(["doc a", "doc bb"])
+        result = self.embeddings.embed_documents(["doc bb", "doc ccc"])
+
+        self.assertEqual(
+            self.underlying.embedded_texts, ["doc a", "doc bb", "doc ccc"]
+        )
+        self.assertEqual(result, [[6.0, 1.0], [7.0, 1.0]])
+
+    def test_cache_persists_across_instances(self):
+        """Test that vectors are reused after a restart"""
+        self.embeddings.embed_documents(["doc a"])
+        self.embeddings.close()
+
+        underlying = CountingEmbeddings()
+        self.embeddings = CachedEmbeddings(
+            embeddings=underlying,
+            namespace="test-model",
+            cache_path=self.cache_path,
+        )
+
+        result = self.embeddings.embed_documents(["doc a"])
+
+        self.assertEqual(underlying.embedded_texts, [])
+        self.assertEqual(result, [[5.0, 1.0]])
+
+    def test_namespaces_are_isolated(self):
+        """Test that a different embedding model does not reuse vectors"""
+        self.embeddings.embed_documents(["doc a"])
+
+        underlying = CountingEmbeddings()
+        other_model_embeddings = CachedEmbeddings(
+            embeddings=underlying,
+            namespace="other-model",
+            cache_path=self.cache_path,
+        )
+        other_model_embeddings.embed_documents(["doc a"])
+        other_model_embeddings.close()
+
+        self.assertEqual(underlying.embedded_texts, ["doc a"])
+
+    def test_aembed_documents(self):
+        """Test that the async path shares the same cache"""
+        self.embeddings.embed_documents(["doc a"])
+
+        result = asyncio.run(
+            self.embeddings.aembed_documents(["doc a", "doc bb"])
+        )
+
+        self.assertEqual(self.underlying.embedded_texts, ["doc a", "doc bb"])
+        self.assertEqual(result, [[5.0, 1.0], [6.0, 1.0]])
+
+
+class TestQueryCachedEmbeddings(unittest.TestCase):
+    def setUp(self):
+        self.underlying = CountingEmbeddings()
+        self.query_cache = TTLCache(max_size=10, ttl_seconds=60)
+        self.embeddings = QueryCachedEmbeddings(
+            embeddings=self.underlying, query_cache=self.query_cache
+        )
+
+    def test_repeated_query_is_cached(self):
+        """Test that a repeated query is embedded only once"""
+        first = self.embeddings.embed_query("query")
+        second = asyncio.run(self.embeddings.aembed_query("query"))
+
+        self.assertEqual(first, second)
+        self.assertEqual(self.underlying.embedded_texts, ["query"])
+        self.assertEqual(self.query_cache.stats()["hits"], 1)
+        self.assertEqual(self.query_cache.stats()["misses"], 1)
+
+    def test_documents_are_not_cached(self):
+        """Test that document embedding bypasses the query cache"""
+        self.embeddings.embed_documents(["doc"])
+        self.embeddings.embed_documents(["doc"])
+
+        self.assertEqual(self.underlying.embedded_texts, ["doc", "doc"])
+        self.assertEqual(len(self.query_cache), 0)
+
+    def test_concurrent_queries_are_coalesced(self):
+        """Test that concurrent misses for a query share one call"""
+        single_flight = SingleFlight()
+        embeddings = QueryCachedEmbeddings(
+            embeddings=self.underlying,
+            query_cache=self.query_cache,
+            single_flight=single_flight,
+        )
+
+        async def run():
+            return await asyncio.gather(
+                embeddings.aembed_query("query"),
+                embeddings.aembed_query("query"),
+            )
+
+        first, second = asyncio.run(run())
+
+        self.assertEqual(first, second)
+        self.assertEqual(self.underlying.embedded_texts, ["query"])
+        self.assertEqual(single_flight.coalesced, 1)
+
+    def test_queries_are_embedded_in_one_request(self):
+        """Test that distinct batch misses share a single request"""
+        self.embeddings.embed_query("a")
+
+        vectors = asyncio.run(
+            self.embeddings.aembed_queries(["a", "bb", "ccc", "bb"])
+        )
+
+        self.assertEqual([v[0] for v in vectors], [1.0, 2.0, 3.0, 2.0])
+        self.assertEqual(self.underlying.document_calls, 1)
+        self.assertEqual(self.underlying.embedded_texts, ["a", "bb", "ccc"])
+        self.assertEqual(len(self.query_cache), 3)
+
+    def test_failed_request_is_reported_per_query(self):
+        """Test that only the failing query of a batch gets the error"""
+        with patch(
+            "communication.embedding_cache.QUERY_EMBEDDING_BATCH_SIZE", 2
+        ):
+            vectors = asyncio.run(
+                self.embeddings.aembed_queries(["a", "bad", "ccc"])
+            )
+
+        self.assertEqual(vectors[0], [1.0, 1.0])
+        self.assertIsInstance(vectors[1], RuntimeError)
+        self.assertEqual(vectors[2], [3.0, 1.0])
+        self.assertEqual(len(self.query_cache), 2)
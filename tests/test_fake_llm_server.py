@@ -0,0 +1,111 @@
+import asyncio
+import json
+import unittest
+
+import httpx
+import numpy as np
+from openai import AsyncOpenAI
+
+from api_client.fake_llm_server import EMBEDDING_DIMENSION, app, embed
+from communication.config import DATA_DIR
+from communication.medication_adherence import SIMILARITY_THRESHOLD
+from communication.utils import canonical_json, load_json_file
+
+
+class TestFakeLLMServer(unittest.TestCase):
+    def _run(self, call):
+        async def run():
+            async with httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=app)
+            ) as http_client:
+                client = AsyncOpenAI(
+                    api_key="test",
+                    base_url="http://test/v1",
+                    http_client=http_client,
+                )
+                return await call(client)
+
+        return asyncio.run(run())
+
+    def test_chat_completion(self):
+        """Test that completions are JSON messages derived from the prompt"""
+
+        def complete(content):
+            return lambda client: client.chat.completions.create(
+                model="gpt-4o",
+                messages=[{"role": "user", "content": content}],
+            )
+
+        first = self._run(complete("a"))
+        again = self._run(complete("a"))
+        other = self._run(complete("b"))
+
+        message = json.loads(first.choices[0].message.content)
+        self.assertEqual(set(message), {"message", "explanation"})
+        self.assertEqual(
+            first.choices[0].message.content,
+            again.choices[0].message.content,
+        )
+        self.assertNotEqual(
+            first.choices[0].message.content,
+            other.choices[0].message.content,
+        )
+        self.assertGreater(first.usage.total_tokens, 0)
+
+    def test_embeddings(self):
+        """Test deterministic unit embeddings, base64 encoded by default"""
+        response = self._run(
+            lambda client: client.embeddings.create(
+                model="text-embedding-3-small", input=["a", "b", "a"]
+            )
+        )
+
+        vectors = [item.embedding for item in response.data]
+        self.assertEqual(len(vectors), 3)
+        self.assertEqual(len(vectors[0]), 1536)
+        self.assertAlmostEqual(sum(v * v for v in vectors[0]), 1.0, places=4)
+        self.assertEqual(vectors[0], vectors[2])
+        self.assertNotEqual(vectors[0], vectors[1])
+
+    def test_embeddings_of_token_ids(self):
+        """Test that token id inputs, as sent by LangChain, are embedded"""
+        response = self._run(
+            lambda client: client.embeddings.create(
+                model="text-embedding-3-small",
+                input=[[1, 2, 3], [4, 5]],
+                encoding_format="float",
+            )
+        )
+
+        self.assertEqual(len(response.data), 2)
+
+    def test_embeddings_keep_similar_profiles_similar(self):
+        """Test that test patients find knowledge base profiles to use"""
+        patients = load_json_file(DATA_DIR / "patients.json")
+        documents = np.stack(
+            [
+                embed(
+                    json.dumps(
+                        {
+                            "content": patient["profile"],
+                            "metadata": {"id": patient["id"]},
+                        }
+                    ),
+                    EMBEDDING_DIMENSION,
+                )
+                for patient in patients
+            ]
+        )
+
+        matched = 0
+        for test_patient in load_json_file(DATA_DIR / "test_patients.json"):
+            query = canonical_json(
+                {k: v for k, v in test_patient.items() if k != "name"}
+            )
+            scores = documents @ embed(query, EMBEDDING_DIMENSION)
+            matched += scores.max() >= SIMILARITY_THRESHOLD
+
+        self.assertGreater(matched, 0)
+        # Unrelated inputs stay close to orthogonal
+        unrelated = embed("Take your medication", EMBEDDING_DIMENSION)
+        self.assertLess(float((documents @ unrelated).max()), 0.2)
@@ -0,0 +1,106 @@
+import asyncio
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from communication.feedback_log import FeedbackLog
+from communication.utils import load_json_file
+
+
+class TestFeedbackLog(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.snapshot_path = Path(self.temp_dir.name, "dataset.json")
+        with open(self.snapshot_path, "w") as f:
+            json.dump(
+                [
+                    {"id": 0, "success_likelihood": 0.5},
+                    {"id": 1, "success_likelihood": 0.5},
+                ],
+                f,
+            )
+
+        self.feedback = [
+            {
+                "request_uuid": "uuid",
+                "was_successful": True,
+                "high_success_examples_id": [0],
+                "low_success_examples_id": [],
+            }
+        ]
+        self.feedback_log = FeedbackLog(
+            snapshot_path=self.snapshot_path, max_log_entries=2
+        )
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _likelihoods(self, rows):
+        return [row["success_likelihood"] for row in rows]
+
+    def test_append_does_not_rewrite_snapshot(self):
+        """Test that feedback is appended to the log only"""
+        self.feedback_log.append(self.feedback, {0: 0.55})
+
+        self.assertEqual(
+            self._likelihoods(load_json_file(self.snapshot_path)), [0.5, 0.5]
+        )
+        self.assertEqual(
+            len(self.feedback_log.log_path.read_text().splitlines()), 1
+        )
+
+    def test_load_replays_log(self):
+        """Test that pending log records are applied on load"""
+        self.feedback_log.append(self.feedback, {0: 0.55})
+        self.feedback_log.append(self.feedback, {0: 0.6, 1: 0.45})
+
+        rows = FeedbackLog(self.snapshot_path, max_log_entries=2).load()
+
+        self.assertEqual(self._likelihoods(rows), [0.6, 0.45])
+
+    def test_compaction(self):
+        """Test that compaction writes the snapshot and empties the log"""
+        rows = self.feedback_log.load()
+        rows[0]["success_likelihood"] = 0.55
+        self.feedback_log.append(self.feedback, {0: 0.55})
+        rows[0]["success_likelihood"] = 0.6
+        self.feedback_log.append(self.feedback, {0: 0.6})
+        self.assertTrue(self.feedback_log.needs_compaction())
+
+        asyncio.run(self.feedback_log.compact(rows))
+
+        self.assertFalse(self.feedback_log.needs_compaction())
+        self.assertFalse(self.feedback_log.log_path.exists())
+        self.assertFalse(self.feedback_log.compacting_log_path.exists())
+        self.assertEqual(
+            self._likelihoods(load_json_file(self.snapshot_path)), [0.6, 0.5]
+        )
+
+    def test_replay_after_interrupted_compaction(self):
+        """Test that replaying a rotated log over a new snapshot is safe"""
+        rows = self.feedback_log.load()
+        rows[0]["success_likelihood"] = 0.55
+        self.feedback_log.append(self.feedback, {0: 0.55})
+
+        # Snapshot written but the rotated log was never removed
+        self.feedback_log._rotate_log()
+        with open(self.snapshot_path, "w") as f:
+            json.dump(rows, f)
+        self.feedback_log.append(self.feedback, {1: 0.45})
+
+        rows = FeedbackLog(self.snapshot_path, max_log_entries=2).load()
+
+        self.assertEqual(self._likelihoods(rows), [0.55, 0.45])
+
+    def test_torn_record_is_truncated(self):
+        """Test that a partially written last record is discarded"""
+        self.feedback_log.append(self.feedback, {0: 0.55})
+        with open(self.feedback_log.log_path, "a") as f:
+            f.write('{"success_likelihoods": {"0": 0.')
+
+        rows = FeedbackLog(self.snapshot_path, max_log_entries=2).load()
+        self.feedback_log.append(self.feedback, {1: 0.45})
+        rows = FeedbackLog(self.snapshot_path, max_log_entries=2).load()
+
+        self.assertEqual(self._likelihoods(rows), [0.55, 0.45])
@@ -0,0 +1,23 @@
+import asyncio
+import unittest
+
+from communication.chat_model import ChatModel
+from communication.http_client import HttpClients
+
+
+class TestHttpClients(unittest.TestCase):
+    def test_clients_are_shared_and_closed(self):
+        """Test that injected clients are used and closed together"""
+        http_clients = HttpClients(max_connections=4, http2=False)
+        chat_model = ChatModel(
+            openai_key="test", http_client=http_clients.async_client
+        )
+
+        self.assertIs(
+            chat_model.openai_client._client, http_clients.async_client
+        )
+
+        asyncio.run(http_clients.aclose())
+
+        self.assertTrue(http_clients.async_client.is_closed)
+        self.assertTrue(http_clients.sync_client.is_closed)
@@ -0,0 +1,119 @@
+import asyncio
+import json
+import unittest
+
+import httpx
+
+from api_client.load_test import LoadTestPath, LoadTestStats, run_load_test
+
+
+class TestLoadTest(unittest.TestCase):
+    def setUp(self):
+        self.requests = []
+
+    def _handler(self, request):
+        self.requests.append(request.url.path)
+        if request.url.path == LoadTestPath.SUCCESS:
+            return httpx.Response(200, json={"message": "ok"})
+
+        body = json.loads(request.content)
+        return httpx.Response(
+            200,
+            json={
+                "request_uuid": body["request_uuid"],
+                "message": "Hi",
+                "high_success_examples_id": [1],
+                "low_success_examples_id": [2],
+            },
+        )
+
+    def _run(self, handler, **kwargs):
+        async def run():
+            async with httpx.AsyncClient(
+                transport=httpx.MockTransport(handler),
+                base_url="http://test",
+            ) as client:
+                return await run_load_test(client=client, **kwargs)
+
+        return asyncio.run(run())
+
+    def test_closed_loop(self):
+        """Test that each scenario generates a message and reports it"""
+        report = self._run(
+            self._handler,
+            duration_seconds=10,
+            concurrency=4,
+            max_scenarios=20,
+        )
+
+        self.assertEqual(report["scenarios"], 20)
+        for path in (LoadTestPath.GENERATE, LoadTestPath.SUCCESS):
+            summary = report["endpoints"][path]
+            self.assertEqual(summary["succeeded"], 20)
+            self.assertEqual(summary["error_rate"], 0)
+            self.assertLessEqual(summary["p50_ms"], summary["p99_ms"])
+
+    def test_open_loop_rate(self):
+        """Test that scenarios start at the target rate"""
+        report = self._run(
+            self._handler,
+            duration_seconds=0.5,
+            rps=20,
+            feedback_ratio=0.0,
+        )
+
+        self.assertGreaterEqual(report["scenarios"], 9)
+        self.assertLessEqual(report["scenarios"], 11)
+        self.assertNotIn(LoadTestPath.SUCCESS, report["endpoints"])
+        self.assertEqual(report["delayed_scenarios"], 0)
+        self.assertEqual(report["dropped_scenarios"], 0)
+
+    def test_open_loop_includes_waiting_for_a_slot(self):
+        """Test that latency counts from the schedule when slots are busy"""
+
+        async def slow_handler(request):
+            await asyncio.sleep(0.1)
+            return self._handler(request)
+
+        report = self._run(
+            slow_handler,
+            duration_seconds=0.5,
+            concurrency=1,
+            rps=20,
+            feedback_ratio=0.0,
+        )
+
+        summary = report["endpoints"][LoadTestPath.GENERATE]
+        self.assertEqual(report["scenarios"], 10)
+        self.assertEqual(report["delayed_scenarios"], 9)
+        self.assertGreater(report["dropped_scenarios"], 0)
+        self.assertEqual(summary["requests"] + report["dropped_scenarios"], 10)
+        # The last scenario sent waited for every earlier one
+        self.assertGreater(summary["p99_ms"], 200)
+
+    def test_errors_are_counted(self):
+        """Test that failed requests are reported by status"""
+        report = self._run(
+            lambda request: httpx.Response(503),
+            duration_seconds=10,
+            max_scenarios=5,
+        )
+
+        summary = report["endpoints"][LoadTestPath.GENERATE]
+        self.assertEqual(summary["error_rate"], 1.0)
+        self.assertEqual(summary["errors"], {"HTTP 503": 5})
+        self.assertIsNone(summary["p50_ms"])
+
+    def test_stats_percentiles(self):
+        """Test latency percentiles and throughput"""
+        stats = LoadTestStats()
+        for latency in range(1, 101):
+            stats.record("/a", latency / 1000)
+        stats.record("/a", 0.5, error="ReadTimeout")
+
+        summary = stats.summary(elapsed_seconds=10)["/a"]
+
+        self.assertEqual(summary["requests"], 101)
+        self.assertAlmostEqual(summary["p50_ms"], 50.5)
+        self.assertAlmostEqual(summary["p99_ms"], 99.01)
+        self.assertAlmostEqual(summary["throughput_rps"], 10)
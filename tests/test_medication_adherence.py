@@ -0,0 +1,516 @@
+import asyncio
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock, PropertyMock, patch
+
+from communication import medication_adherence
+from communication.config import DATA_DIR
+from communication.medication_adherence import (
+    NAME_PLACEHOLDER,
+    MedicationAdherenceCommunication,
+)
+from communication.message_store import JsonMessageStore, MessageStoreBackend
+from communication.prompt import PromptTemplate
+from communication.schema import GenerationMode, PatientProfile
+from communication.sqlite_message_store import SQLiteMessageStore
+from communication.utils import load_json_file
+from communication.vector_database import SimilaritySearchResult
+
+TEST_PROFILE = {
+    "name": "John Smith",
+    "age": 33,
+    "gender": "Male",
+    "socioeconomic_status": "Medium",
+    "primary_medical_condition": "Allergies",
+    "severity_of_condition": "Mild",
+    "medication_name": "Cetirizine",
+    "medication_type": "Pill",
+    "dosage_instructions": "One pill daily",
+    "frequency_of_administration": "Daily",
+    "health_literacy_level": "High",
+    "daily_routine": "Morning person",
+    "physical_activity_level": "Active",
+    "caregiver_presence": False,
+    "message_tone_preference": "Casual",
+    "motivation_level": "Medium",
+    "beliefs_about_medication": "Trusting",
+    "stress_level": "Low",
+    "time_since_diagnosis": 3,
+    "side_effect_sensitivity": "Mild",
+    "appointment_frequency": "Rarely",
+    "technology_comfort": "High",
+}
+
+TEST_ROWS = [
+    {
+        "id": entry_id,
+        "patient_id": 1,
+        "message_id": entry_id,
+        "message": f"Message {entry_id}",
+        "success_likelihood": likelihood,
+    }
+    for entry_id, likelihood in enumerate([0.9, 0.7, 0.5, 0.3, 0.1])
+]
+
+
+def build_profile(**overrides):
+    return PatientProfile.model_validate({**TEST_PROFILE, **overrides})
+
+
+def get_prompt_name(user_message):
+    profile_line = user_message.split("Patient Profile: ")[1].split("\n")[0]
+    return json.loads(profile_line)["name"]
+
+
+async def echo_name_completion(**kwargs):
+    # Address the patient by whatever name the prompt gave
+    name = get_prompt_name(kwargs["user_message"])
+    return json.dumps(
+        {"message": f"Hi {name}, take it!", "explanation": f"For {name}"}
+    )
+
+
+class MedicationAdherenceTestCase(unittest.TestCase):
+    """Service with mocked retrieval, a JSON message store and completions"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        dataset_path = Path(self.temp_dir.name, "dataset.json")
+        with open(dataset_path, "w") as f:
+            json.dump(TEST_ROWS, f)
+
+        settings = MagicMock(OPENAI_API_KEY="test", OPENAI_BASE_URL=None)
+        with patch.object(
+            medication_adherence, "get_settings", return_value=settings
+        ):
+            self.service = MedicationAdherenceCommunication(load=False)
+
+        patients_vector_db = MagicMock()
+        patients_vector_db.aget_documents_with_similarity_score = AsyncMock(
+            return_value=[
+                SimilaritySearchResult(
+                    document_id=1, content={}, similarity_score=0.9
+                )
+            ]
+        )
+        patients_vector_db.aget_documents_with_similarity_score_batch = (
+            AsyncMock(
+                side_effect=lambda user_queries, **_: [
+                    [
+                        SimilaritySearchResult(
+                            document_id=1, content={}, similarity_score=0.9
+                        )
+                    ]
+                    for _ in user_queries
+                ]
+            )
+        )
+        self.service._set_components(
+            patients_vector_db=patients_vector_db,
+            message_store=JsonMessageStore(
+                snapshot_path=dataset_path, max_log_entries=100
+            ),
+        )
+
+        self.generate_message = AsyncMock(side_effect=echo_name_completion)
+        patcher = patch.object(
+            medication_adherence, "generate_message", self.generate_message
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        asyncio.run(self.service.aclose())
+        self.temp_dir.cleanup()
+
+    def _get_communication(self, request_uuid, patient_profile, **kwargs):
+        return asyncio.run(
+            self.service.get_communication(
+                request_uuid=request_uuid,
+                patient_profile=patient_profile,
+                **kwargs,
+            )
+        )
+
+
+class TestMedicationAdherenceCommunication(MedicationAdherenceTestCase):
+    def test_get_communication_selects_examples(self):
+        """Test that high and low examples come from the message store"""
+        response = self._get_communication("uuid", build_profile())
+
+        self.assertEqual(response["high_success_examples_id"], [0, 1, 2])
+        self.assertEqual(response["low_success_examples_id"], [3, 4])
+        self.assertEqual(response["message"], "Hi John Smith, take it!")
+        self.assertFalse(response["metadata"]["response_cache_hit"])
+        self.assertEqual(response["metadata"]["tokens_saved"], 0)
+
+    def test_estimated_token_counts_are_flagged(self):
+        """Test that the metadata says when token counts are estimated"""
+        for is_exact in (True, False):
+            with patch.object(
+                PromptTemplate,
+                "token_count_is_exact",
+                new_callable=PropertyMock,
+                return_value=is_exact,
+            ):
+                response = self._get_communication("uuid", build_profile())
+
+            self.assertEqual(
+                response["metadata"]["token_count_estimated"], not is_exact
+            )
+
+    def test_prompt_budget_trims_examples(self):
+        """Test that examples are dropped to fit the token budget"""
+        with patch.object(medication_adherence, "INPUT_TOKEN_BUDGET", 1):
+            response = self._get_communication("uuid", build_profile())
+
+        self.assertEqual(response["high_success_examples_id"], [0])
+        self.assertEqual(response["low_success_examples_id"], [])
+        self.assertGreater(response["metadata"]["tokens_saved"], 0)
+        self.assertNotIn("Message 1", response["metadata"]["user_message"])
+
+    def test_create_loads_components(self):
+        """Test the async constructor used by the API warmup"""
+        settings = MagicMock(OPENAI_API_KEY="test", OPENAI_BASE_URL=None)
+        with patch.object(
+            medication_adherence, "get_settings", return_value=settings
+        ), patch.object(
+            MedicationAdherenceCommunication,
+            "_init_patients_vector_db",
+            return_value=MagicMock(),
+        ), patch.object(
+            MedicationAdherenceCommunication,
+            "_init_message_store",
+            return_value=self.service.message_store,
+        ):
+            service = asyncio.run(MedicationAdherenceCommunication.create())
+
+        self.assertIsNotNone(service.patients_vector_db)
+        self.assertIs(service.message_store, self.service.message_store)
+        self.assertIsNotNone(service.update_queue)
+        asyncio.run(service.http_clients.aclose())
+
+    def test_sqlite_store_finishes_interrupted_migration(self):
+        """Test that a database left by a killed migration is migrated"""
+        data_dir = Path(self.temp_dir.name)
+        with open(data_dir / "medication_adherence.json", "w") as f:
+            json.dump(TEST_ROWS, f)
+        # A store opened on the file creates the schema but no rows
+        database_path = data_dir / "medication_adherence.sqlite3"
+        asyncio.run(SQLiteMessageStore(database_path).aclose())
+
+        with patch.object(
+            medication_adherence, "DATA_DIR", data_dir
+        ), patch.object(
+            medication_adherence,
+            "MESSAGE_STORE_BACKEND",
+            MessageStoreBackend.SQLITE,
+        ):
+            store = MedicationAdherenceCommunication._init_message_store()
+
+        self.assertEqual(store.get(4)["message"], "Message 4")
+        asyncio.run(store.aclose())
+
+
+class TestCommunicationResults(MedicationAdherenceTestCase):
+    def test_act_on_communication_results(self):
+        """Test that outcomes are applied as one update"""
+        results = asyncio.run(
+            self.service.act_on_communication_results(
+                [
+                    {
+                        "request_uuid": "a",
+                        "was_successful": True,
+                        "high_success_examples_id": [0],
+                        "low_success_examples_id": [4],
+                    },
+                    {
+                        "request_uuid": "b",
+                        "was_successful": False,
+                        "high_success_examples_id": [0, 99],
+                        "low_success_examples_id": [],
+                    },
+                ]
+            )
+        )
+
+        self.assertEqual(results[1]["unknown_examples_id"], [99])
+        self.assertEqual(results[0]["updated_examples_id"], [0, 4])
+        # +0.05 then -0.05 on entry 0 nets out
+        self.assertAlmostEqual(
+            self.service.message_store.get(0)["success_likelihood"], 0.9
+        )
+        self.assertAlmostEqual(
+            self.service.message_store.get(4)["success_likelihood"], 0.05
+        )
+        self.assertEqual(self.service.update_queue.flushes, 1)
+
+    def test_act_on_communication_result(self):
+        """Test that a single outcome goes through the batched update"""
+        asyncio.run(
+            self.service.act_on_communication_result(
+                was_successful=True,
+                high_success_examples_id=[1],
+                low_success_examples_id=[3],
+                request_uuid="a",
+            )
+        )
+
+        self.assertAlmostEqual(
+            self.service.message_store.get(1)["success_likelihood"], 0.75
+        )
+        self.assertAlmostEqual(
+            self.service.message_store.get(3)["success_likelihood"], 0.25
+        )
+        self.assertEqual(self.service.update_queue.flushes, 1)
+
+
+class TestBatchGeneration(MedicationAdherenceTestCase):
+    def test_get_communications_reports_item_errors(self):
+        """Test that a failed item does not fail the batch"""
+
+        async def completion(**kwargs):
+            if get_prompt_name(kwargs["user_message"]) == "Bad":
+                raise RuntimeError("boom")
+            return await echo_name_completion(**kwargs)
+
+        self.generate_message.side_effect = completion
+        requests = [
+            {
+                "request_uuid": str(i),
+                "patient_profile": build_profile(name=n),
+                "use_cache": False,
+            }
+            for i, n in enumerate(["Ann", "Bad", "Bob"])
+        ]
+
+        results = asyncio.run(
+            self.service.get_communications(requests, max_concurrency=2)
+        )
+
+        self.assertEqual([r["request_uuid"] for r in results], ["0", "1", "2"])
+        self.assertEqual(results[0]["response"]["message"], "Hi Ann, take it!")
+        self.assertEqual(results[1]["error"], "boom")
+        self.assertIn("response", results[2])
+
+    def test_get_communications_reports_retrieval_errors(self):
+        """Test that a failed retrieval only fails its own item"""
+        batch_search = (
+            self.service.patients_vector_db.aget_documents_with_similarity_score_batch  # noqa
+        )
+        batch_search.side_effect = lambda user_queries, **_: [
+            (
+                RuntimeError("embedding failed")
+                if json.loads(query)["age"] == 0
+                else [
+                    SimilaritySearchResult(
+                        document_id=1, content={}, similarity_score=0.9
+                    )
+                ]
+            )
+            for query in user_queries
+        ]
+        requests = [
+            {
+                "request_uuid": str(age),
+                "patient_profile": build_profile(age=age),
+            }
+            for age in [1, 0]
+        ]
+
+        results = asyncio.run(self.service.get_communications(requests))
+
+        self.assertIn("response", results[0])
+        self.assertEqual(results[1]["error"], "embedding failed")
+        self.assertTrue(batch_search.await_args.kwargs["return_exceptions"])
+
+
+class TestStreamGeneration(MedicationAdherenceTestCase):
+    def test_iter_communications_bounds_concurrency(self):
+        """Test that streaming keeps at most max_concurrency in flight"""
+        in_flight, peak = 0, 0
+
+        async def completion(**kwargs):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return await echo_name_completion(**kwargs)
+
+        self.generate_message.side_effect = completion
+        requests = (
+            {
+                "request_uuid": str(i),
+                "patient_profile": build_profile(name=f"Name{i}"),
+                "use_cache": False,
+            }
+            for i in range(10)
+        )
+
+        async def run():
+            return [
+                item
+                async for item in self.service.iter_communications(
+                    requests, max_concurrency=3
+                )
+            ]
+
+        items = asyncio.run(run())
+
+        self.assertEqual(
+            sorted(int(item["request_uuid"]) for item in items),
+            list(range(10)),
+        )
+        self.assertEqual(peak, 3)
+
+    def test_iter_communications_reports_retrieval_errors(self):
+        """Test that a failed chunk retrieval is streamed as item errors"""
+        batch_search = (
+            self.service.patients_vector_db.aget_documents_with_similarity_score_batch  # noqa
+        )
+        batch_search.side_effect = lambda user_queries, **_: [
+            RuntimeError("embedding failed") for _ in user_queries
+        ]
+        requests = [
+            {"request_uuid": str(i), "patient_profile": build_profile()}
+            for i in range(2)
+        ]
+
+        async def run():
+            return [
+                item
+                async for item in self.service.iter_communications(requests)
+            ]
+
+        items = asyncio.run(run())
+
+        self.assertEqual(
+            [item["error"] for item in items], ["embedding failed"] * 2
+        )
+        self.generate_message.assert_not_awaited()
+
+
+class TestResponseCache(MedicationAdherenceTestCase):
+    def test_response_cache_hit_for_same_patient(self):
+        """Test that a repeated request is served from the cache"""
+        self._get_communication("1", build_profile())
+        response = self._get_communication("2", build_profile())
+
+        self.assertEqual(self.generate_message.await_count, 1)
+        self.assertTrue(response["metadata"]["response_cache_hit"])
+        self.assertEqual(response["message"], "Hi John Smith, take it!")
+
+    def test_response_cache_is_not_shared_across_patients(self):
+        """Test that a message naming a patient is never sent to another"""
+        self.generate_message.side_effect = [
+            json.dumps(
+                {"message": "Dear Mr. Smith, take it!", "explanation": ""}
+            ),
+            json.dumps(
+                {"message": "Dear Ms. Lee, take it!", "explanation": ""}
+            ),
+        ]
+
+        self._get_communication("1", build_profile())
+        response = self._get_communication("2", build_profile(name="Ann Lee"))
+
+        self.assertEqual(self.generate_message.await_count, 2)
+        self.assertFalse(response["metadata"]["response_cache_hit"])
+        self.assertNotIn("Smith", response["message"])
+
+    def test_response_cache_opt_out(self):
+        """Test that use_cache=False always calls the model"""
+        self._get_communication("1", build_profile())
+        response = self._get_communication(
+            "2", build_profile(), use_cache=False
+        )
+
+        self.assertEqual(self.generate_message.await_count, 2)
+        self.assertFalse(response["metadata"]["response_cache_hit"])
+
+
+class TestCohortMode(MedicationAdherenceTestCase):
+    def setUp(self):
+        super().setUp()
+        self.service.generation_mode = GenerationMode.COHORT
+
+    def test_cohort_mode_substitutes_placeholder(self):
+        """Test that cohort mode generates once per profile"""
+        first = self._get_communication("1", build_profile())
+        second = self._get_communication("2", build_profile(name="Ann Lee"))
+
+        self.assertEqual(self.generate_message.await_count, 1)
+        prompt = self.generate_message.await_args.kwargs["user_message"]
+        self.assertEqual(get_prompt_name(prompt), NAME_PLACEHOLDER)
+        self.assertEqual(first["message"], "Hi John Smith, take it!")
+        self.assertEqual(second["message"], "Hi Ann Lee, take it!")
+
+    def test_cohort_mode_falls_back_without_placeholder(self):
+        """Test that a response missing the placeholder is regenerated"""
+        self.generate_message.side_effect = [
+            json.dumps({"message": "Hi [Name]!", "explanation": ""}),
+            json.dumps({"message": "Hi John Smith!", "explanation": ""}),
+        ]
+
+        response = self._get_communication("1", build_profile())
+
+        self.assertEqual(self.generate_message.await_count, 2)
+        self.assertEqual(response["message"], "Hi John Smith!")
+
+    def test_cohort_mode_does_not_share_fallback(self):
+        """Test that a response generated with a real name is not shared"""
+        self.generate_message.side_effect = [
+            json.dumps({"message": "Hi [Name]!", "explanation": ""}),
+            json.dumps({"message": "Hi John Smith!", "explanation": ""}),
+            json.dumps(
+                {"message": f"Hi {NAME_PLACEHOLDER}!", "explanation": ""}
+            ),
+        ]
+
+        self._get_communication("1", build_profile())
+        response = self._get_communication("2", build_profile(name="Ann Lee"))
+
+        self.assertEqual(self.generate_message.await_count, 3)
+        self.assertFalse(response["metadata"]["response_cache_hit"])
+        self.assertEqual(response["message"], "Hi Ann Lee!")
+
+    def test_cohort_mode_with_dataset_examples(self):
+        """Test dataset placeholders are rewritten and not regenerated"""
+        rows = [
+            row
+            for row in load_json_file(DATA_DIR / "medication_adherence.json")
+            if row["patient_id"] == 1
+        ]
+        dataset_path = Path(self.temp_dir.name, "dataset.json")
+        with open(dataset_path, "w") as f:
+            json.dump(rows, f)
+        self.service._set_components(
+            patients_vector_db=self.service.patients_vector_db,
+            message_store=JsonMessageStore(
+                snapshot_path=dataset_path, max_log_entries=100
+            ),
+        )
+        self.generate_message.side_effect = [
+            json.dumps(
+                {
+                    "message": (
+                        f"Hi {NAME_PLACEHOLDER}, time for your Cetirizine "
+                        "[X] times a day!"
+                    ),
+                    "explanation": "",
+                }
+            )
+        ]
+
+        response = self._get_communication("1", build_profile())
+
+        prompt = self.generate_message.await_args.kwargs["user_message"]
+        self.assertIn(f"Hi {NAME_PLACEHOLDER}, it's time for your", prompt)
+        self.assertIn("Cetirizine dose", prompt)
+        self.assertNotIn("[Name]", prompt)
+        self.assertNotIn("[medication]", prompt)
+        self.assertEqual(self.generate_message.await_count, 1)
+        self.assertTrue(response["message"].startswith("Hi John Smith,"))
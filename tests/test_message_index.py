@@ -0,0 +1,57 @@
+import random
+import unittest
+
+from communication.message_index import MessageIndex
+
+
+def reference_selection(rows, patient_ids, high_count, low_count):
+    sorted_rows = sorted(
+        [row for row in rows if row["patient_id"] in patient_ids],
+        key=lambda row: row["success_likelihood"],
+        reverse=True,
+    )
+    return sorted_rows[:high_count], sorted_rows[-low_count:]
+
+
+class TestMessageIndex(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(7)
+        self.rows = [
+            {
+                "id": entry_id,
+                "patient_id": rng.randint(1, 6),
+                "success_likelihood": rng.choice([0.1, 0.25, 0.5, 0.75]),
+            }
+            for entry_id in range(120)
+        ]
+        self.index = MessageIndex(self.rows)
+
+    def _assert_matches_reference(self, patient_ids):
+        high, low = reference_selection(self.rows, patient_ids, 3, 2)
+        self.assertEqual(self.index.top_k(patient_ids, 3), high)
+        self.assertEqual(self.index.bottom_k(patient_ids, 2), low)
+
+    def test_selection_matches_full_sort(self):
+        """Test that top/bottom-k match a stable sort of the full scan"""
+        for patient_ids in ([1], [2, 3], [1, 4, 6], [5, 5, 2]):
+            self._assert_matches_reference(patient_ids)
+
+    def test_unknown_patients(self):
+        """Test that unknown patient ids yield no messages"""
+        self.assertEqual(self.index.top_k([99], 3), [])
+        self.assertEqual(self.index.bottom_k([], 2), [])
+
+    def test_update_likelihood_keeps_order(self):
+        """Test that updates are reflected in rows and selection order"""
+        rng = random.Random(11)
+        for _ in range(200):
+            entry_id = rng.randrange(len(self.rows))
+            self.index.update_likelihood(entry_id, rng.random())
+
+        for patient_ids in ([1], [2, 3], [1, 4, 6]):
+            self._assert_matches_reference(patient_ids)
+
+        self.index.update_likelihood(0, 0.42)
+        self.assertEqual(self.index.get(0)["success_likelihood"], 0.42)
+        self.assertEqual(self.rows[0]["success_likelihood"], 0.42)
+        self.assertIsNone(self.index.get(999))
@@ -0,0 +1,145 @@
+import asyncio
+import json
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from communication.message_store import JsonMessageStore
+from communication.sqlite_message_store import (
+    SQLiteMessageStore,
+    is_migrated,
+    migrate_json_to_sqlite,
+)
+
+TEST_ROWS = [
+    {"id": 0, "patient_id": 1, "message_id": 1, "success_likelihood": 0.9},
+    {"id": 1, "patient_id": 1, "message_id": 2, "success_likelihood": 0.2},
+    {"id": 2, "patient_id": 1, "message_id": 3, "success_likelihood": 0.5},
+    {"id": 3, "patient_id": 2, "message_id": 1, "success_likelihood": 0.5},
+    {"id": 4, "patient_id": 2, "message_id": 2, "success_likelihood": 0.98},
+    {"id": 5, "patient_id": 3, "message_id": 1, "success_likelihood": 0.1},
+]
+
+
+class MessageStoreTestMixin:
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.json_path = Path(self.temp_dir.name, "dataset.json")
+        with open(self.json_path, "w") as f:
+            json.dump(TEST_ROWS, f)
+
+        self.store = self.build_store()
+
+    def tearDown(self):
+        asyncio.run(self.store.aclose())
+        self.temp_dir.cleanup()
+
+    def build_store(self):
+        raise NotImplementedError
+
+    def _ids(self, rows):
+        return [row["id"] for row in rows]
+
+    def test_select_examples(self):
+        """Test top and bottom selection across patients, ties by id"""
+        high, low = self.store.select_examples(
+            patient_ids=[1, 2], high_count=3, low_count=2
+        )
+
+        self.assertEqual(self._ids(high), [4, 0, 2])
+        self.assertEqual(self._ids(low), [3, 1])
+
+    def test_select_examples_unknown_patients(self):
+        """Test that unknown or empty patient ids select nothing"""
+        self.assertEqual(
+            self.store.select_examples(
+                patient_ids=[], high_count=3, low_count=2
+            ),
+            ([], []),
+        )
+        self.assertEqual(
+            self.store.select_examples(
+                patient_ids=[99], high_count=3, low_count=2
+            ),
+            ([], []),
+        )
+
+    def test_apply_deltas(self):
+        """Test that deltas are clamped and unknown ids are ignored"""
+        result = asyncio.run(
+            self.store.apply_deltas(
+                deltas={4: 0.05, 5: -0.2, 2: 0.05, 99: 0.05},
+                feedback=[{"request_uuid": "uuid"}],
+            )
+        )
+
+        self.assertEqual(result, {4: 1.0, 5: 0.0, 2: 0.55})
+        self.assertEqual(self.store.get(4)["success_likelihood"], 1.0)
+        self.assertIsNone(self.store.get(99))
+
+        high, _ = self.store.select_examples(
+            patient_ids=[1], high_count=2, low_count=0
+        )
+        self.assertEqual(self._ids(high), [0, 2])
+
+
+class TestJsonMessageStore(MessageStoreTestMixin, unittest.TestCase):
+    def build_store(self):
+        return JsonMessageStore(
+            snapshot_path=self.json_path, max_log_entries=100
+        )
+
+    def test_updates_survive_restart(self):
+        """Test that updates are replayed from the feedback log"""
+        asyncio.run(self.store.apply_deltas(deltas={1: 0.05}, feedback=[{}]))
+
+        store = self.build_store()
+
+        self.assertAlmostEqual(store.get(1)["success_likelihood"], 0.25)
+
+
+class TestSQLiteMessageStore(MessageStoreTestMixin, unittest.TestCase):
+    def build_store(self):
+        self.database_path = Path(self.temp_dir.name, "dataset.sqlite3")
+        migrate_json_to_sqlite(self.json_path, self.database_path)
+        return SQLiteMessageStore(database_path=self.database_path)
+
+    def test_migration_is_idempotent(self):
+        """Test that migrating again does not overwrite updated rows"""
+        asyncio.run(self.store.apply_deltas(deltas={1: 0.05}, feedback=[{}]))
+
+        migrated = migrate_json_to_sqlite(self.json_path, self.database_path)
+
+        self.assertEqual(migrated, len(TEST_ROWS))
+        self.assertAlmostEqual(self.store.get(1)["success_likelihood"], 0.25)
+
+    def test_interrupted_migration_is_rolled_back(self):
+        """Test that a failed migration leaves an unmigrated empty database"""
+        database_path = Path(self.temp_dir.name, "interrupted.sqlite3")
+        with open(self.json_path, "w") as f:
+            json.dump(TEST_ROWS + [{"id": 99}], f)
+
+        with patch(
+            "communication.sqlite_message_store.INSERT_BATCH_SIZE", 2
+        ), self.assertRaises(KeyError):
+            migrate_json_to_sqlite(self.json_path, database_path)
+
+        self.assertTrue(database_path.exists())
+        self.assertFalse(is_migrated(database_path))
+        connection = sqlite3.connect(database_path)
+        tables = connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table'"
+        ).fetchall()
+        connection.close()
+        self.assertEqual(tables, [])
+
+    def test_updates_are_shared_between_connections(self):
+        """Test that another store on the same file sees updates"""
+        asyncio.run(self.store.apply_deltas(deltas={1: 0.05}, feedback=[{}]))
+
+        other_store = SQLiteMessageStore(database_path=self.database_path)
+
+        self.assertAlmostEqual(other_store.get(1)["success_likelihood"], 0.25)
+        asyncio.run(other_store.aclose())
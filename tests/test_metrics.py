@@ -0,0 +1,67 @@
+import unittest
+
+from prometheus_client import REGISTRY, CollectorRegistry, generate_latest
+
+from communication.metrics import (
+    ServiceStatsCollector,
+    Stage,
+    record_cache_lookup,
+    time_stage,
+)
+
+
+def get_sample_value(name, labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+class TestMetrics(unittest.TestCase):
+    def test_time_stage_records_errors(self):
+        """Test that a failing stage is timed and counted as an error"""
+        labels = {"stage": Stage.PERSISTENCE.value}
+        count = get_sample_value(
+            "communication_stage_duration_seconds_count", labels
+        )
+        errors = get_sample_value("communication_stage_errors_total", labels)
+
+        with self.assertRaises(RuntimeError):
+            with time_stage(Stage.PERSISTENCE):
+                raise RuntimeError("boom")
+
+        self.assertEqual(
+            get_sample_value(
+                "communication_stage_duration_seconds_count", labels
+            ),
+            count + 1,
+        )
+        self.assertEqual(
+            get_sample_value("communication_stage_errors_total", labels),
+            errors + 1,
+        )
+
+    def test_record_cache_lookup(self):
+        """Test that cache lookups are counted by result"""
+        labels = {"cache": "test", "result": "hit"}
+        hits = get_sample_value("communication_cache_lookups_total", labels)
+
+        record_cache_lookup("test", hit=True)
+        record_cache_lookup("test", hit=False)
+
+        self.assertEqual(
+            get_sample_value("communication_cache_lookups_total", labels),
+            hits + 1,
+        )
+
+    def test_service_stats_collector(self):
+        """Test that numeric leaves of nested stats become gauges"""
+        stats = {"cache": {"hits": 3, "enabled": True, "name": "x"}}
+        registry = CollectorRegistry()
+        registry.register(ServiceStatsCollector("service", lambda: stats))
+
+        stats["depth"] = 1
+        content = generate_latest(registry).decode()
+
+        self.assertIn("# TYPE service_cache_hits gauge\n", content)
+        self.assertIn("service_cache_hits 3.0\n", content)
+        self.assertIn("service_depth 1.0\n", content)
+        self.assertNotIn("enabled", content)
+        self.assertNotIn("name", content)
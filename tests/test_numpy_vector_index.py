@@ -0,0 +1,108 @@
+import unittest
+from typing import List
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from communication.numpy_vector_index import NumpyVectorIndex
+
+
+class StaticEmbeddings(Embeddings):
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.vectors[text] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.vectors[text]
+
+
+class TestNumpyVectorIndex(unittest.TestCase):
+    def setUp(self):
+        self.documents = [
+            Document(
+                page_content="doc 1",
+                metadata={"id": 1, "condition": "Asthma"},
+            ),
+            Document(
+                page_content="doc 2",
+                metadata={"id": 2, "condition": "Diabetes"},
+            ),
+            Document(
+                page_content="doc 3",
+                metadata={"id": 3, "condition": "Diabetes"},
+            ),
+        ]
+        self.embeddings = StaticEmbeddings(
+            {
+                "doc 1": [1.0, 0.0],
+                "doc 2": [0.6, 0.8],
+                "doc 3": [0.0, 2.0],
+                "query": [1.0, 0.1],
+            }
+        )
+        self.index = NumpyVectorIndex(
+            documents=self.documents, embedding=self.embeddings
+        )
+
+    def _ids(self, results):
+        return [doc.metadata["id"] for doc, _ in results]
+
+    def test_similarity_search_exact_top_k(self):
+        """Test that results are the exact top-k ordered by cosine score"""
+        results = self.index.similarity_search(
+            query="query", k=2, score_threshold=0.0
+        )
+
+        self.assertEqual(self._ids(results), [1, 2])
+        self.assertAlmostEqual(results[0][1], 0.995037, places=5)
+
+    def test_score_threshold(self):
+        """Test that results below the score threshold are dropped"""
+        results = self.index.similarity_search(
+            query="query", k=3, score_threshold=0.9
+        )
+
+        self.assertEqual(self._ids(results), [1])
+
+    def test_metadata_filter(self):
+        """Test equality and operator metadata filters"""
+        results = self.index.similarity_search(
+            query="query",
+            k=3,
+            score_threshold=0.0,
+            retrieval_filter={"condition": "Diabetes"},
+        )
+        self.assertEqual(self._ids(results), [2, 3])
+
+        results = self.index.similarity_search(
+            query="query",
+            k=3,
+            score_threshold=0.0,
+            retrieval_filter={
+                "$and": [
+                    {"condition": {"$in": ["Diabetes"]}},
+                    {"id": {"$ne": 2}},
+                ]
+            },
+        )
+        self.assertEqual(self._ids(results), [3])
+
+    def test_batched_queries(self):
+        """Test that a batch of queries returns one result list per query"""
+        results = self.index.similarity_search_by_vectors(
+            embeddings=[[1.0, 0.0], [0.0, 1.0]], k=1, score_threshold=0.0
+        )
+
+        self.assertEqual([self._ids(row) for row in results], [[1], [3]])
+
+    def test_unsupported_filter_operator(self):
+        """Test that unknown filter operators are rejected"""
+        with self.assertRaises(ValueError):
+            self.index.similarity_search(
+                query="query",
+                k=1,
+                score_threshold=0.0,
+                retrieval_filter={"id": {"$gt": 1}},
+            )
@@ -0,0 +1,107 @@
+import json
+import unittest
+
+import numpy as np
+
+from communication.profile_encoder import ProfileFeatureEncoder
+from communication.schema import Gender
+
+
+class TestProfileFeatureEncoder(unittest.TestCase):
+    def setUp(self):
+        self.profile = {
+            "age": 30,
+            "gender": "Female",
+            "socioeconomic_status": "High",
+            "primary_medical_condition": "Asthma",
+            "severity_of_condition": "Mild",
+            "medication_name": "Albuterol",
+            "medication_type": "Inhaler",
+            "dosage_instructions": "Two puffs as needed",
+            "frequency_of_administration": "As needed",
+            "health_literacy_level": "High",
+            "daily_routine": "Morning person",
+            "physical_activity_level": "Active",
+            "caregiver_presence": False,
+            "message_tone_preference": "Casual",
+            "motivation_level": "High",
+            "beliefs_about_medication": "Trusting",
+            "stress_level": "Low",
+            "time_since_diagnosis": 5,
+            "side_effect_sensitivity": "None",
+            "appointment_frequency": "Rarely",
+            "technology_comfort": "High",
+        }
+        self.other_profile = {
+            **self.profile,
+            "age": 70,
+            "primary_medical_condition": "Diabetes",
+            "time_since_diagnosis": 25,
+        }
+        self.encoder = ProfileFeatureEncoder.from_profiles(
+            [self.profile, self.other_profile]
+        )
+
+    def _similarity(self, encoder, first, second):
+        first_vector = encoder.encode(first)
+        second_vector = encoder.encode(second)
+        return float(
+            first_vector
+            @ second_vector
+            / np.linalg.norm(first_vector)
+            / np.linalg.norm(second_vector)
+        )
+
+    def test_schema_driven_features(self):
+        """Test that enum vocabularies come from the schema, not the data"""
+        self.assertEqual(self.encoder.vocabularies["gender"], Gender.list())
+        self.assertEqual(
+            self.encoder.vocabularies["primary_medical_condition"],
+            ["Asthma", "Diabetes"],
+        )
+        self.assertEqual(self.encoder.numeric_ranges["age"], (30, 70))
+        self.assertNotIn("name", self.encoder.vocabularies)
+
+    def test_encoding_is_deterministic(self):
+        """Test that name is ignored and equal profiles encode equally"""
+        named_profile = {**self.profile, "name": "John"}
+
+        np.testing.assert_array_equal(
+            self.encoder.encode(self.profile),
+            self.encoder.encode(named_profile),
+        )
+        self.assertAlmostEqual(
+            self._similarity(self.encoder, self.profile, named_profile), 1.0
+        )
+
+    def test_closer_profiles_are_more_similar(self):
+        """Test that numeric distance lowers similarity gradually"""
+        slightly_older = {**self.profile, "age": 40}
+
+        self.assertGreater(
+            self._similarity(self.encoder, self.profile, slightly_older),
+            self._similarity(self.encoder, self.profile, self.other_profile),
+        )
+
+    def test_feature_weights(self):
+        """Test that up-weighting a differing feature lowers similarity"""
+        weighted_encoder = ProfileFeatureEncoder.from_profiles(
+            [self.profile, self.other_profile],
+            weights={"primary_medical_condition": 5.0},
+        )
+
+        self.assertLess(
+            self._similarity(
+                weighted_encoder, self.profile, self.other_profile
+            ),
+            self._similarity(self.encoder, self.profile, self.other_profile),
+        )
+
+    def test_embed_documents_and_query(self):
+        """Test that KB documents and serialized queries encode alike"""
+        document = json.dumps({"content": self.profile, "metadata": {"id": 1}})
+
+        self.assertEqual(
+            self.encoder.embed_documents([document])[0],
+            self.encoder.embed_query(json.dumps(self.profile)),
+        )
@@ -2,6 +2,7 @@ import os
 import tempfile
 import unittest
 from pathlib import Path
+from unittest.mock import patch
 
 from communication.prompt import PromptTemplate, PromptTemplateModelRole
 
@@ -79,3 +80,46 @@ class TestPromptTemplate(unittest.TestCase):
         )
 
         self.assertEqual(result, "System template with test1 and test2")
+
+    def test_version_changes_with_template(self):
+        """Test that the version hash follows the template contents"""
+        version = self.prompt_template.get_version()
+        self.assertEqual(self.prompt_template.get_version(), version)
+
+        with open(
+            os.path.join(self.prompts_dir, self.user_template_file), "w"
+        ) as f:
+            f.write("Changed user template with {{ variable3 }}")
+
+        self.assertNotEqual(self.prompt_template.get_version(), version)
+
+    def test_static_system_message_is_memoized(self):
+        """Test that a static system message is rendered once per version"""
+        with open(
+            os.path.join(self.prompts_dir, self.system_template_file), "w"
+        ) as f:
+            f.write("Static system template")
+
+        with patch.object(
+            self.prompt_template,
+            "_build_message",
+            wraps=self.prompt_template._build_message,
+        ) as build_message:
+            first = self.prompt_template.build_system_message()
+            second = self.prompt_template.build_system_message()
+
+            self.assertEqual(first, second)
+            self.assertEqual(build_message.call_count, 1)
+
+            # A new template version is rendered again
+            with open(
+                os.path.join(self.prompts_dir, self.system_template_file),
+                "w",
+            ) as f:
+                f.write("Changed static system template")
+
+            self.assertEqual(
+                self.prompt_template.build_system_message(),
+                "Changed static system template",
+            )
+            self.assertEqual(build_message.call_count, 2)
@@ -0,0 +1,109 @@
+import asyncio
+import time
+import unittest
+
+import httpx
+
+from communication.rate_limiter import (
+    RateLimiter,
+    TokenBucket,
+    get_backoff_delay,
+    get_retry_after,
+)
+
+
+def build_response(headers):
+    return httpx.Response(
+        429, headers=headers, request=httpx.Request("POST", "http://test")
+    )
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_acquire_waits_for_refill(self):
+        """Test that acquiring beyond the balance waits for the refill"""
+        bucket = TokenBucket(capacity=2, refill_per_second=20)
+
+        async def run():
+            start = time.monotonic()
+            await bucket.acquire(2)
+            await bucket.acquire(1)
+            return time.monotonic() - start
+
+        elapsed = asyncio.run(run())
+
+        self.assertGreaterEqual(elapsed, 0.04)
+
+    def test_adjust_can_create_debt(self):
+        """Test that adjusting past zero delays later callers"""
+        bucket = TokenBucket(capacity=10, refill_per_second=1)
+
+        bucket.adjust(15)
+
+        self.assertLess(bucket.available, 0)
+
+        bucket.adjust(-100)
+
+        self.assertEqual(bucket.available, 10)
+
+    def test_bucket_is_usable_from_several_loops(self):
+        """Test that a shared bucket works across event loops"""
+        bucket = TokenBucket(capacity=1, refill_per_second=100)
+
+        async def run():
+            await asyncio.gather(*(bucket.acquire(1) for _ in range(3)))
+
+        # Contention makes the lock bind to the running loop
+        asyncio.run(run())
+        asyncio.run(run())
+
+        self.assertLessEqual(bucket.available, 1)
+
+    def test_invalid_configuration(self):
+        """Test that non-positive limits are rejected"""
+        with self.assertRaises(ValueError):
+            TokenBucket(capacity=0, refill_per_second=1)
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_pause_delays_acquire(self):
+        """Test that a pause holds every caller"""
+        rate_limiter = RateLimiter(
+            requests_per_minute=6000, tokens_per_minute=600_000
+        )
+        rate_limiter.pause(0.05)
+
+        async def run():
+            start = time.monotonic()
+            await rate_limiter.acquire(tokens=100)
+            return time.monotonic() - start
+
+        self.assertGreaterEqual(asyncio.run(run()), 0.04)
+        self.assertEqual(rate_limiter.stats()["pauses"], 1)
+
+
+class TestRetryDelay(unittest.TestCase):
+    def test_get_retry_after(self):
+        """Test parsing of Retry-After headers"""
+        self.assertEqual(
+            get_retry_after(build_response({"retry-after-ms": "1500"})), 1.5
+        )
+        self.assertEqual(
+            get_retry_after(build_response({"retry-after": "2"})), 2.0
+        )
+        self.assertEqual(
+            get_retry_after(
+                build_response(
+                    {"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"}
+                )
+            ),
+            0.0,
+        )
+        self.assertIsNone(get_retry_after(build_response({})))
+        self.assertIsNone(get_retry_after(None))
+
+    def test_get_backoff_delay_is_capped(self):
+        """Test that the jittered backoff stays within its cap"""
+        for attempt in range(10):
+            delay = get_backoff_delay(attempt, base_seconds=0.5, max_seconds=4)
+            self.assertGreaterEqual(delay, 0)
+            self.assertLessEqual(delay, 4)
@@ -0,0 +1,82 @@
+import asyncio
+import unittest
+
+from communication.single_flight import SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+    def setUp(self):
+        self.single_flight = SingleFlight()
+        self.started = 0
+
+    async def _call(self, value):
+        self.started += 1
+        await asyncio.sleep(0.01)
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+    def test_concurrent_calls_are_coalesced(self):
+        """Test that concurrent calls with the same key share one call"""
+
+        async def run():
+            return await asyncio.gather(
+                self.single_flight.run("a", lambda: self._call(1)),
+                self.single_flight.run("a", lambda: self._call(1)),
+                self.single_flight.run("b", lambda: self._call(2)),
+            )
+
+        self.assertEqual(asyncio.run(run()), [1, 1, 2])
+        self.assertEqual(self.started, 2)
+        self.assertEqual(
+            self.single_flight.stats(),
+            {"calls": 3, "coalesced": 1, "in_flight": 0},
+        )
+
+    def test_sequential_calls_are_not_coalesced(self):
+        """Test that a finished call is not reused"""
+
+        async def run():
+            await self.single_flight.run("a", lambda: self._call(1))
+            await self.single_flight.run("a", lambda: self._call(1))
+
+        asyncio.run(run())
+
+        self.assertEqual(self.started, 2)
+
+    def test_errors_are_shared(self):
+        """Test that every coalesced caller receives the error"""
+
+        async def run():
+            return await asyncio.gather(
+                self.single_flight.run(
+                    "a", lambda: self._call(ValueError("boom"))
+                ),
+                self.single_flight.run(
+                    "a", lambda: self._call(ValueError("boom"))
+                ),
+                return_exceptions=True,
+            )
+
+        results = asyncio.run(run())
+
+        self.assertTrue(all(isinstance(r, ValueError) for r in results))
+        self.assertEqual(self.started, 1)
+
+    def test_cancelled_caller_does_not_cancel_others(self):
+        """Test that cancelling the first caller keeps the shared call"""
+
+        async def run():
+            first = asyncio.create_task(
+                self.single_flight.run("a", lambda: self._call(1))
+            )
+            await asyncio.sleep(0)
+            second = asyncio.create_task(
+                self.single_flight.run("a", lambda: self._call(1))
+            )
+            await asyncio.sleep(0)
+            first.cancel()
+            return await second
+
+        self.assertEqual(asyncio.run(run()), 1)
+        self.assertEqual(self.started, 1)
@@ -0,0 +1,82 @@
+import asyncio
+import json
+import unittest
+
+from api.models import StreamFormat, StreamRecordType
+from api.streaming import format_stream_record, stream_batch_items
+
+
+async def iter_items(items, error=None):
+    for item in items:
+        yield item
+    if error is not None:
+        raise error
+
+
+def collect(items, stream_format):
+    async def run():
+        return [
+            record async for record in stream_batch_items(items, stream_format)
+        ]
+
+    return asyncio.run(run())
+
+
+class TestStreaming(unittest.TestCase):
+    def test_format_ndjson_record(self):
+        """Test that an NDJSON record is one typed JSON object per line"""
+        record = format_stream_record(
+            StreamFormat.NDJSON, StreamRecordType.RESULT, {"a": "é"}
+        )
+
+        self.assertTrue(record.endswith("\n"))
+        self.assertEqual(record.count("\n"), 1)
+        self.assertEqual(
+            json.loads(record), {"type": "result", "data": {"a": "é"}}
+        )
+
+    def test_format_sse_record(self):
+        """Test that an SSE record is an event named after its type"""
+        record = format_stream_record(
+            StreamFormat.SSE, StreamRecordType.SUMMARY, {"failed": 0}
+        )
+
+        self.assertEqual(record, 'event: summary\ndata: {"failed": 0}\n\n')
+
+    def test_stream_ends_with_summary(self):
+        """Test that results are streamed and counted in the summary"""
+        records = collect(
+            iter_items(
+                [
+                    {"request_uuid": "a", "error": "boom"},
+                    {"request_uuid": "b", "error": None},
+                ]
+            ),
+            StreamFormat.NDJSON,
+        )
+
+        records = [json.loads(record) for record in records]
+        self.assertEqual(
+            [record["type"] for record in records],
+            ["result", "result", "summary"],
+        )
+        self.assertEqual(records[0]["data"]["error"], "boom")
+        summary = records[-1]["data"]
+        self.assertEqual((summary["succeeded"], summary["failed"]), (1, 1))
+        self.assertIsNone(summary["error"])
+
+    def test_stream_error_is_reported_in_summary(self):
+        """Test that an error mid-stream still ends with a summary"""
+        records = collect(
+            iter_items(
+                [{"request_uuid": "a"}], error=RuntimeError("stream broke")
+            ),
+            StreamFormat.SSE,
+        )
+
+        self.assertEqual(len(records), 2)
+        self.assertTrue(records[0].startswith("event: result\n"))
+        self.assertTrue(records[1].startswith("event: summary\n"))
+        summary = json.loads(records[1].split("data: ")[1])
+        self.assertEqual(summary["succeeded"], 1)
+        self.assertEqual(summary["error"], "stream broke")
@@ -0,0 +1,95 @@
+import hashlib
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+from communication.token_counter import (
+    CHARS_PER_TOKEN,
+    TOKEN_ENCODING_URLS,
+    TokenCounter,
+    _get_token_counter,
+    get_token_counter,
+)
+
+
+class TestTokenCounter(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+
+        # An empty cache, whatever the environment provides
+        env_patcher = patch.dict(
+            os.environ, {"TIKTOKEN_CACHE_DIR": self.temp_dir.name}
+        )
+        env_patcher.start()
+        self.addCleanup(env_patcher.stop)
+
+        _get_token_counter.cache_clear()
+        self.addCleanup(_get_token_counter.cache_clear)
+
+        self.get_encoding = MagicMock()
+        tiktoken_patcher = patch("tiktoken.get_encoding", self.get_encoding)
+        tiktoken_patcher.start()
+        self.addCleanup(tiktoken_patcher.stop)
+
+    def _cache_encoding(self):
+        url = TOKEN_ENCODING_URLS["o200k_base"]
+        Path(
+            self.temp_dir.name, hashlib.sha1(url.encode()).hexdigest()
+        ).touch()
+
+    def test_fallback_without_cached_encoding(self):
+        """Test the length-based estimate without any network attempt"""
+        token_counter = TokenCounter()
+
+        self.get_encoding.assert_not_called()
+        self.assertFalse(token_counter.is_exact)
+        self.assertEqual(token_counter.count(""), 0)
+        self.assertEqual(token_counter.count("a" * 10), 3)
+        self.assertEqual(
+            token_counter.truncate("a" * 100, max_tokens=2),
+            "a" * 2 * CHARS_PER_TOKEN,
+        )
+        self.assertEqual(token_counter.truncate("short", 10), "short")
+
+    def test_fallback_without_cache_dir(self):
+        """Test that tiktoken's default download cache is not used"""
+        del os.environ["TIKTOKEN_CACHE_DIR"]
+
+        self.assertFalse(TokenCounter().is_exact)
+        self.get_encoding.assert_not_called()
+
+    def test_cached_encoding(self):
+        """Test that a cached encoding is used to count and truncate"""
+        self._cache_encoding()
+        encoding = self.get_encoding.return_value
+        encoding.encode.side_effect = lambda text, **_: text.split()
+        encoding.decode.side_effect = " ".join
+
+        token_counter = TokenCounter()
+
+        self.get_encoding.assert_called_once_with("o200k_base")
+        self.assertTrue(token_counter.is_exact)
+        self.assertEqual(token_counter.count("Take your pill"), 3)
+        self.assertEqual(
+            token_counter.truncate("Take your pill", max_tokens=2),
+            "Take your",
+        )
+
+    def test_fallback_when_encoding_fails_to_load(self):
+        """Test the estimate when the cached encoding cannot be read"""
+        self._cache_encoding()
+        self.get_encoding.side_effect = ValueError("Hash mismatch")
+
+        self.assertFalse(TokenCounter().is_exact)
+
+    def test_fallback_is_logged_once(self):
+        """Test that the estimate is reported once for the shared counter"""
+        with self.assertLogs(level="WARNING") as logs:
+            get_token_counter()
+            get_token_counter("o200k_base")
+
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn("TIKTOKEN_CACHE_DIR", logs.output[0])
@@ -0,0 +1,108 @@
+import asyncio
+import unittest
+
+from communication.message_store import MessageStore, clamp_likelihood
+from communication.update_queue import LikelihoodUpdateQueue
+
+
+class InMemoryMessageStore(MessageStore):
+    def __init__(self, likelihoods):
+        self.likelihoods = dict(likelihoods)
+        self.calls = []
+
+    def get(self, entry_id):
+        return {
+            "id": entry_id,
+            "success_likelihood": self.likelihoods[entry_id],
+        }
+
+    def select_examples(self, patient_ids, high_count, low_count):
+        return [], []
+
+    async def apply_deltas(self, deltas, feedback):
+        self.calls.append((dict(deltas), list(feedback)))
+        result = {}
+        for entry_id, delta in deltas.items():
+            if entry_id not in self.likelihoods:
+                continue
+            self.likelihoods[entry_id] = clamp_likelihood(
+                self.likelihoods[entry_id] + delta
+            )
+            result[entry_id] = self.likelihoods[entry_id]
+        return result
+
+
+class FailingMessageStore(InMemoryMessageStore):
+    async def apply_deltas(self, deltas, feedback):
+        raise RuntimeError("disk full")
+
+
+class TestLikelihoodUpdateQueue(unittest.TestCase):
+    def test_concurrent_updates_are_coalesced(self):
+        """Test that concurrent submissions are netted into one write"""
+        store = InMemoryMessageStore({1: 0.5, 2: 0.5, 3: 0.98})
+        queue = LikelihoodUpdateQueue(store, flush_interval_seconds=0.05)
+
+        async def run():
+            # The first submission flushes on its own, the rest wait for
+            # the next interval and are merged
+            first = await queue.submit({1: 0.05}, [{"request_uuid": "a"}])
+            rest = await asyncio.gather(
+                queue.submit({1: 0.05, 3: 0.05}, [{"request_uuid": "b"}]),
+                queue.submit({1: -0.05, 2: 0.05}, [{"request_uuid": "c"}]),
+                queue.submit({3: 0.05, 99: 0.05}, [{"request_uuid": "d"}]),
+            )
+            await queue.aclose()
+            return first, rest
+
+        first, rest = asyncio.run(run())
+
+        self.assertEqual(len(store.calls), 2)
+        deltas, feedback = store.calls[1]
+        self.assertAlmostEqual(deltas[1], 0.0)
+        self.assertAlmostEqual(deltas[3], 0.1)
+        self.assertEqual(
+            [record["request_uuid"] for record in feedback], ["b", "c", "d"]
+        )
+
+        self.assertAlmostEqual(first[1], 0.55)
+        self.assertAlmostEqual(rest[0][1], 0.55)
+        self.assertEqual(rest[0][3], 1.0)
+        self.assertAlmostEqual(rest[1][2], 0.55)
+        self.assertEqual(rest[2], {3: 1.0})
+
+        stats = queue.stats()
+        self.assertEqual(stats["depth"], 0)
+        self.assertEqual(stats["submitted"], 4)
+        self.assertEqual(stats["flushes"], 2)
+        self.assertGreaterEqual(stats["max_flush_latency_seconds"], 0.0)
+
+    def test_aclose_flushes_pending_updates(self):
+        """Test that closing the queue persists what is still pending"""
+        store = InMemoryMessageStore({1: 0.5})
+        queue = LikelihoodUpdateQueue(store, flush_interval_seconds=60)
+
+        async def run():
+            await queue.submit({1: 0.05}, [])
+            pending = asyncio.create_task(queue.submit({1: 0.05}, []))
+            await asyncio.sleep(0)
+            await queue.aclose()
+            return await pending
+
+        result = asyncio.run(run())
+
+        self.assertAlmostEqual(result[1], 0.6)
+        self.assertEqual(len(store.calls), 2)
+
+    def test_store_errors_are_raised_to_submitters(self):
+        """Test that a failed write fails every submission in the batch"""
+        queue = LikelihoodUpdateQueue(
+            FailingMessageStore({1: 0.5}), flush_interval_seconds=0.01
+        )
+
+        async def run():
+            with self.assertRaises(RuntimeError):
+                await queue.submit({1: 0.05}, [])
+            await queue.aclose()
+
+        asyncio.run(run())
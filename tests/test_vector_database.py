@@ -1,14 +1,20 @@
+import asyncio
 import json
 import os
 import tempfile
 import unittest
 from pathlib import Path
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from communication.numpy_vector_index import NumpyVectorIndex
+from communication.utils import hash_text
 from communication.vector_database import (
     SimilaritySearchResult,
     VectorDatabase,
 )
+from communication.vector_index import VectorIndexBackend
 
 
 class TestVectorDatabase(unittest.TestCase):
@@ -106,7 +112,10 @@ class TestVectorDatabase(unittest.TestCase):
         # Verify Chroma was initialized with correct parameters
         self.mock_chroma.from_documents.assert_called_once()
         call_args = self.mock_chroma.from_documents.call_args[1]
-        self.assertEqual(call_args["collection_name"], self.kb_file_name)
+        self.assertEqual(
+            call_args["collection_name"],
+            f"{self.kb_file_name}-{hash_text(self.embedding_model)[:12]}",
+        )
         self.assertEqual(call_args["documents"], self.mock_documents)
         self.assertEqual(
             call_args["collection_metadata"], {"hnsw:space": "cosine"}
@@ -178,3 +187,335 @@ class TestVectorDatabase(unittest.TestCase):
         self.assertEqual(results[1].document_id, 2)
         self.assertEqual(results[1].content, "This is test document 2")
         self.assertEqual(results[1].similarity_score, 0.85)
+
+    def test_aget_documents_with_similarity_score(self):
+        """Test async retrieval embeds asynchronously and applies threshold"""
+        db = VectorDatabase(
+            kb_file_name=self.kb_file_name,
+            kb_directory_path=self.kb_directory_path,
+            embedding_model=self.embedding_model,
+            openai_key=self.openai_key,
+            file_jq_schema=self.file_jq_schema,
+        )
+
+        mock_embedding = self.mock_embeddings.return_value
+        mock_embedding.aembed_query = AsyncMock(return_value=[0.1, 0.2])
+        self.mock_store._collection.query.return_value = {
+            "ids": [["1", "2"]],
+            "documents": [[doc.page_content for doc in self.mock_documents]],
+            "metadatas": [[{"id": 1}, None]],
+            "distances": [[0.08, 0.3]],
+        }
+
+        results = asyncio.run(
+            db.aget_documents_with_similarity_score(
+                user_query="test query",
+                top_k=2,
+                score_threshold=0.8,
+            )
+        )
+
+        mock_embedding.aembed_query.assert_awaited_once_with("test query")
+        self.mock_store._collection.query.assert_called_once_with(
+            query_embeddings=[[0.1, 0.2]],
+            n_results=2,
+            where=None,
+            include=["documents", "metadatas", "distances"],
+        )
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0].document_id, 1)
+        self.assertAlmostEqual(results[0].similarity_score, 0.92)
+
+    def test_numpy_backend(self):
+        """Test that the NumPy backend is used instead of Chroma"""
+        mock_embedding = self.mock_embeddings.return_value
+        mock_embedding.embed_documents.return_value = [[1.0, 0.0], [0.0, 1.0]]
+        mock_embedding.aembed_documents = AsyncMock(
+            return_value=[[0.9, 0.1], [0.9, 0.1]]
+        )
+
+        db = VectorDatabase(
+            kb_file_name=self.kb_file_name,
+            kb_directory_path=self.kb_directory_path,
+            embedding_model=self.embedding_model,
+            openai_key=self.openai_key,
+            file_jq_schema=self.file_jq_schema,
+            backend=VectorIndexBackend.NUMPY,
+        )
+
+        self.mock_chroma.from_documents.assert_not_called()
+        self.assertIsInstance(db._index, NumpyVectorIndex)
+
+        results = asyncio.run(
+            db.aget_documents_with_similarity_score_batch(
+                user_queries=["query 1", "query 2"],
+                top_k=1,
+                score_threshold=0.5,
+            )
+        )
+
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0][0].document_id, 1)
+        self.assertEqual(results[1][0].document_id, 1)
+
+    def test_batch_reports_embedding_errors(self):
+        """Test that queries are embedded together and failures per query"""
+
+        async def aembed_documents(texts):
+            if "bad" in texts:
+                raise RuntimeError("embedding failed")
+            return [[0.9, 0.1] for _ in texts]
+
+        async def aembed_query(text):
+            return (await aembed_documents([text]))[0]
+
+        mock_embedding = self.mock_embeddings.return_value
+        mock_embedding.embed_documents.return_value = [[1.0, 0.0], [0.0, 1.0]]
+        mock_embedding.aembed_documents = AsyncMock(
+            side_effect=aembed_documents
+        )
+        mock_embedding.aembed_query = AsyncMock(side_effect=aembed_query)
+
+        db = VectorDatabase(
+            kb_file_name=self.kb_file_name,
+            kb_directory_path=self.kb_directory_path,
+            embedding_model=self.embedding_model,
+            openai_key=self.openai_key,
+            file_jq_schema=self.file_jq_schema,
+            backend=VectorIndexBackend.NUMPY,
+        )
+
+        results = asyncio.run(
+            db.aget_documents_with_similarity_score_batch(
+                user_queries=["query 1", "query 2"],
+                top_k=1,
+                score_threshold=0.5,
+            )
+        )
+
+        mock_embedding.aembed_documents.assert_awaited_once_with(
+            ["query 1", "query 2"]
+        )
+        mock_embedding.aembed_query.assert_not_awaited()
+        self.assertEqual([docs[0].document_id for docs in results], [1, 1])
+
+        results = asyncio.run(
+            db.aget_documents_with_similarity_score_batch(
+                user_queries=["bad", "query 1"],
+                top_k=1,
+                score_threshold=0.5,
+                return_exceptions=True,
+            )
+        )
+
+        self.assertIsInstance(results[0], RuntimeError)
+        self.assertEqual(results[1][0].document_id, 1)
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(
+                db.aget_documents_with_similarity_score_batch(
+                    user_queries=["bad"], top_k=1, score_threshold=0.5
+                )
+            )
+
+
+class TestVectorDatabasePersistence(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.kb_directory_path = Path(self.temp_dir.name)
+        self.persist_directory = Path(self.temp_dir.name, "chroma")
+        self.kb_file_name = "test_kb.json"
+        self.file_jq_schema = (
+            ".[] | {content: .content, metadata: {id: .metadata.id}}"
+        )
+
+        self.mock_embeddings_patcher = patch(
+            "communication.vector_database.OpenAIEmbeddings"
+        )
+        self.mock_embeddings = self.mock_embeddings_patcher.start()
+        self.fake_embeddings = MagicMock(
+            wraps=DeterministicFakeEmbedding(size=8)
+        )
+        self.mock_embeddings.return_value = self.fake_embeddings
+
+    def tearDown(self):
+        self.mock_embeddings_patcher.stop()
+        self.temp_dir.cleanup()
+
+    def _write_kb(self, test_data):
+        with open(
+            os.path.join(self.kb_directory_path, self.kb_file_name), "w"
+        ) as f:
+            json.dump(test_data, f)
+
+    def _build_db(self, embedding_model="text-embedding-3-small"):
+        return VectorDatabase(
+            kb_file_name=self.kb_file_name,
+            kb_directory_path=self.kb_directory_path,
+            embedding_model=embedding_model,
+            openai_key="test-key",
+            file_jq_schema=self.file_jq_schema,
+            persist_directory=self.persist_directory,
+        )
+
+    def test_incremental_sync(self):
+        """Test that only added, changed or removed documents are synced"""
+        self._write_kb(
+            [
+                {"content": "Document 1", "metadata": {"id": 1}},
+                {"content": "Document 2", "metadata": {"id": 2}},
+            ]
+        )
+        self._build_db()
+        self.assertEqual(self.fake_embeddings.embed_documents.call_count, 1)
+
+        self._build_db()
+        self.assertEqual(self.fake_embeddings.embed_documents.call_count, 1)
+
+        self._write_kb(
+            [
+                {"content": "Document 2 updated", "metadata": {"id": 2}},
+                {"content": "Document 3", "metadata": {"id": 3}},
+            ]
+        )
+        db = self._build_db()
+
+        embedded_texts = self.fake_embeddings.embed_documents.call_args[0][0]
+        self.assertEqual(len(embedded_texts), 2)
+        self.assertEqual(
+            sorted(db._index.store.get()["ids"]),
+            ["2", "3"],
+        )
+
+    def test_batch_search_matches_single_search(self):
+        """Test that one batched Chroma query scores like single searches"""
+        self._write_kb(
+            [
+                {"content": "Document 1", "metadata": {"id": 1}},
+                {"content": "Document 2", "metadata": {"id": 2}},
+            ]
+        )
+        db = self._build_db()
+        queries = ["query 1", "query 2"]
+
+        batch_results = asyncio.run(
+            db.aget_documents_with_similarity_score_batch(
+                user_queries=queries, top_k=5, score_threshold=-1.0
+            )
+        )
+
+        for query, results in zip(queries, batch_results):
+            single_results = db.get_documents_with_similarity_score(
+                user_query=query, top_k=5, score_threshold=-1.0
+            )
+            self.assertEqual(
+                [doc.document_id for doc in results],
+                [doc.document_id for doc in single_results],
+            )
+            for batch_doc, single_doc in zip(results, single_results):
+                self.assertAlmostEqual(
+                    batch_doc.similarity_score,
+                    single_doc.similarity_score,
+                    places=5,
+                )
+
+    def test_collection_per_embedding_model(self):
+        """Test that another embedding model does not reuse stored vectors"""
+        self._write_kb([{"content": "Document 1", "metadata": {"id": 1}}])
+        self._build_db()
+        db = self._build_db(embedding_model="text-embedding-3-large")
+
+        self.assertEqual(self.fake_embeddings.embed_documents.call_count, 2)
+        self.assertEqual(db._index.store.get()["ids"], ["1"])
+
+
+class TestVectorDatabasePartitions(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.kb_directory_path = Path(self.temp_dir.name)
+        self.kb_file_name = "test_kb.json"
+
+        test_data = [
+            {"content": "Asthma 1", "metadata": {"id": 1, "c": "Asthma"}},
+            {"content": "Asthma 2", "metadata": {"id": 2, "c": "Asthma"}},
+            {"content": "Gout 1", "metadata": {"id": 3, "c": "Gout"}},
+        ]
+        with open(
+            os.path.join(self.kb_directory_path, self.kb_file_name), "w"
+        ) as f:
+            json.dump(test_data, f)
+
+        self.db = VectorDatabase(
+            kb_file_name=self.kb_file_name,
+            kb_directory_path=self.kb_directory_path,
+            embedding_model="text-embedding-3-small",
+            openai_key="test-key",
+            file_jq_schema=(
+                ".[] | {content: .content, "
+                "metadata: {id: .metadata.id, c: .metadata.c}}"
+            ),
+            backend=VectorIndexBackend.NUMPY,
+            embedding=DeterministicFakeEmbedding(size=8),
+            partition_keys=["c"],
+        )
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_partitions_are_built_from_metadata(self):
+        """Test that one index is built per partition value"""
+        self.assertEqual(
+            sorted(self.db._partitions.keys()), [("Asthma",), ("Gout",)]
+        )
+        self.assertEqual(len(self.db._partitions[("Asthma",)]), 2)
+
+    def test_search_within_partition(self):
+        """Test that a matching partition restricts the search"""
+        results = self.db.get_documents_with_similarity_score(
+            user_query="query",
+            top_k=3,
+            score_threshold=-1.0,
+            partition={"c": "Gout", "other": "ignored"},
+        )
+
+        self.assertEqual([doc.document_id for doc in results], [3])
+
+    def test_unknown_partition_searches_all(self):
+        """Test that an unknown partition falls back to every partition"""
+        results = asyncio.run(
+            self.db.aget_documents_with_similarity_score_batch(
+                user_queries=["query 1", "query 2"],
+                top_k=3,
+                score_threshold=-1.0,
+                partitions=[{"c": "Unknown"}, {"c": "Asthma"}],
+            )
+        )
+
+        self.assertEqual(
+            sorted(doc.document_id for doc in results[0]), [1, 2, 3]
+        )
+        self.assertEqual(sorted(doc.document_id for doc in results[1]), [1, 2])
+
+    def test_content_metadata_keys(self):
+        """Test that content fields become metadata but are not embedded"""
+        with open(Path(self.kb_directory_path, "profiles.json"), "w") as f:
+            json.dump([{"id": 1, "profile": {"c": "Gout", "age": 3}}], f)
+
+        db = VectorDatabase(
+            kb_file_name="profiles.json",
+            kb_directory_path=self.kb_directory_path,
+            embedding_model="text-embedding-3-small",
+            openai_key="test-key",
+            file_jq_schema=".[] | {content: .profile, metadata: {id: .id}}",
+            backend=VectorIndexBackend.NUMPY,
+            embedding=DeterministicFakeEmbedding(size=8),
+            content_metadata_keys=["c", "missing"],
+        )
+
+        doc = db._index._documents[0]
+        self.assertEqual(doc.metadata["c"], "Gout")
+        self.assertNotIn("missing", doc.metadata)
+        self.assertEqual(
+            json.loads(doc.page_content),
+            {"content": {"c": "Gout", "age": 3}, "metadata": {"id": 1}},
+        )